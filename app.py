@@ -1,7 +1,12 @@
+import time
+
+# Inicio de la ejecución del script para el informe de arranque (la primera del proceso incluye las importaciones)
+SCRIPT_START = time.perf_counter()
+
 import streamlit as st
-import requests
-import json
-from textwrap import dedent
+
+import interfaz
+from correccion import pipeline, service
 
 # Configuración de la página
 st.set_page_config(
@@ -18,124 +23,44 @@ st.markdown("""
 Bienvenido a la herramienta de análisis literario. Por favor, completa los campos a continuación para obtener una crítica literaria detallada y recomendaciones de estilo específicas para tu texto.
 """)
 
-# Formulario de entrada
-with st.form(key='literary_analysis_form'):
-    # Área de texto para el contenido
-    text_input = st.text_area(
-        "Pega tu texto (máximo 2000 palabras):",
-        height=300,
-        help="Asegúrate de que tu texto no exceda las 2000 palabras."
-    )
+# Opciones en la barra lateral
+st.sidebar.header("⚙️ Opciones")
+stream_mode = interfaz.stream_option()
+service_tier = interfaz.tier_option()
+fanout_mode = interfaz.fanout_option()
+use_cache = interfaz.cache_option()
+debug_panel = interfaz.debug_option()
+concurrency = interfaz.concurrency_option()
+
+# Recursos compartidos por el proceso (interfaz): limitador, usuario y su cuota, caché e historial
+current_user = interfaz.current_user()
+rate_limiter = interfaz.limiter_for(current_user)
+response_cache = interfaz.get_response_cache() if use_cache else None
+result_store = interfaz.get_result_store()
+interfaz.start_process()
 
-    # Selección de género
-    genre = st.selectbox(
-        "Selecciona el género:",
-        options=[
-            "Fantasía", "Ciencia Ficción", "Misterio", "Romance",
-            "Terror", "Aventura", "Drama", "Histórico", "Otro"
+# Formulario de entrada
+form = interfaz.input_form("Analizar")
+
+# Acción al enviar el formulario: estimación, análisis (por fragmentos si no cabe) validado, presentación e
+# historial
+if form.submitted:
+    text_input = interfaz.read_submission(form, current_user, "Por favor, pega tu texto para analizar.")
+    if text_input:
+        stages = [
+            pipeline.Estimate(review=True, fanout=fanout_mode),
+            pipeline.Validate(pipeline.Analysis(fanout_mode, review=True)),
+            pipeline.Render(),
+            pipeline.Record(result_store, interfaz.author_id(current_user)),
         ]
-    )
-
-    # Entrada de audiencia
-    audience = st.text_input(
-        "Define la audiencia:",
-        help="Por ejemplo: adolescentes, adultos jóvenes, adultos, etc."
-    )
-
-    # Botón de envío
-    submit_button = st.form_submit_button(label='Analizar')
-
-# Función para contar palabras
-def count_words(text):
-    return len(text.split())
-
-# Función para llamar a la API de Together
-def call_together_api(api_key, genre, audience, text):
-    url = "https://api.together.xyz/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-
-    # Construcción de los mensajes para la API con instrucciones claras y específicas
-    messages = [
-        {
-            "role": "system",
-            "content": dedent("""
-                Eres un crítico literario experto que proporciona análisis detallados y recomendaciones de estilo basadas en el género y la audiencia especificados.
-                **No debes corregir, modificar ni repetir el texto proporcionado.**
-                Tu única tarea es analizar el texto y ofrecer sugerencias de mejora enfocadas en aspectos literarios específicos como temas, desarrollo de personajes, estructura narrativa, tono, y estilo.
-            """)
-        },
-        {
-            "role": "user",
-            "content": dedent(f"""
-                Por favor, analiza el siguiente texto y proporciona una crítica literaria junto con recomendaciones de estilo específicas.
-
-                **Instrucciones adicionales:**
-                - No repitas el análisis previamente proporcionado.
-                - No corrijas ni modifiques el texto original de ninguna manera.
-                - Enfócate únicamente en proporcionar observaciones, críticas constructivas y sugerencias de mejora relacionadas directamente con el contenido del texto.
-                - Organiza el análisis en secciones claras como **Temas**, **Desarrollo de Personajes**, **Estructura Narrativa**, **Estilo y Tono**, etc.
-
-                **Género:** {genre}
-                **Audiencia:** {audience}
-
-                **Texto:**
-                {text}
-            """)
-        }
-    ]
-
-    payload = {
-        "model": "mistralai/Mixtral-8x7B-Instruct-v0.1",
-        "messages": messages,
-        "max_tokens": 2000,  # Ajusta según tus necesidades y límites de la API
-        "temperature": 0.5,  # Reducida para respuestas más enfocadas
-        "top_p": 0.7,
-        "top_k": 50,
-        "repetition_penalty": 1,
-        "stop": ["<|eot_id|>"],
-        "stream": False  # Mantener como False para simplificar
-    }
-
-    try:
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
-        response.raise_for_status()  # Esto lanzará una excepción si hay un error HTTP
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        st.error(f"Error al comunicarse con la API: {e}")
-        return None
-
-# Acción al enviar el formulario
-if submit_button:
-    # Validación de entrada
-    if not text_input.strip():
-        st.error("Por favor, pega tu texto para analizar.")
-    elif not audience.strip():
-        st.error("Por favor, define la audiencia.")
-    else:
-        word_count = count_words(text_input)
-        if word_count > 2000:
-            st.error(f"El texto excede el límite de 2000 palabras. Actualmente tiene {word_count} palabras.")
-        else:
-            # Mostrar spinner mientras se procesa la solicitud
-            with st.spinner("Analizando tu texto..."):
-                # Obtener la API Key desde los secretos
-                try:
-                    api_key = st.secrets["TOGETHER_API_KEY"]
-                except KeyError:
-                    st.error("La clave de la API no está configurada correctamente en los secrets.")
-                    st.stop()
-
-                # Llamar a la API
-                api_response = call_together_api(api_key, genre, audience, text_input)
-
-                if api_response:
-                    # Extraer la respuesta del modelo
-                    try:
-                        analysis = api_response['choices'][0]['message']['content']
-                        st.subheader("📄 Análisis Literario")
-                        st.write(analysis)
-                    except (KeyError, IndexError):
-                        st.error("Respuesta inesperada de la API.")
+        clients = pipeline.Clients(interfaz.get_api_key(), response_cache, rate_limiter, service_tier)
+        renderer = interfaz.StreamlitRenderer(stream_mode, rate_limiter)
+        chunked = service.needs_chunking(text_input)
+        # Mostrar spinner mientras se procesa la solicitud
+        with st.spinner("Analizando tu texto por fragmentos..." if chunked else "Analizando tu texto..."):
+            interfaz.run_pipeline(
+                pipeline.Pipeline(stages, clients, renderer, concurrency), form.genre, form.audience, text_input
+            )
+
+# Latencias, cuenta, caché, conexión, arranque y depuración
+interfaz.show_sidebar_panels("app", SCRIPT_START, current_user, response_cache, debug_panel)
@@ -0,0 +1 @@
+# Banco de pruebas sin red: servidor simulado de Together (mock_together) y cargas con guion (run).
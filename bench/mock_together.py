@@ -0,0 +1,289 @@
+# Servidor local que imita https://api.together.xyz/v1/chat/completions para medir sin red ni costo.
+#
+#   python -m bench.mock_together --port 8008 --latency 0.3 --tokens-per-second 120 --rate-limit-rate 0.05
+#   python -m bench.mock_together --truncate-rate 0.1 --link-fault-rate 0.2 --malformed-rate 0.1
+#
+# Responde en JSON o en streaming SSE según "stream", con latencia y velocidad de generación configurables,
+# e inyecta respuestas 429 y 5xx con la probabilidad indicada. Las respuestas son plantillas con un tamaño
+# realista: la corrección repite el texto original, el análisis crece con max_tokens. También puede estropear
+# respuestas como lo hace un modelo: cortarlas por max_tokens, alterar o quitar una URL de la corrección y
+# romper el JSON de las ediciones o quitar una sección del análisis; las continuaciones siguen la plantilla.
+# GET /stats devuelve los contadores; POST /reset los pone a cero.
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BYTES_PER_TOKEN = 4  # Aproximación para contar los tokens de entrada y salida simulados
+STREAM_INTERVAL = 0.01  # Segundos entre dos eventos SSE
+
+ANALYSIS_TEMPLATE = (
+    "**Temas**\n\nEl texto explora la memoria y la pérdida con una voz contenida.\n\n"
+    "**Desarrollo de Personajes**\n\nLa protagonista necesita un deseo más explícito en las primeras escenas.\n\n"
+    "**Estructura Narrativa**\n\nLas transiciones entre escenas son abruptas; conviene anclar el tiempo y el lugar.\n\n"
+    "**Estilo y Tono**\n\nAbundan los adverbios en -mente y las oraciones largas encadenadas con comas."
+)
+NOTES_TEMPLATE = "**Estilo y Tono**\n\n- Oraciones largas: conviene dividirlas.\n- Revisa la puntuación del diálogo."
+JUSTIFICATION = ' <span style="color:red">[Estilo: se aligera la oración]</span>'
+_URL = re.compile(r"https?://[^\s)<>\]\"']+")
+_LAST_SECTION = re.compile(r"\*\*Estilo y Tono\*\*\n\n[^\n]*(?:\n\n)?")
+_ORIGINAL_TEXT = re.compile(r"\*\*Texto(?: Original)?:\*\*\n(?P<text>.*?)(?:\n\n\*\*Instrucciones adicionales:\*\*|\Z)", re.DOTALL)
+
+
+# Configuración y contadores del servidor, compartidos por todos los hilos que atienden peticiones
+class MockState:
+    def __init__(self, latency=0.2, jitter=0.1, tokens_per_second=200.0, rate_limit_rate=0.0, error_rate=0.0,
+                 retry_after=0.5, seed=0, truncate_rate=0.0, link_fault_rate=0.0, malformed_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.truncate_rate = truncate_rate
+        self.link_fault_rate = link_fault_rate
+        self.malformed_rate = malformed_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {
+                "requests": 0, "streamed": 0, "rate_limited": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0,
+                "prompt_tokens": 0, "completion_tokens": 0, "truncated": 0, "link_faults": 0, "malformed": 0,
+            }
+
+    def count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self.counters[name] += value
+            self.counters["max_in_flight"] = max(self.counters["max_in_flight"], self.counters["in_flight"])
+
+    # Decide el destino de una petición: "ok", "rate_limited" o "error"; y su latencia hasta el primer byte
+    def draw(self):
+        with self._lock:
+            roll = self._random.random()
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+        if roll < self.rate_limit_rate:
+            return "rate_limited", delay
+        if roll < self.rate_limit_rate + self.error_rate:
+            return "error", delay
+        return "ok", delay
+
+    # Decide si se estropea una respuesta correcta: "truncated", "link_fault", "malformed" o None
+    def fault(self):
+        with self._lock:
+            roll = self._random.random()
+        for name, rate in (("truncated", self.truncate_rate), ("link_fault", self.link_fault_rate),
+                           ("malformed", self.malformed_rate)):
+            if roll < rate:
+                return name
+            roll -= rate
+        return None
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counters)
+
+
+# Función para contar los tokens simulados de un texto
+def count_tokens(text):
+    return max(1, len(text.encode("utf-8")) // BYTES_PER_TOKEN)
+
+
+# Función para estropear una respuesta según el fallo elegido; devuelve (contenido, finish_reason)
+def damage(payload, content, fault):
+    if fault == "truncated":
+        return content[:len(content) // 2], "length"
+    corrections = "**Texto Original:**" in (payload.get("messages") or [{}])[-1].get("content", "")
+    if fault == "link_fault" and corrections and not payload.get("response_format"):
+        match = _URL.search(content)
+        if match:
+            # Una vez alterada (se añade "www.") y otra quitada del todo
+            url = match.group()
+            replacement = url.replace("://", "://www.", 1) if len(content) % 2 else ""
+            return content[:match.start()] + replacement + content[match.end():], "stop"
+    if fault == "malformed":
+        if payload.get("response_format"):
+            return content[:-2], "stop"
+        if not corrections:
+            return _LAST_SECTION.sub("", content), "stop"
+    return content, "stop"
+
+
+# Función para elegir la respuesta de plantilla según el payload recibido
+def canned_response(payload):
+    messages = payload.get("messages", [])
+    if len(messages) > 2 and messages[-2]["role"] == "assistant":
+        # Continuación de una respuesta cortada: lo que faltaba de la plantilla del prompt original
+        partial = messages[-2]["content"]
+        original = dict(payload, messages=messages[:-2])
+        if partial.lstrip().startswith("{"):
+            original["response_format"] = {"type": "json_object"}
+        full = canned_response(original)
+        return full[len(partial):] if full.startswith(partial) else ""
+    user = next((message["content"] for message in reversed(payload.get("messages", [])) if message["role"] == "user"), "")
+    match = _ORIGINAL_TEXT.search(user)
+    original = match.group("text").strip() if match else ""
+    if payload.get("response_format"):
+        word = re.search(r"\w{4,}", original)
+        edits = []
+        if word:
+            edits.append({
+                "start": word.start(), "original": word.group(), "replacement": word.group().upper(),
+                "reason": "TIP", "note": "edición de prueba",
+            })
+        return json.dumps({"edits": edits}, ensure_ascii=False)
+    if "**Texto Original:**" in user:
+        paragraphs = original.split("\n\n")
+        return "\n\n".join(paragraph + (JUSTIFICATION if index % 2 == 0 else "") for index, paragraph in enumerate(paragraphs))
+    if "Toma notas breves" in user:
+        return NOTES_TEMPLATE
+    if "Compara el análisis con la corrección" in user:
+        return "La corrección refleja el análisis."
+    # Análisis: la plantilla se repite hasta ocupar aproximadamente la mitad de max_tokens
+    target = payload.get("max_tokens", 1000) // 2
+    repeats = max(1, target // count_tokens(ANALYSIS_TEMPLATE))
+    return "\n\n".join([ANALYSIS_TEMPLATE] * repeats)
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, como la API real
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, status, body, headers=None):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/stats":
+                self._send_json(200, state.snapshot())
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length)
+            if self.path.rstrip("/") == "/reset":
+                state.reset()
+                self._send_json(200, {"ok": True})
+                return
+            payload = json.loads(raw or b"{}")
+            state.count(requests=1, in_flight=1)
+            try:
+                self._complete(payload)
+            finally:
+                state.count(in_flight=-1)
+
+        def _complete(self, payload):
+            outcome, delay = state.draw()
+            time.sleep(delay)
+            if outcome == "rate_limited":
+                state.count(rate_limited=1)
+                self._send_json(429, {"error": {"message": "rate limit"}}, {"Retry-After": str(state.retry_after)})
+                return
+            if outcome == "error":
+                state.count(errors=1)
+                self._send_json(503, {"error": {"message": "service unavailable"}})
+                return
+
+            content = canned_response(payload)
+            fault = state.fault()
+            content, finish_reason = damage(payload, content, fault)
+            if fault:
+                state.count(**{"link_faults" if fault == "link_fault" else fault: 1})
+            prompt_tokens = sum(count_tokens(message["content"]) for message in payload.get("messages", []))
+            completion_tokens = min(count_tokens(content), payload.get("max_tokens") or count_tokens(content))
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                     "total_tokens": prompt_tokens + completion_tokens}
+            state.count(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+            if not payload.get("stream"):
+                time.sleep(completion_tokens / state.tokens_per_second)
+                self._send_json(200, {
+                    "id": "mock", "object": "chat.completion", "model": payload.get("model"),
+                    "choices": [{
+                        "index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": finish_reason,
+                    }],
+                    "usage": usage,
+                })
+                return
+
+            state.count(streamed=1)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            step = max(1, int(state.tokens_per_second * STREAM_INTERVAL * BYTES_PER_TOKEN))
+            for start in range(0, len(content), step):
+                event = {"choices": [{"index": 0, "delta": {"content": content[start:start + step]}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(STREAM_INTERVAL)
+            event = {"choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}], "usage": usage}
+            self.wfile.write(f"data: {json.dumps(event)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+            self.wfile.flush()
+            self.close_connection = True
+
+    return Handler
+
+
+# Función para arrancar el servidor en un hilo; devuelve (servidor, URL de chat/completions)
+def start(state, host="127.0.0.1", port=0):
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1/chat/completions"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.mock_together", description="API de Together simulada.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8008, help="0 elige un puerto libre")
+    parser.add_argument("--latency", type=float, default=0.2, help="Segundos hasta el primer byte")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Variación uniforme de la latencia (±segundos)")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Velocidad de generación")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Probabilidad de responder 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probabilidad de responder 503")
+    parser.add_argument("--retry-after", type=float, default=0.5, help="Valor de Retry-After en los 429")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--truncate-rate", type=float, default=0.0,
+                        help="Probabilidad de cortar una respuesta a la mitad (finish_reason length)")
+    parser.add_argument("--link-fault-rate", type=float, default=0.0,
+                        help="Probabilidad de alterar o quitar una URL de la corrección")
+    parser.add_argument("--malformed-rate", type=float, default=0.0,
+                        help="Probabilidad de romper el JSON de las ediciones o quitar una sección del análisis")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    state = MockState(args.latency, args.jitter, args.tokens_per_second, args.rate_limit_rate, args.error_rate,
+                      args.retry_after, args.seed, args.truncate_rate, args.link_fault_rate, args.malformed_rate)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    server.daemon_threads = True
+    # La primera línea es la URL, para que quien lanza el proceso sepa el puerto elegido
+    print(f"http://{args.host}:{server.server_address[1]}/v1/chat/completions", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
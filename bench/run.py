@@ -0,0 +1,372 @@
+# Banco de pruebas del camino de peticiones, sin red: lanza bench.mock_together en otro proceso y ejecuta
+# cargas de trabajo con guion sobre correccion.pipeline y correccion.service, lo mismo que llaman app.py y
+# correcciones.py.
+#
+#   python -m bench.run                                   # las tres cargas con la configuración por defecto
+#   python -m bench.run single --repeat 10 --no-stream
+#   python -m bench.run batch --documents 500 --concurrency 8 --rate-limit-rate 0.05 --json informe.json
+#   python -m bench.run incremental --rounds 5 --cache
+#   python -m bench.run single --prompts full              # comparar los tokens de entrada con --prompts compact
+#   python -m bench.run single --fanout                     # análisis por secciones en paralelo
+#   python -m bench.run single --link-rate 0.3 --truncate-rate 0.1 --link-fault-rate 0.2 --malformed-rate 0.1
+#
+# Cada carga informa de la latencia por operación (p50/p95/p99), el rendimiento, la memoria, los tokens y
+# peticiones que vio el servidor simulado, los 429/5xx inyectados, los reintentos del cliente y las respuestas
+# estropeadas a propósito junto con las que correccion.validation detectó y reparó.
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import requests
+
+from correccion import (
+    cache, compaction, edits, executor, http_client, incremental, pipeline, prompts, router, service, together_api,
+    validation,
+)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+GENRE = "Drama"
+AUDIENCE = "adultos"
+WORKLOADS = ("single", "batch", "incremental")
+
+_VOCABULARY = (
+    "la casa del río guardaba silencio mientras el viento movía las cortinas viejas de la ventana "
+    "Marta recordaba a su padre cada tarde cuando la luz caía sobre el camino de tierra y los perros ladraban "
+    "nadie sabía por qué el pueblo había cambiado tanto desde aquel invierno en que cerraron la fábrica "
+    "las manos del abuelo olían a tabaco y a madera húmeda y su voz era lenta como una canción"
+).split()
+
+
+# Función para generar un texto de prueba determinista, con párrafos, diálogos y preguntas; links es la fracción
+# de párrafos que terminan con un enlace markdown
+def make_text(words, seed=0, links=0.0):
+    rng = random.Random(seed)
+    link_rng = random.Random(-seed - 1)  # Aparte, para que los enlaces no cambien el resto del texto
+    paragraphs = []
+    total = 0
+    while total < words:
+        sentences = []
+        for _ in range(rng.randint(2, 5)):
+            length = rng.randint(8, 20)
+            sentence = " ".join(rng.choice(_VOCABULARY) for _ in range(length))
+            sentence = sentence[0].upper() + sentence[1:]
+            ending = rng.choice([".", ".", ".", "?", "!"])
+            sentences.append(("¿" if ending == "?" else "¡" if ending == "!" else "") + sentence + ending)
+            total += length
+        paragraph = " ".join(sentences)
+        if rng.random() < 0.2:
+            paragraph = "—" + paragraph
+        if links and link_rng.random() < links:
+            paragraph += f" [Nota](https://ejemplo.org/notas/{seed}/{len(paragraphs)})"
+        paragraphs.append(paragraph)
+    return "\n\n".join(paragraphs)
+
+
+# Función para editar una fracción de los párrafos de un texto (la carga incremental)
+def edit_text(text, fraction, rng):
+    paragraphs = text.split("\n\n")
+    for index in rng.sample(range(len(paragraphs)), max(1, round(len(paragraphs) * fraction))):
+        paragraphs[index] = paragraphs[index].replace(" ", " muy ", 1)
+    return "\n\n".join(paragraphs)
+
+
+# Función para el percentil por rango más cercano
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+
+# Función para el pico de memoria residente del proceso, en MB (None si el sistema no lo ofrece)
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# Servidor simulado en un proceso aparte, para que no compita por el GIL con el cliente medido
+class MockServer:
+    def __init__(self, args):
+        command = [
+            sys.executable, "-m", "bench.mock_together", "--port", "0",
+            "--latency", str(args.latency), "--jitter", str(args.jitter),
+            "--tokens-per-second", str(args.tokens_per_second),
+            "--rate-limit-rate", str(args.rate_limit_rate), "--error-rate", str(args.error_rate),
+            "--retry-after", str(args.retry_after), "--seed", str(args.seed),
+            "--truncate-rate", str(args.truncate_rate), "--link-fault-rate", str(args.link_fault_rate),
+            "--malformed-rate", str(args.malformed_rate),
+        ]
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.process = subprocess.Popen(command, cwd=root, stdout=subprocess.PIPE, text=True)
+        self.url = self.process.stdout.readline().strip()
+        if not self.url:
+            raise RuntimeError("El servidor simulado no arrancó.")
+        self.base = self.url.rsplit("/v1/", 1)[0]
+
+    def stats(self):
+        return requests.get(f"{self.base}/stats", timeout=5).json()
+
+    def reset(self):
+        requests.post(f"{self.base}/reset", timeout=5)
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait(timeout=5)
+
+
+# Presentación vacía que pide las respuestas en streaming, como la interfaz
+class StreamRenderer(pipeline.Renderer):
+    stream = True
+
+
+# Carga 1: un texto de --words palabras por las mismas etapas que la interfaz. Con las 2000 por defecto supera
+# chunking.DEFAULT_CHUNK_TOKENS (unas 1500) y se procesa por fragmentos; con --words 1200 va en una sola llamada
+def run_single(args, clients):
+    text = make_text(args.words, args.seed, args.link_rate)
+    stages = [pipeline.Validate(pipeline.Analysis()), pipeline.Validate(pipeline.Correction(args.format))]
+    renderer = StreamRenderer() if args.stream else None
+    latencies = []
+    ttfts = []
+    analysis_seconds = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        state = pipeline.Pipeline(stages, pipeline.Clients("bench", **clients), renderer, args.concurrency).run(
+            GENRE, AUDIENCE, text
+        )
+        latencies.append(time.perf_counter() - start)
+        if not state["chunked"]:
+            timings = state["chunks"][0]["analysis_response"]["timings"]
+            ttfts.append(timings["ttft"])
+            analysis_seconds.append(timings["total"])
+    result = {
+        "operations": latencies, "words": service.count_words(text) * args.repeat,
+        "chunked": service.needs_chunking(text),
+    }
+    if ttfts:
+        result["ttft_p50"] = percentile(ttfts, 0.5)
+        result["analysis_p50"] = percentile(analysis_seconds, 0.5)
+    return result
+
+
+# Carga 2: un lote de documentos cortos, varios a la vez como en correccion.batch
+def run_batch(args, clients):
+    texts = [make_text(args.batch_words, args.seed + number, args.link_rate) for number in range(args.documents)]
+
+    def process(text):
+        start = time.perf_counter()
+        pipeline.process_document(
+            "bench", GENRE, AUDIENCE, text, concurrency=1, correction_format=args.format, **clients
+        )
+        return time.perf_counter() - start
+
+    latencies = [seconds for _, seconds in executor.run_ordered(texts, process, args.concurrency)]
+    return {"operations": latencies, "words": sum(service.count_words(text) for text in texts)}
+
+
+# Carga 3: un texto completo y luego varias rondas en las que se edita una fracción de sus párrafos
+def run_incremental(args, clients, server):
+    rng = random.Random(args.seed)
+    text = make_text(args.words, args.seed, args.link_rate)
+    store = incremental.SectionStore()
+    rounds = []
+    for _ in range(args.rounds + 1):
+        before = server.stats()
+        start = time.perf_counter()
+        result = pipeline.process_incremental(
+            "bench", GENRE, AUDIENCE, text, store, concurrency=args.concurrency, correction_format=args.format,
+            **clients
+        )
+        after = server.stats()
+        rounds.append({
+            "seconds": time.perf_counter() - start,
+            "reused": result["reused"],
+            "sections": result["sections"],
+            "failed": result["failed"],
+            "reprocessed_words": result["reprocessed_words"],
+            "tokens": (after["prompt_tokens"] + after["completion_tokens"])
+                      - (before["prompt_tokens"] + before["completion_tokens"]),
+        })
+        text = edit_text(text, args.edit_fraction, rng)
+    edits = rounds[1:]
+    return {
+        "operations": [entry["seconds"] for entry in edits],
+        "words": service.count_words(text) * len(edits),
+        "first_pass": rounds[0],
+        "mean_edit_tokens": sum(entry["tokens"] for entry in edits) / len(edits) if edits else 0,
+        "edit_token_ratio": (
+            sum(entry["tokens"] for entry in edits) / len(edits) / rounds[0]["tokens"] if edits and rounds[0]["tokens"] else 0
+        ),
+    }
+
+
+# Función para ejecutar una carga y reunir sus métricas
+def measure(name, args, server):
+    clients = {"limiter": executor.RateLimiter(args.rpm, args.tpm), "response_cache": None, "tier": args.tier}
+    if args.cache:
+        clients["response_cache"] = cache.ResponseCache(os.path.join(tempfile.mkdtemp(prefix="bench-"), "cache.sqlite3"))
+    server.reset()
+    retries_before = dict(http_client.retry_counters)
+    compaction_before = compaction.stats()
+    validation_before = validation.stats()
+    if args.trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    failed = None
+    try:
+        if name == "single":
+            result = run_single(args, clients)
+        elif name == "batch":
+            result = run_batch(args, clients)
+        else:
+            result = run_incremental(args, clients, server)
+    except (requests.exceptions.RequestException, service.UnexpectedResponseError, edits.EditParseError) as e:
+        failed = f"{type(e).__name__}: {e}"
+        result = {"operations": [], "words": 0}
+    wall = time.perf_counter() - start
+    traced_peak = None
+    if args.trace_memory:
+        traced_peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+
+    operations = result.pop("operations")
+    server_stats = server.stats()
+    report = {
+        "workload": name,
+        "operations": len(operations),
+        "wall_seconds": wall,
+        "p50": percentile(operations, 0.50),
+        "p95": percentile(operations, 0.95),
+        "p99": percentile(operations, 0.99),
+        "mean": sum(operations) / len(operations) if operations else 0.0,
+        "words_per_second": result.pop("words") / wall if wall > 0 else 0.0,
+        "operations_per_second": len(operations) / wall if wall > 0 else 0.0,
+        "requests": server_stats["requests"],
+        "max_in_flight": server_stats["max_in_flight"],
+        "prompt_tokens": server_stats["prompt_tokens"],
+        "completion_tokens": server_stats["completion_tokens"],
+        "injected_429": server_stats["rate_limited"],
+        "injected_5xx": server_stats["errors"],
+        "injected_faults": {key: server_stats[key] for key in ("truncated", "link_faults", "malformed")},
+        "client_retries": {key: http_client.retry_counters[key] - retries_before.get(key, 0) for key in retries_before},
+        "rate_limiter": clients["limiter"].stats(),
+        "compaction": {key: value - compaction_before[key] for key, value in compaction.stats().items()},
+        "validation": {key: value - validation_before[key] for key, value in validation.stats().items()},
+        "peak_rss_mb": peak_rss_mb(),
+        "traced_peak_mb": traced_peak,
+        **result,
+    }
+    if args.tier:
+        report["models"] = router.model_router.snapshot()
+    if clients["response_cache"] is not None:
+        report["cache"] = clients["response_cache"].stats()
+    if failed:
+        report["error"] = failed
+    return report
+
+
+def _detected(failures):
+    return sum(failures[mode] for mode in validation.FAILURE_MODES)
+
+
+def _repaired(failures):
+    return sum(failures[f"{mode}_repaired"] for mode in validation.FAILURE_MODES)
+
+
+# Función para imprimir un resumen legible de cada carga
+def print_summary(reports):
+    for report in reports:
+        print(
+            f"{report['workload']:<12} ops={report['operations']:<4} "
+            f"p50={report['p50']:.3f}s p95={report['p95']:.3f}s p99={report['p99']:.3f}s "
+            f"palabras/s={report['words_per_second']:.0f} peticiones={report['requests']} "
+            f"tokens={report['prompt_tokens']}+{report['completion_tokens']} "
+            f"429={report['injected_429']} 5xx={report['injected_5xx']} "
+            f"reparadas={_repaired(report['validation'])}/{_detected(report['validation'])} "
+            f"rss={report['peak_rss_mb'] or 0:.0f}MB" + (f" ERROR {report['error']}" if report.get("error") else ""),
+            file=sys.stderr,
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.run", description="Banco de pruebas sin red.")
+    parser.add_argument("workloads", nargs="*", help=f"Cargas a ejecutar: {', '.join(WORKLOADS)} (por defecto, todas)")
+    workload = parser.add_argument_group("cargas")
+    workload.add_argument("--words", type=int, default=2000, help="Palabras del texto de single e incremental")
+    workload.add_argument("--repeat", type=int, default=5, help="Repeticiones de single")
+    workload.add_argument("--documents", type=int, default=500, help="Documentos del lote")
+    workload.add_argument("--batch-words", type=int, default=300, help="Palabras por documento del lote")
+    workload.add_argument("--rounds", type=int, default=5, help="Rondas de edición de incremental")
+    workload.add_argument("--edit-fraction", type=float, default=0.05, help="Fracción de párrafos editados por ronda")
+    workload.add_argument("--link-rate", type=float, default=0.0, help="Fracción de párrafos con un enlace")
+    client = parser.add_argument_group("cliente")
+    client.add_argument("--concurrency", type=int, default=executor.DEFAULT_CONCURRENCY)
+    client.add_argument("--format", choices=service.CORRECTION_FORMATS, default="inline")
+    client.add_argument("--tier", choices=router.TIERS, help="Enrutar por nivel de servicio (por defecto, modelos fijos)")
+    client.add_argument("--prompts", choices=("compact", "full"),
+                        default="compact" if prompts.COMPACT_PROMPTS else "full",
+                        help="Prompts de corrección compactos o completos")
+    client.add_argument("--fanout", action=argparse.BooleanOptionalAction, default=prompts.ANALYSIS_FANOUT,
+                        help="Pedir cada sección del análisis en una petición aparte, todas a la vez")
+    client.add_argument("--stream", action=argparse.BooleanOptionalAction, default=True)
+    client.add_argument("--cache", action="store_true", help="Usar una caché de respuestas nueva en un directorio temporal")
+    client.add_argument("--rpm", type=float, default=100000, help="Peticiones por minuto del limitador")
+    client.add_argument("--tpm", type=float, default=10 ** 9, help="Tokens por minuto del limitador")
+    client.add_argument("--trace-memory", action="store_true", help="Medir el pico de memoria de Python (más lento)")
+    server = parser.add_argument_group("servidor simulado")
+    server.add_argument("--latency", type=float, default=0.2)
+    server.add_argument("--jitter", type=float, default=0.1)
+    server.add_argument("--tokens-per-second", type=float, default=2000.0)
+    server.add_argument("--rate-limit-rate", type=float, default=0.0)
+    server.add_argument("--error-rate", type=float, default=0.0)
+    server.add_argument("--retry-after", type=float, default=0.2)
+    server.add_argument("--seed", type=int, default=0)
+    server.add_argument("--truncate-rate", type=float, default=0.0, help="Respuestas cortadas por max_tokens")
+    server.add_argument("--link-fault-rate", type=float, default=0.0,
+                        help="Correcciones con una URL alterada o quitada")
+    server.add_argument("--malformed-rate", type=float, default=0.0,
+                        help="Ediciones con JSON roto y análisis sin una sección")
+    parser.add_argument("--json", help="Guardar el informe completo en este archivo")
+    args = parser.parse_args(argv)
+    unknown = set(args.workloads) - set(WORKLOADS)
+    if unknown:
+        parser.error(f"cargas desconocidas: {', '.join(sorted(unknown))}")
+    args.workloads = args.workloads or list(WORKLOADS)
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    prompts.COMPACT_PROMPTS = args.prompts == "compact"
+    prompts.ANALYSIS_FANOUT = args.fanout
+    server = MockServer(args)
+    together_api.API_URL = server.url
+    reports = []
+    try:
+        for name in args.workloads:
+            reports.append(measure(name, args, server))
+    finally:
+        server.close()
+    print_summary(reports)
+    output = json.dumps(reports, ensure_ascii=False, indent=2)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            handle.write(output + "\n")
+    else:
+        print(output)
+    return 1 if any(report.get("error") for report in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
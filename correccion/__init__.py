@@ -0,0 +1,3 @@
+# Núcleo compartido de las aplicaciones de análisis literario y corrección de estilo.
+# Este paquete no importa Streamlit: las interfaces (app.py, correcciones.py, a través de interfaz.py) componen
+# las etapas de correccion.pipeline y los errores se propagan como excepciones para que cada interfaz los muestre.
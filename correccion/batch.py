@@ -0,0 +1,269 @@
+# Modo por lotes sin interfaz: analiza y corrige un directorio de manuscritos o un manifiesto JSONL.
+#
+#   python -m correccion.batch manuscritos/ -o resultados.jsonl --genre Fantasía --audience adultos
+#   python -m correccion.batch manifiesto.jsonl -o resultados.jsonl --concurrency 8
+#
+# Cada línea del manifiesto es un objeto con "path" o "text" y, opcionalmente, "id", "genre" y "audience".
+# El archivo de salida sirve de punto de control: al relanzar se omiten los documentos ya procesados sin error.
+import argparse
+import json
+import os
+import sys
+
+import requests
+
+from correccion import cache, executor, pipeline, results, router, service, validation
+
+SUPPORTED_EXTENSIONS = (".txt", ".md", ".docx")
+
+
+# Función para leer el texto de un archivo admitido (los .docx se leen párrafo a párrafo)
+def read_document(path):
+    if path.lower().endswith(".docx"):
+        return service.read_docx(path)
+    with open(path, encoding="utf-8") as handle:
+        return handle.read()
+
+
+# Función para recorrer los documentos de un directorio (recursivo) o de un manifiesto JSONL. Una línea del manifiesto
+# que no se puede procesar (JSON inválido, sin "path" ni "text") se devuelve con "error" y el lote sigue.
+def iter_documents(source, genre, audience):
+    if os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    yield {"id": os.path.relpath(path, source), "path": path, "genre": genre, "audience": audience}
+        return
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, encoding="utf-8") as handle:
+        for number, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError as e:
+                yield _invalid_entry(number, genre, audience, f"JSON inválido en la línea {number}: {e}")
+                continue
+            if not isinstance(entry, dict):
+                yield _invalid_entry(number, genre, audience, f"La línea {number} no es un objeto JSON.")
+                continue
+            path, text = (entry.get(key) if isinstance(entry.get(key), str) else None for key in ("path", "text"))
+            if not path and text is None:
+                yield _invalid_entry(
+                    entry.get("id") or number, genre, audience,
+                    f'La línea {number} no tiene "path" ni "text" (como cadena de texto).',
+                )
+                continue
+            if path and not os.path.isabs(path):
+                path = os.path.join(base, path)
+            # Sin id, la ruta relativa al manifiesto: el .docx exportado se nombra con ella dentro de --docx-dir
+            default_id = os.path.relpath(path, base) if path else number
+            yield {
+                "id": str(entry.get("id") or default_id),
+                "path": path,
+                "text": text,
+                "genre": entry.get("genre", genre),
+                "audience": entry.get("audience", audience),
+            }
+
+
+def _invalid_entry(entry_id, genre, audience, error):
+    return {"id": str(entry_id), "path": None, "text": None, "genre": genre, "audience": audience, "error": error}
+
+
+# Función para leer los ids ya completados del archivo de salida
+def load_checkpoint(output):
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output, encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Última línea a medio escribir tras una caída
+            if not record.get("error"):
+                done.add(record["id"])
+    return done
+
+
+# Función para recortar el archivo de salida tras su último salto de línea. Una línea a medio escribir tras una caída
+# quedaría pegada al primer registro añadido al reanudar y los dos se perderían; devuelve los bytes recortados.
+def trim_checkpoint(output, block_size=4096):
+    if not os.path.exists(output):
+        return 0
+    with open(output, "rb+") as handle:
+        end = position = handle.seek(0, os.SEEK_END)
+        keep = 0
+        while position > 0:
+            start = max(0, position - block_size)
+            handle.seek(start)
+            newline = handle.read(position - start).rfind(b"\n")
+            if newline != -1:
+                keep = start + newline + 1
+                break
+            position = start
+        if keep < end:
+            handle.truncate(keep)
+    return end - keep
+
+
+# Función para obtener la ruta del .docx exportado de un documento dentro de docx_dir. Del id sólo se usan sus partes
+# normales (sin unidad, raíz, "." ni ".."); si aun así la ruta resuelta sale de docx_dir o coincide con el manuscrito
+# original, lanza ValueError en lugar de escribir fuera o sobrescribirlo.
+def export_path(docx_dir, entry_id, source=None):
+    parts = [
+        part for part in os.path.splitdrive(str(entry_id))[1].replace("\\", "/").split("/")
+        if part not in ("", ".", "..")
+    ]
+    if not parts:
+        raise ValueError(f"El id {entry_id!r} no sirve como nombre de archivo.")
+    root = os.path.realpath(docx_dir)
+    path = os.path.realpath(os.path.splitext(os.path.join(root, *parts))[0] + ".docx")
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f"El .docx de {entry_id!r} quedaría fuera de {docx_dir}.")
+    if source and os.path.realpath(source) == path:
+        raise ValueError(f"El .docx de {entry_id!r} sobrescribiría el manuscrito original.")
+    return path
+
+
+# Función para guardar la corrección de un documento como .docx (cambios marcados en el formato "edits")
+def export_entry(docx_dir, entry_id, text, record, source=None):
+    path = export_path(docx_dir, entry_id, source)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if "edits" in record:
+        service.export_docx(path, tracked=service.tracked_chunks(text, record["edits"]))
+    else:
+        service.export_docx(path, [record["correction"]])
+    return path
+
+
+# Función para procesar un documento; los errores se devuelven en el registro para no detener el lote
+def process_entry(entry, api_key, response_cache, limiter, concurrency, correction_format, use_prepass=True,
+                  tier=None, docx_dir=None, result_store=None):
+    record = {"id": entry["id"], "path": entry.get("path"), "genre": entry["genre"], "audience": entry["audience"]}
+    if entry.get("error"):
+        record["error"] = f"ValueError: {entry['error']}"
+        return record
+    try:
+        text = entry["text"] if entry.get("text") is not None else read_document(entry["path"])
+        stages = [pipeline.Validate(pipeline.Analysis()), pipeline.Validate(pipeline.Correction(correction_format))]
+        if use_prepass:
+            stages.insert(0, pipeline.Prepass())
+        if result_store is not None:
+            stages.append(pipeline.Record(result_store))
+        clients = pipeline.Clients(api_key, response_cache, limiter, tier)
+        state = pipeline.Pipeline(stages, clients, concurrency=concurrency).run(entry["genre"], entry["audience"], text)
+        if use_prepass:
+            record["prepass"] = {
+                "edits": len(state["prepass"]["edits"]),
+                "flags": len(state["prepass"]["flags"]),
+                "saved_tokens": state["prepass"]["saved_tokens"],
+            }
+        record.update(pipeline.document_result(state, correction_format))
+        if docx_dir:
+            record["docx"] = export_entry(docx_dir, entry["id"], state["text"], record, entry.get("path"))
+    except (OSError, ValueError, requests.exceptions.RequestException, service.UnexpectedResponseError) as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    return record
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m correccion.batch",
+        description="Analiza y corrige por lotes manuscritos .txt, .md y .docx.",
+    )
+    parser.add_argument("source", help="Directorio con manuscritos o manifiesto .jsonl")
+    parser.add_argument("-o", "--output", required=True, help="Archivo JSONL de resultados (también punto de control)")
+    parser.add_argument("--genre", default="Otro", help="Género por defecto")
+    parser.add_argument("--audience", default="adultos", help="Audiencia por defecto")
+    parser.add_argument("--concurrency", type=int, default=executor.DEFAULT_CONCURRENCY,
+                        help="Documentos procesados a la vez")
+    parser.add_argument("--chunk-concurrency", type=int, default=1,
+                        help="Fragmentos en paralelo dentro de cada documento largo")
+    parser.add_argument("--format", choices=service.CORRECTION_FORMATS, default="inline",
+                        help="inline: texto con justificaciones; edits: lista de ediciones aplicada localmente")
+    parser.add_argument("--no-prepass", action="store_true",
+                        help="No aplicar el prepaso local de tipografía y faltas frecuentes")
+    parser.add_argument("--tier", choices=router.TIERS,
+                        help="Nivel de servicio: elige el modelo de cada etapa y usa otros de respaldo "
+                             "(por defecto, los modelos fijos)")
+    parser.add_argument("--docx-dir", help="Directorio donde guardar cada corrección como .docx")
+    parser.add_argument("--cache-path", default=cache.DEFAULT_PATH, help="Base SQLite de la caché de respuestas")
+    parser.add_argument("--no-cache", action="store_true", help="No usar la caché de respuestas")
+    parser.add_argument("--results-path", default=results.DEFAULT_PATH,
+                        help="Base SQLite del historial de análisis con búsqueda")
+    parser.add_argument("--no-results", action="store_true", help="No guardar los resultados en el historial")
+    parser.add_argument("--restart", action="store_true", help="Ignorar el punto de control y reprocesar todo")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    api_key = os.environ.get("TOGETHER_API_KEY")
+    if not api_key:
+        print("Define la variable de entorno TOGETHER_API_KEY.", file=sys.stderr)
+        return 2
+
+    response_cache = None if args.no_cache else cache.ResponseCache(args.cache_path)
+    result_store = None if args.no_results else results.ResultStore(args.results_path)
+    limiter = executor.RateLimiter()
+    if not args.restart:
+        trim_checkpoint(args.output)
+    done = set() if args.restart else load_checkpoint(args.output)
+    skipped = 0
+
+    def pending():
+        nonlocal skipped
+        for entry in iter_documents(args.source, args.genre, args.audience):
+            if entry["id"] in done:
+                skipped += 1
+                continue
+            yield entry
+
+    meter = executor.ThroughputMeter()
+    processed = failed = 0
+    with open(args.output, "w" if args.restart else "a", encoding="utf-8") as output:
+        for entry, record in executor.run_ordered(
+            pending(),
+            lambda entry: process_entry(
+                entry, api_key, response_cache, limiter, args.chunk_concurrency, args.format, not args.no_prepass,
+                args.tier, args.docx_dir, result_store
+            ),
+            args.concurrency,
+        ):
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            os.fsync(output.fileno())  # El punto de control debe sobrevivir a una caída
+            if record.get("error"):
+                failed += 1
+                print(f"✗ {entry['id']}: {record['error']}", file=sys.stderr)
+            else:
+                processed += 1
+                meter.add(record["words"])
+                print(f"✓ {entry['id']} ({record['words']} palabras, {record['seconds']:.1f} s)", file=sys.stderr)
+
+    if result_store is not None:
+        result_store.flush()
+    report = meter.report()
+    summary = {
+        "processed": processed,
+        "failed": failed,
+        "skipped": skipped,
+        **report,
+        "documents_per_minute": processed / report["seconds"] * 60 if report["seconds"] > 0 else 0.0,
+    }
+    if response_cache is not None:
+        summary["cache"] = response_cache.stats()
+    summary["rate_limiter"] = limiter.stats()
+    summary["validation"] = validation.stats()
+    if args.tier:
+        summary["models"] = router.model_router.snapshot()
+    print(json.dumps(summary, ensure_ascii=False, indent=2), file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
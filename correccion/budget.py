@@ -0,0 +1,133 @@
+import os
+import re
+from functools import lru_cache
+
+from correccion.models import model_info
+
+# Bytes UTF-8 que cubre cada token adicional de una palabra, por familia, calibrados con prosa
+# literaria en español (~1.3 tokens por palabra en Llama 3, ~1.7 en Mistral). Las vocales
+# acentuadas y la ñ ocupan dos bytes, así que encarecen la palabra como en el BPE real.
+BYTES_PER_TOKEN = {"llama3": 6, "mistral": 4}
+
+MESSAGE_OVERHEAD = 4  # Tokens de plantilla de chat por mensaje
+REPLY_OVERHEAD = 3  # Tokens que abren la respuesta del asistente
+SAFETY_MARGIN = 256  # Holgura entre prompt + salida y la ventana de contexto
+MIN_COMPLETION_TOKENS = 256  # Por debajo de esto no merece la pena enviar la petición
+
+# Directorio opcional con tokenizer.json por familia (llama3.json, mistral.json) para un conteo exacto
+TOKENIZERS_DIR = os.environ.get("CORRECCION_TOKENIZERS_DIR")
+
+_PIECES = re.compile(r"\w+|[^\w\s]+")
+
+
+# Error para peticiones que no caben en la ventana de contexto del modelo
+class BudgetExceededError(ValueError):
+    def __init__(self, model, prompt_tokens, context):
+        super().__init__(
+            f"El prompt ({prompt_tokens} tokens) no deja espacio para la respuesta en {model} "
+            f"(contexto de {context} tokens)."
+        )
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.context = context
+
+
+# Estimador rápido: cada palabra o grupo de signos es un token, más uno por cada bytes_per_token bytes extra
+class HeuristicTokenizer:
+    def __init__(self, bytes_per_token):
+        self.bytes_per_token = bytes_per_token
+
+    def count(self, text):
+        per_token = self.bytes_per_token
+        return sum(1 + (len(piece.encode("utf-8")) - 1) // per_token for piece in _PIECES.findall(text))
+
+
+# Adaptador para la librería opcional tokenizers de Hugging Face
+class ExactTokenizer:
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+
+    def count(self, text):
+        return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+# Función para obtener (una sola vez por proceso) el tokenizador de una familia
+@lru_cache(maxsize=None)
+def get_tokenizer(family):
+    if TOKENIZERS_DIR:
+        path = os.path.join(TOKENIZERS_DIR, f"{family}.json")
+        if os.path.exists(path):
+            try:
+                from tokenizers import Tokenizer
+            except ImportError:
+                pass
+            else:
+                return ExactTokenizer(Tokenizer.from_file(path))
+    return HeuristicTokenizer(BYTES_PER_TOKEN.get(family, BYTES_PER_TOKEN["llama3"]))
+
+
+# Función para contar los tokens de un texto con el tokenizador del modelo
+def count_tokens(text, model=None):
+    family = model_info(model)["tokenizer"] if model else "llama3"
+    return get_tokenizer(family).count(text)
+
+
+# Función para estimar los tokens de entrada de una lista de mensajes de chat
+def count_prompt_tokens(messages, model):
+    tokenizer = get_tokenizer(model_info(model)["tokenizer"])
+    return sum(tokenizer.count(message["content"]) + MESSAGE_OVERHEAD for message in messages) + REPLY_OVERHEAD
+
+
+# Salida deseada del análisis: crece con el texto hasta el máximo original de 2000 tokens
+def analysis_max_tokens(text_tokens):
+    return min(2000, 600 + text_tokens // 2)
+
+
+# Salida deseada de una sección del análisis en abanico: el análisis completo repartido entre las secciones,
+# así el total de tokens de salida no crece
+def section_max_tokens(text_tokens, sections):
+    return analysis_max_tokens(text_tokens) // sections
+
+
+# Salida deseada de las notas de una sección (reanálisis incremental): viñetas breves
+def notes_max_tokens(text_tokens):
+    return min(600, 150 + text_tokens // 3)
+
+
+# Salida deseada de la corrección: el texto completo más las justificaciones inline
+def correction_max_tokens(text_tokens):
+    return min(8000, max(512, int(text_tokens * 1.6) + 300))
+
+
+# Salida deseada de la lista de ediciones: crece con el número de cambios, no con la longitud del texto
+def edits_max_tokens(text_tokens):
+    return min(3000, 300 + text_tokens // 2)
+
+
+# Función para ajustar max_tokens a lo que deja libre el prompt en la ventana de contexto
+def fit_max_tokens(model, messages, desired):
+    context = model_info(model)["context"]
+    prompt_tokens = count_prompt_tokens(messages, model)
+    available = context - prompt_tokens - SAFETY_MARGIN
+    if available < MIN_COMPLETION_TOKENS:
+        raise BudgetExceededError(model, prompt_tokens, context)
+    return min(desired, available)
+
+
+# Función para estimar el costo (USD) de una llamada
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    info = model_info(model)
+    return (prompt_tokens * info["input_price"] + completion_tokens * info["output_price"]) / 1_000_000
+
+
+# Función para el presupuesto de un payload ya armado: tokens de entrada, salida máxima y costo máximo
+def plan_payload(payload):
+    prompt_tokens = count_prompt_tokens(payload["messages"], payload["model"])
+    max_tokens = payload.get("max_tokens", 0)
+    return {
+        "model": payload["model"],
+        "prompt_tokens": prompt_tokens,
+        "max_tokens": max_tokens,
+        "context": model_info(payload["model"])["context"],
+        "max_cost": estimate_cost(payload["model"], prompt_tokens, max_tokens),
+    }
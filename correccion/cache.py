@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# Ubicación y límites por defecto de la caché de respuestas
+DEFAULT_PATH = os.environ.get("CORRECCION_CACHE_PATH", os.path.join(".cache", "respuestas.sqlite3"))
+DEFAULT_TTL = 7 * 24 * 3600  # Segundos que una respuesta sigue siendo válida
+DEFAULT_MAX_ENTRIES = 5000  # Entradas en disco antes de desalojar las menos usadas
+DEFAULT_MEMORY_ENTRIES = 256  # Entradas en el nivel LRU en memoria
+
+_SPACES = re.compile(r"[ \t ]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+# Función para normalizar un texto antes de calcular su huella (Unicode NFC, saltos y espacios)
+def normalize_text(text):
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n")
+    text = "\n".join(_SPACES.sub(" ", line).strip() for line in text.split("\n"))
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+# Función para calcular la clave de caché: modelo, versión de plantilla, muestreo y campos de entrada
+def cache_key(model, template_version, params, **fields):
+    fields = {name: normalize_text(value) if isinstance(value, str) else value for name, value in fields.items()}
+    material = json.dumps(
+        {"model": model, "template_version": template_version, "params": params, "fields": fields},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+# Función para calcular la clave a partir de un payload ya armado (modelo y parámetros de muestreo incluidos)
+def payload_cache_key(payload, template_version, **fields):
+    params = {name: value for name, value in payload.items() if name not in ("model", "messages", "stream")}
+    return cache_key(payload["model"], template_version, params, **fields)
+
+
+# Caché de dos niveles: LRU en memoria del proceso delante de SQLite en disco.
+# Los valores se guardan como JSON, así cada get devuelve una copia que el llamador puede modificar.
+class ResponseCache:
+    def __init__(self, path=DEFAULT_PATH, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES,
+                 memory_entries=DEFAULT_MEMORY_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        # path=None deja sólo el nivel en memoria
+        self._db = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    def _remember(self, key, raw, created):
+        self._memory[key] = (raw, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] <= self.ttl:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return json.loads(entry[0])
+            self._memory.pop(key, None)
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None and now - row[1] <= self.ttl:
+                    self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                    self._remember(key, row[0], row[1])
+                    self.counters["disk_hits"] += 1
+                    return json.loads(row[0])
+                if row is not None:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+            self.counters["misses"] += 1
+            return None
+
+    def set(self, key, value):
+        raw = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._remember(key, raw, now)
+            self.counters["writes"] += 1
+            if self._db is None:
+                return
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, raw, now, now))
+            self._evict(now)
+
+    # Desaloja lo caducado y, si se supera el tamaño máximo, lo menos usado recientemente
+    def _evict(self, now):
+        cursor = self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        evicted = cursor.rowcount
+        count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            cursor = self._db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                (count - self.max_entries,),
+            )
+            evicted += cursor.rowcount
+        self.counters["evictions"] += max(evicted, 0)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+
+    def stats(self):
+        with self._lock:
+            hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+            lookups = hits + self.counters["misses"]
+            entries = len(self._memory)
+            if self._db is not None:
+                entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {
+                **self.counters,
+                "hits": hits,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "entries": entries,
+            }
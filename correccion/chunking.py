@@ -0,0 +1,157 @@
+import re
+from collections import namedtuple
+
+from correccion import budget
+
+# Presupuesto por fragmento: unas 1500 palabras de prosa en español (~1,65 tokens por palabra). Los modelos de la
+# tabla (models.MODELS) tienen 32768 tokens de contexto o más; el límite viene de la salida: con 2600 tokens la
+# corrección (budget.correction_max_tokens, ≈ 4460) queda lejos del tope de 8000, y prompt, texto y corrección
+# caben aún en los 8192 que models.DEFAULT_MODEL_INFO supone para modelos fuera de la tabla
+DEFAULT_CHUNK_TOKENS = 2600
+DEFAULT_OVERLAP_TOKENS = 150  # Contexto previo que acompaña a cada fragmento (no se corrige)
+
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+_SCENE_BREAK = re.compile(r"^\s*(?:(?:[*#~]\s*){3,}|[-–—_]{3,}|#)\s*$")
+_SENTENCE_END = re.compile(r"(?<=[.!?…»”])\s+")
+_HEADING = re.compile(r"^\s*(?:#{1,6}\s*|\d+[.)]\s*)?\*\*(?P<title>[^*]+?)\*\*:?\s*$|^\s*#{1,6}\s+(?P<plain>.+?)\s*$")
+
+# Fragmento de un manuscrito: context es la cola del fragmento anterior, body lo que se corrige
+Chunk = namedtuple("Chunk", ["index", "context", "body"])
+
+
+# Función para recorrer los párrafos de un texto (separados por líneas en blanco)
+def iter_paragraphs(text):
+    for paragraph in _PARAGRAPH_BREAK.split(text.replace("\r\n", "\n")):
+        paragraph = paragraph.strip("\n")
+        if paragraph.strip():
+            yield paragraph
+
+
+# Función para saber si un párrafo es un separador de escena (***, * * *, ---, #)
+def is_scene_break(paragraph):
+    return bool(_SCENE_BREAK.match(paragraph))
+
+
+# Función para partir un párrafo demasiado largo por oraciones
+def _split_long_paragraph(paragraph, max_tokens, count_tokens):
+    piece = []
+    piece_tokens = 0
+    for sentence in _SENTENCE_END.split(paragraph):
+        tokens = count_tokens(sentence)
+        if piece and piece_tokens + tokens > max_tokens:
+            yield " ".join(piece)
+            piece, piece_tokens = [], 0
+        piece.append(sentence)
+        piece_tokens += tokens
+    if piece:
+        yield " ".join(piece)
+
+
+# Función para tomar la cola de un fragmento como contexto del siguiente
+def _overlap(paragraphs, overlap_tokens, count_tokens):
+    if overlap_tokens <= 0 or not paragraphs:
+        return ""
+    tail = []
+    used = 0
+    for paragraph in reversed(paragraphs):
+        tokens = count_tokens(paragraph)
+        if used + tokens > overlap_tokens:
+            if not tail:
+                # Ni siquiera cabe el último párrafo: nos quedamos con su final, cortado en un límite de palabra
+                words = paragraph.split()
+                while words and used < overlap_tokens:
+                    tail.insert(0, words.pop())
+                    used += count_tokens(tail[0]) + 1
+                return " ".join(tail)
+            break
+        tail.insert(0, paragraph)
+        used += tokens
+    return "\n\n".join(tail)
+
+
+# Función para agrupar un iterable de párrafos en fragmentos dentro del presupuesto de tokens.
+# Es un generador: sólo mantiene en memoria el fragmento en curso.
+def chunk_paragraphs(paragraphs, max_tokens=DEFAULT_CHUNK_TOKENS, overlap_tokens=DEFAULT_OVERLAP_TOKENS,
+                     count_tokens=budget.count_tokens):
+    current = []
+    current_tokens = 0
+    context = ""
+    index = 0
+
+    def flush():
+        nonlocal current, current_tokens, context, index
+        chunk = Chunk(index, context, "\n\n".join(current))
+        context = _overlap(current, overlap_tokens, count_tokens)
+        current, current_tokens = [], 0
+        index += 1
+        return chunk
+
+    for paragraph in paragraphs:
+        # Un cambio de escena es el mejor punto de corte si el fragmento ya va por la mitad
+        if is_scene_break(paragraph) and current_tokens >= max_tokens // 2:
+            yield flush()
+        pieces = [paragraph]
+        if count_tokens(paragraph) > max_tokens:
+            pieces = _split_long_paragraph(paragraph, max_tokens, count_tokens)
+        for piece in pieces:
+            tokens = count_tokens(piece)
+            if current and current_tokens + tokens > max_tokens:
+                yield flush()
+            current.append(piece)
+            current_tokens += tokens
+    if current:
+        yield flush()
+
+
+# Función para dividir un texto completo en fragmentos
+def split_into_chunks(text, max_tokens=DEFAULT_CHUNK_TOKENS, overlap_tokens=DEFAULT_OVERLAP_TOKENS,
+                      count_tokens=budget.count_tokens):
+    return chunk_paragraphs(iter_paragraphs(text), max_tokens, overlap_tokens, count_tokens)
+
+
+# Función para unir los fragmentos corregidos en un solo texto
+def stitch(corrected_bodies):
+    return "\n\n".join(body.strip() for body in corrected_bodies if body)
+
+
+# Función para separar un análisis en secciones según sus encabezados (**Temas**, ### Estilo...)
+def split_sections(analysis):
+    sections = []
+    title = None
+    lines = []
+    for line in analysis.splitlines():
+        match = _HEADING.match(line)
+        if match:
+            if title is not None or "".join(lines).strip():
+                sections.append((title, "\n".join(lines).strip()))
+            title = (match.group("title") or match.group("plain")).strip().rstrip(":")
+            lines = []
+        else:
+            lines.append(line)
+    if title is not None or "".join(lines).strip():
+        sections.append((title, "\n".join(lines).strip()))
+    return sections
+
+
+# Función para fusionar los análisis por fragmento en un único informe agrupado por sección. Con labels cada parte
+# lleva el número de su fragmento; sin ellas (las decenas de secciones breves del reanálisis incremental) las
+# notas de cada sección se suceden en el orden del texto.
+def merge_analyses(analyses, labels=True):
+    analyses = [analysis for analysis in analyses if analysis]
+    if len(analyses) <= 1:
+        return analyses[0] if analyses else ""
+
+    merged = {}
+    titles = {}
+    for number, analysis in enumerate(analyses, start=1):
+        for title, body in split_sections(analysis):
+            if not body:
+                continue
+            title = title or "Observaciones generales"
+            key = re.sub(r"\W+", " ", title).strip().casefold()
+            titles.setdefault(key, title)
+            merged.setdefault(key, []).append(f"*Fragmento {number}:*\n\n{body}" if labels else body)
+
+    return "\n\n".join(
+        f"**{titles[key]}**\n\n" + "\n\n".join(bodies) for key, bodies in merged.items()
+    )
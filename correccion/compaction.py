@@ -0,0 +1,90 @@
+import re
+import threading
+from functools import lru_cache
+
+from correccion import budget, chunking
+
+# Destilado del análisis para el prompt de la corrección: sólo las recomendaciones accionables, en viñetas cortas
+DISTILLED_TOKENS = 350  # Tope de tokens de las viñetas
+BULLET_WORDS = 45  # Palabras máximas por viñeta
+
+# Frases que piden un cambio: verbos de recomendación, imperativos y condicionales habituales en los análisis
+_ACTIONABLE = re.compile(
+    r"\b(?:conviene|convendría|recomiend\w*|suger\w*|sugier\w*|podría\w*|debería\w*|deberá\w*|necesita\w*|"
+    r"considera\w*|evita\w*|elimin\w*|reduc\w*|añad\w*|agreg\w*|incorpor\w*|usa|utiliza\w*|emplea\w*|"
+    r"revis\w*|ajust\w*|vari\w*|aclar\w*|simplific\w*|acort\w*|divid\w*|refuerz\w*|reforz\w*|mejor\w*|"
+    r"sustitu\w*|reemplaz\w*|cambi\w*|prueba|intenta\w*|falta\w*|sobra\w*|exces\w*|demasiad\w*|abusa\w*|"
+    r"repetitiv\w*|redundan\w*|abrupt\w*|confus\w*|abund\w*|escas\w*|débil\w*|forzad\w*)\b",
+    re.IGNORECASE,
+)
+_SENTENCE = re.compile(r"(?<=[.!?…])\s+|\n+")
+_MARKUP = re.compile(r"\*\*|__|^[\s>*+\-–—•]+|^\d+[.)]\s*|^#+\s*", re.MULTILINE)
+
+_lock = threading.Lock()
+totals = {"requests": 0, "prompt_tokens": 0, "saved_tokens": 0}  # Acumulados del proceso
+_instruction_savings = {}  # (plantilla, modelo) -> tokens de instrucciones ahorrados, medidos una sola vez
+
+
+# Función para limpiar una frase del análisis: sin marcas de markdown ni viñetas, en una línea y acotada
+def _clean(sentence):
+    words = _MARKUP.sub("", sentence).split()
+    if len(words) > BULLET_WORDS:
+        words = words[:BULLET_WORDS] + ["…"]
+    return " ".join(words)
+
+
+# Función para destilar un análisis libre en viñetas de recomendaciones accionables, agrupadas por sección.
+# Si una sección no tiene ninguna frase accionable se conserva su primera frase, para no perder el tema. Se recuerdan
+# los últimos resultados: el prompt compacto y la medida de su ahorro destilan el mismo análisis.
+@lru_cache(maxsize=64)
+def distill(analysis, max_tokens=DISTILLED_TOKENS, count_tokens=budget.count_tokens):
+    if not analysis:
+        return analysis
+    bullets = []
+    for title, body in chunking.split_sections(analysis):
+        sentences = [_clean(sentence) for sentence in _SENTENCE.split(body)]
+        sentences = [sentence for sentence in sentences if len(sentence.split()) >= 3]
+        actionable = [sentence for sentence in sentences if _ACTIONABLE.search(sentence)] or sentences[:1]
+        prefix = f"{title}: " if title else ""
+        bullets += [f"- {prefix}{sentence}" for sentence in dict.fromkeys(actionable)]
+
+    kept = []
+    used = 0
+    for bullet in bullets:
+        tokens = count_tokens(bullet)
+        if kept and used + tokens > max_tokens:
+            break
+        kept.append(bullet)
+        used += tokens
+    distilled = "\n".join(kept)
+    # Un análisis ya breve se envía tal cual
+    return distilled if distilled and count_tokens(distilled) < count_tokens(analysis) else analysis
+
+
+# Función para medir el ahorro de un payload compacto frente al completo y acumularlo en el proceso, sin armar el
+# payload completo en cada llamada: lo que ahorran las instrucciones se mide una vez por plantilla y modelo con
+# build (el constructor de prompts, completo o compacto), y lo del análisis es su tamaño frente al de su destilado
+def savings(template, build, analysis, compact_payload):
+    model = compact_payload["model"]
+    key = (template, model)
+    with _lock:
+        instructions = _instruction_savings.get(key)
+    if instructions is None:
+        full = budget.count_prompt_tokens(build("", "", model=model)["messages"], model)
+        instructions = full - budget.count_prompt_tokens(build("", "", model=model, compact=True)["messages"], model)
+        with _lock:
+            _instruction_savings[key] = instructions
+    saved = instructions
+    if analysis:
+        saved += budget.count_tokens(analysis, model) - budget.count_tokens(distill(analysis), model)
+    compact = budget.count_prompt_tokens(compact_payload["messages"], model)
+    with _lock:
+        totals["requests"] += 1
+        totals["prompt_tokens"] += compact
+        totals["saved_tokens"] += saved
+    return {"full_tokens": compact + saved, "prompt_tokens": compact, "saved_tokens": saved}
+
+
+def stats():
+    with _lock:
+        return dict(totals)
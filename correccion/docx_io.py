@@ -0,0 +1,180 @@
+import html
+import re
+import time
+import zipfile
+from xml.etree.ElementTree import ParseError, iterparse
+from xml.sax.saxutils import escape
+
+from correccion.edits import REASON_CODES, Edit
+
+# Lectura y escritura de .docx sin cargar el documento entero: document.xml se recorre con iterparse párrafo a
+# párrafo y se escribe en streaming dentro del zip, así la memoria no crece con el tamaño del manuscrito.
+# Sólo se usa la biblioteca estándar (python-docx construye el árbol completo del documento en memoria).
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_DOCUMENT = "word/document.xml"
+REVISION_AUTHOR = "Corrección de estilo"  # Autor de los cambios marcados en el .docx exportado
+NOTE_COLOR = "FF0000"  # Color de las justificaciones, como en la vista anotada
+
+# Justificaciones inline que devuelve el modelo (<span style="color:red">[...]</span>) y otras etiquetas HTML
+_RED_SPAN = re.compile(r"<(span|font)\b[^>]*(?:color\s*[:=]\s*[\"']?\s*red)[^>]*>(?P<note>.*?)</\1>",
+                       re.IGNORECASE | re.DOTALL)
+_TAG = re.compile(r"<[^>]+>")
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+_INVALID_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")  # Caracteres de control que XML 1.0 no admite
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+_RELATIONSHIPS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+_DOCUMENT_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+)
+_DOCUMENT_END = "<w:sectPr/></w:body></w:document>"
+
+
+# Error para archivos que no son un .docx legible
+class DocxError(ValueError):
+    pass
+
+
+# Función para recorrer los párrafos de un .docx (ruta o archivo abierto en binario) sin cargarlo entero.
+# Los párrafos vacíos se omiten; tabulaciones y saltos de línea manuales se conservan.
+def iter_paragraphs(source):
+    try:
+        with zipfile.ZipFile(source) as package, package.open(_DOCUMENT) as document:
+            pieces = []
+            body = None
+            for event, element in iterparse(document, events=("start", "end")):
+                tag = element.tag
+                if event == "start":
+                    if tag == f"{_W}body":
+                        body = element
+                    continue
+                if tag == f"{_W}t":
+                    pieces.append(element.text or "")
+                elif tag == f"{_W}tab":
+                    pieces.append("\t")
+                elif tag in (f"{_W}br", f"{_W}cr"):
+                    pieces.append("\n")
+                elif tag == f"{_W}p":
+                    paragraph = "".join(pieces)
+                    pieces = []
+                    # Se sueltan los elementos ya leídos para que el árbol no crezca con el documento
+                    element.clear()
+                    if body is not None:
+                        body.clear()
+                    if paragraph.strip():
+                        yield paragraph
+    except (zipfile.BadZipFile, KeyError, ParseError) as e:
+        raise DocxError(f"El archivo no es un .docx válido: {e}") from e
+
+
+# Función para leer un .docx como texto con párrafos separados por líneas en blanco
+def read_text(source):
+    return "\n\n".join(iter_paragraphs(source))
+
+
+# Función para convertir un párrafo corregido con justificaciones inline en segmentos ("text" o "note", texto)
+def inline_segments(paragraph):
+    segments = []
+    position = 0
+    for match in _RED_SPAN.finditer(paragraph):
+        segments.append(("text", paragraph[position:match.start()]))
+        segments.append(("note", match.group("note")))
+        position = match.end()
+    segments.append(("text", paragraph[position:]))
+    return [(kind, html.unescape(_TAG.sub("", text))) for kind, text in segments if text]
+
+
+# Función para convertir un texto y sus ediciones (Edit o dict con sus campos) en segmentos: el texto intacto,
+# lo borrado ("del"), lo insertado ("ins") y la justificación ("note")
+def edit_segments(text, edits):
+    segments = []
+    position = 0
+    for edit in sorted((_as_edit(edit) for edit in edits), key=lambda edit: edit.start):
+        segments.append(("text", text[position:edit.start]))
+        segments.append(("del", edit.original))
+        segments.append(("ins", edit.replacement))
+        justification = REASON_CODES.get(edit.reason, edit.reason) + (f": {edit.note}" if edit.note else "")
+        segments.append(("note", f" [{justification}]"))
+        position = edit.end
+    segments.append(("text", text[position:]))
+    return [(kind, text) for kind, text in segments if text]
+
+
+def _as_edit(edit):
+    return edit if isinstance(edit, Edit) else Edit(*(edit[field] for field in Edit._fields))
+
+
+# Función para repartir segmentos en párrafos: cada línea en blanco dentro de un segmento abre uno nuevo
+def split_paragraphs(segments):
+    paragraph = []
+    for kind, text in segments:
+        parts = _PARAGRAPH_BREAK.split(text)
+        for number, part in enumerate(parts):
+            if number:
+                if paragraph:
+                    yield paragraph
+                paragraph = []
+                part = part.lstrip("\n")
+            if number < len(parts) - 1:
+                part = part.rstrip("\n")
+            if part:
+                paragraph.append((kind, part))
+    if paragraph:
+        yield paragraph
+
+
+def _run(text, properties="", deleted=False):
+    tag = "w:delText" if deleted else "w:t"
+    pieces = []
+    for number, line in enumerate(text.split("\n")):
+        if number:
+            pieces.append("<w:br/>")
+        pieces.append(f'<{tag} xml:space="preserve">{escape(_INVALID_XML.sub("", line))}</{tag}>')
+    return f"<w:r>{properties}{''.join(pieces)}</w:r>"
+
+
+# Función para escribir un .docx a partir de párrafos (listas de segmentos) en una ruta o archivo binario.
+# "del" e "ins" son cambios marcados de Word (se aceptan o rechazan desde Revisar) y "note" va en rojo.
+def write_docx(target, paragraphs, author=REVISION_AUTHOR):
+    date = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    author = escape(author, {'"': "&quot;"})
+    revision = 0
+    with zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as package:
+        package.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        package.writestr("_rels/.rels", _RELATIONSHIPS)
+        with package.open(_DOCUMENT, "w") as document:
+            document.write(_DOCUMENT_START.encode("utf-8"))
+            for segments in paragraphs:
+                xml = ["<w:p>"]
+                for kind, text in segments:
+                    if kind in ("del", "ins"):
+                        revision += 1
+                        tag = f"w:{kind}"
+                        xml.append(
+                            f'<{tag} w:id="{revision}" w:author="{author}" w:date="{date}">'
+                            f"{_run(text, deleted=kind == 'del')}</{tag}>"
+                        )
+                    elif kind == "note":
+                        xml.append(_run(text, f'<w:rPr><w:color w:val="{NOTE_COLOR}"/></w:rPr>'))
+                    else:
+                        xml.append(_run(text))
+                xml.append("</w:p>")
+                document.write("".join(xml).encode("utf-8"))
+            document.write(_DOCUMENT_END.encode("utf-8"))
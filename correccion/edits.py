@@ -0,0 +1,171 @@
+import html
+import json
+import re
+from collections import Counter, namedtuple
+
+# Códigos de motivo que puede usar el modelo en cada edición
+REASON_CODES = {
+    "ORT": "Ortografía",
+    "GRA": "Gramática",
+    "PUN": "Puntuación",
+    "TIP": "Tipografía",
+    "LEX": "Léxico",
+    "EST": "Estilo",
+    "CLA": "Claridad",
+}
+DEFAULT_REASON = "EST"
+
+# Edición validada sobre el texto original: text[start:end] == original
+Edit = namedtuple("Edit", ["start", "end", "original", "replacement", "reason", "note"])
+
+# Hipervínculos: enlaces markdown, etiquetas <a> y URLs sueltas
+_LINK = re.compile(r"\[[^\]]*\]\([^)\s]+\)|<a\s[^>]*>.*?</a>|https?://[^\s)<>\]\"']+", re.IGNORECASE | re.DOTALL)
+_URL = re.compile(r"https?://[^\s)<>\]\"']+", re.IGNORECASE)
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+
+
+# Error para respuestas que no contienen una lista de ediciones en JSON
+class EditParseError(ValueError):
+    pass
+
+
+# Función para obtener las posiciones de los hipervínculos, que ninguna edición puede tocar
+def link_spans(text):
+    return [(match.start(), match.end()) for match in _LINK.finditer(text)]
+
+
+# Función para extraer las URLs de un texto
+def extract_urls(text):
+    return _URL.findall(text)
+
+
+# Función para comparar las URLs antes y después de corregir: devuelve (perdidas, añadidas)
+def compare_urls(original, corrected):
+    before = Counter(extract_urls(original))
+    after = Counter(extract_urls(corrected))
+    return sorted((before - after).elements()), sorted((after - before).elements())
+
+
+# Función para leer la lista de ediciones de la respuesta del modelo (admite bloques ```json)
+def parse_edits(content):
+    content = _FENCE.sub("", content.strip())
+    try:
+        data = json.loads(content)
+    except ValueError:
+        start, end = content.find("{"), content.rfind("}")
+        if start == -1 or end <= start:
+            raise EditParseError("La respuesta no contiene JSON.")
+        try:
+            data = json.loads(content[start:end + 1])
+        except ValueError as e:
+            raise EditParseError(f"JSON inválido en la respuesta: {e}")
+    if isinstance(data, dict):
+        data = data.get("edits")
+    if not isinstance(data, list):
+        raise EditParseError('El JSON no tiene una lista "edits".')
+    return data
+
+
+# Función para ubicar el fragmento original: en el desplazamiento indicado o en la aparición más cercana
+def _locate(text, original, hint):
+    if 0 <= hint <= len(text) and text.startswith(original, hint):
+        return hint
+    best = None
+    position = text.find(original)
+    while position != -1:
+        if best is None or abs(position - hint) < abs(best - hint):
+            best = position
+        position = text.find(original, position + 1)
+    return best
+
+
+# Función para validar las ediciones contra el texto; devuelve (válidas ordenadas, [(edición, motivo del rechazo)])
+def validate_edits(text, raw_edits):
+    protected = link_spans(text)
+    located = []
+    rejected = []
+    for raw in raw_edits:
+        try:
+            original = str(raw["original"])
+            replacement = str(raw.get("replacement", ""))
+            hint = int(raw.get("start", -1))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            rejected.append((raw, "formato inválido"))
+            continue
+        if not original:
+            rejected.append((raw, "fragmento original vacío"))
+            continue
+        if original == replacement:
+            rejected.append((raw, "no cambia nada"))
+            continue
+        start = _locate(text, original, hint)
+        if start is None:
+            rejected.append((raw, "el fragmento original no aparece en el texto"))
+            continue
+        end = start + len(original)
+        if any(link_start < end and start < link_end for link_start, link_end in protected):
+            rejected.append((raw, "toca un hipervínculo"))
+            continue
+        reason = str(raw.get("reason", DEFAULT_REASON)).upper()[:3]
+        if reason not in REASON_CODES:
+            reason = DEFAULT_REASON
+        located.append(Edit(start, end, original, replacement, reason, str(raw.get("note", "")).strip()))
+
+    valid = []
+    last_end = -1
+    for edit in sorted(located, key=lambda edit: (edit.start, edit.end)):
+        if edit.start < last_end:
+            rejected.append((edit._asdict(), "se solapa con otra edición"))
+            continue
+        valid.append(edit)
+        last_end = edit.end
+    return valid, rejected
+
+
+# Función para aplicar ediciones validadas y obtener el texto corregido limpio
+def apply_edits(text, edits):
+    pieces = []
+    position = 0
+    for edit in edits:
+        pieces.append(text[position:edit.start])
+        pieces.append(edit.replacement)
+        position = edit.end
+    pieces.append(text[position:])
+    return "".join(pieces)
+
+
+# Función para la vista anotada: lo tachado, lo nuevo en negrita y la justificación entre corchetes en rojo
+def render_annotated(text, edits):
+    pieces = []
+    position = 0
+    for edit in edits:
+        pieces.append(text[position:edit.start])
+        if edit.original.strip():
+            pieces.append(f"~~{edit.original}~~ ")
+        # Los cambios de sólo espacios no se resaltan: la negrita vacía rompe el markdown
+        pieces.append(f"**{edit.replacement}**" if edit.replacement.strip() else edit.replacement)
+        justification = REASON_CODES[edit.reason] + (f": {edit.note}" if edit.note else "")
+        pieces.append(f' <span style="color:red">[{html.escape(justification)}]</span>')
+        position = edit.end
+    pieces.append(text[position:])
+    return "".join(pieces)
+
+
+# Función para contar las ediciones por motivo
+def summarize(edits):
+    return Counter(REASON_CODES[edit.reason] for edit in edits)
+
+
+# Función que reúne todo: ediciones válidas, rechazadas, texto corregido, vista anotada y URLs alteradas
+def resolve(text, content):
+    edits, rejected = validate_edits(text, parse_edits(content))
+    corrected = apply_edits(text, edits)
+    lost, added = compare_urls(text, corrected)
+    return {
+        "edits": edits,
+        "rejected": rejected,
+        "corrected": corrected,
+        "annotated": render_annotated(text, edits),
+        "lost_urls": lost,
+        "added_urls": added,
+    }
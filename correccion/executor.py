@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from correccion.budget import count_prompt_tokens
+
+# Límites por defecto; ajústalos a la cuota de la cuenta de Together
+DEFAULT_CONCURRENCY = int(os.environ.get("CORRECCION_CONCURRENCY", "4"))
+DEFAULT_REQUESTS_PER_MINUTE = int(os.environ.get("TOGETHER_REQUESTS_PER_MINUTE", "60"))
+DEFAULT_TOKENS_PER_MINUTE = int(os.environ.get("TOGETHER_TOKENS_PER_MINUTE", "180000"))
+
+
+# Cubeta de tokens con reservas: quien pide más de lo disponible deja el saldo en negativo
+# y espera lo que tarde en reponerse, así las peticiones se atienden en orden de llegada.
+class TokenBucket:
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    # Reserva amount y devuelve los segundos que hay que esperar antes de usarlos
+    def reserve(self, amount):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def acquire(self, amount=1):
+        wait = self.reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+# Limitador compartido por todas las llamadas: peticiones/minuto, tokens/minuto y pausas por 429
+class RateLimiter:
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.counters = {"acquired": 0, "throttled": 0, "waited_seconds": 0.0, "rate_limited": 0}
+
+    # Bloquea hasta que la llamada quepa en ambos límites y no haya una pausa por 429 en curso;
+    # devuelve los segundos de espera
+    def acquire(self, tokens):
+        wait = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        with self._lock:
+            wait = max(wait, self._paused_until - time.monotonic())
+            self.counters["acquired"] += 1
+            if wait > 0:
+                self.counters["throttled"] += 1
+                self.counters["waited_seconds"] += wait
+        if wait > 0:
+            time.sleep(wait)
+        return max(wait, 0.0)
+
+    # Tras un 429 todas las llamadas esperan lo que indique Retry-After
+    def pause(self, seconds):
+        with self._lock:
+            self.counters["rate_limited"] += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    # Tras una llamada, devuelve al límite de tokens la parte de la reserva que el campo usage no consumió
+    def settle(self, estimated, usage):
+        usage = usage or {}
+        used = (usage.get("prompt_tokens") or 0) + (usage.get("completion_tokens") or 0)
+        if 0 < used < estimated:
+            self.tokens.reserve(used - estimated)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+
+# Función para estimar los tokens que consumirá una llamada (prompt + máximo de salida)
+def estimate_payload_tokens(payload):
+    return count_prompt_tokens(payload["messages"], payload["model"]) + payload.get("max_tokens", 0)
+
+
+# Función para procesar items con un grupo acotado de hilos devolviendo (item, resultado) en el orden de entrada.
+# Sólo hay 2 × concurrency tareas en vuelo, así que consumir un generador de fragmentos no carga todo en memoria.
+def run_ordered(items, worker, concurrency=DEFAULT_CONCURRENCY):
+    window = max(1, concurrency) * 2
+    pool = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    pending = deque()
+    try:
+        for item in items:
+            pending.append((item, pool.submit(worker, item)))
+            if len(pending) >= window:
+                item, future = pending.popleft()
+                yield item, future.result()
+        while pending:
+            item, future = pending.popleft()
+            yield item, future.result()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Medidor de rendimiento en palabras por segundo
+class ThroughputMeter:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.words = 0
+
+    def add(self, words):
+        self.words += words
+
+    def report(self):
+        seconds = time.perf_counter() - self.start
+        return {
+            "words": self.words,
+            "seconds": seconds,
+            "words_per_second": self.words / seconds if seconds > 0 else 0.0,
+        }
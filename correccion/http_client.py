@@ -0,0 +1,129 @@
+import bisect
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Tiempos de espera (segundos): conexión y lectura entre bytes de la respuesta
+CONNECT_TIMEOUT = float(os.environ.get("TOGETHER_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.environ.get("TOGETHER_READ_TIMEOUT", "120"))
+
+# Reintentos ante errores 5xx y de conexión, con espera exponencial y jitter completo
+MAX_RETRIES = int(os.environ.get("TOGETHER_MAX_RETRIES", "3"))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+
+# Conexiones vivas por host; debe cubrir los fragmentos en paralelo de todas las sesiones
+POOL_SIZE = int(os.environ.get("TOGETHER_POOL_SIZE", "16"))
+
+# Límites superiores (segundos) de las cubetas del histograma de latencias
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+
+# Histograma acumulativo de latencias, seguro entre hilos
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # La última cubeta es +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self._sum += seconds
+
+    # Percentil aproximado: el límite superior de la cubeta donde cae
+    def _quantile(self, counts, total, q):
+        rank = q * total
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            running += count
+            if running >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total_sum = self._sum
+        total = sum(counts)
+        cumulative = []
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            running += count
+            cumulative.append((bound, running))
+        return {
+            "count": total,
+            "sum": total_sum,
+            "mean": total_sum / total if total else 0.0,
+            "p50": self._quantile(counts, total, 0.5) if total else 0.0,
+            "p95": self._quantile(counts, total, 0.95) if total else 0.0,
+            "buckets": cumulative,
+        }
+
+
+# Histograma del proceso: tiempo hasta tener la respuesta (cabeceras en streaming, cuerpo completo si no)
+latency_histogram = LatencyHistogram()
+retry_counters = {"connection_errors": 0, "server_errors": 0, "read_timeouts": 0, "retries": 0}
+_counters_lock = threading.Lock()
+
+_session = None
+_session_lock = threading.Lock()
+
+
+# Función para obtener la sesión compartida por todo el proceso (pool de conexiones con keep-alive).
+# Streamlit vuelve a ejecutar el script en cada interacción, pero los módulos importados persisten.
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def _count(*names):
+    with _counters_lock:
+        for name in names:
+            retry_counters[name] += 1
+
+
+# Función para calcular la espera antes del reintento número attempt (jitter completo)
+def backoff_delay(attempt):
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+# Función para hacer un POST con la sesión compartida, timeouts y reintentos. Sólo se reintentan los fallos al
+# conectar (ConnectionError, que incluye ConnectTimeout): la petición no llegó al servidor. Un ReadTimeout se lanza
+# a quien llama, porque el servidor pudo recibirla y seguir generando (y cobrando) la respuesta.
+def post(url, retries=MAX_RETRIES, timeout=None, **kwargs):
+    timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+    for attempt in range(retries + 1):
+        start = time.perf_counter()
+        try:
+            response = get_session().post(url, timeout=timeout, **kwargs)
+        except requests.exceptions.ReadTimeout:
+            _count("read_timeouts")
+            raise
+        except requests.exceptions.ConnectionError:
+            if attempt == retries:
+                _count("connection_errors")
+                raise
+            _count("connection_errors", "retries")
+            time.sleep(backoff_delay(attempt))
+            continue
+        latency_histogram.observe(time.perf_counter() - start)
+        if response.status_code >= 500 and attempt < retries:
+            _count("server_errors", "retries")
+            response.close()
+            time.sleep(backoff_delay(attempt))
+            continue
+        return response
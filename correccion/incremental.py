@@ -0,0 +1,80 @@
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+from correccion import budget, cache, chunking
+
+# Secciones del reanálisis incremental: pequeñas, para que editar un párrafo sólo invalide su sección
+SECTION_TOKENS = 200  # Tope de tokens por sección
+MIN_SECTION_TOKENS = 40  # Por debajo de esto no se corta aunque la huella lo pida
+BOUNDARY_MODULUS = 2  # Se corta tras un párrafo cuya huella es múltiplo de esto (~1 de cada 2)
+DEFAULT_STORE_ENTRIES = 1024  # Secciones recordadas por sesión
+
+# Sección de un texto: fingerprint resume las huellas de sus párrafos y es lo que identifica su resultado
+Section = namedtuple("Section", ["index", "fingerprint", "body", "paragraphs"])
+
+
+# Función para calcular la huella de un párrafo (normalizado, así los espacios sobrantes no cuentan como cambio)
+def paragraph_fingerprint(paragraph):
+    return hashlib.sha256(cache.normalize_text(paragraph).encode("utf-8")).hexdigest()
+
+
+# Función para saber si una huella marca un límite de sección. Los límites dependen del contenido y no de la
+# posición, así que insertar o borrar un párrafo sólo cambia la sección que lo contiene.
+def is_boundary(fingerprint):
+    return int(fingerprint[:8], 16) % BOUNDARY_MODULUS == 0
+
+
+# Función para dividir un texto en secciones de párrafos con límites definidos por el contenido
+def split_sections(text, max_tokens=SECTION_TOKENS, min_tokens=MIN_SECTION_TOKENS, count_tokens=budget.count_tokens):
+    current = []
+    current_tokens = 0
+    index = 0
+
+    def flush():
+        nonlocal current, current_tokens, index
+        fingerprints = [fingerprint for _, fingerprint in current]
+        section = Section(
+            index,
+            hashlib.sha256("".join(fingerprints).encode("ascii")).hexdigest(),
+            "\n\n".join(paragraph for paragraph, _ in current),
+            len(current),
+        )
+        current, current_tokens = [], 0
+        index += 1
+        return section
+
+    for paragraph in chunking.iter_paragraphs(text):
+        tokens = count_tokens(paragraph)
+        if current and current_tokens + tokens > max_tokens:
+            yield flush()
+        fingerprint = paragraph_fingerprint(paragraph)
+        current.append((paragraph, fingerprint))
+        current_tokens += tokens
+        if current_tokens >= min_tokens and is_boundary(fingerprint):
+            yield flush()
+    if current:
+        yield flush()
+
+
+# Almacén de resultados por sección de una sesión, con desalojo LRU. Delante de la caché persistente
+# (correccion.cache.ResponseCache), sirve aunque el usuario desactive la caché de respuestas.
+class SectionStore:
+    def __init__(self, max_entries=DEFAULT_STORE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,178 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Ubicación y límites por defecto de la cola de trabajos
+DEFAULT_PATH = os.environ.get("CORRECCION_JOBS_PATH", os.path.join(".cache", "trabajos.sqlite3"))
+DEFAULT_WORKERS = int(os.environ.get("CORRECCION_JOB_WORKERS", "4"))  # Trabajos ejecutándose a la vez
+DEFAULT_RETENTION = 7 * 24 * 3600  # Segundos que se conserva un trabajo terminado
+REPORT_INTERVAL = 0.5  # Segundos mínimos entre dos escrituras del avance de un mismo trabajo
+
+# Estados de un trabajo; los dos últimos son definitivos
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+
+# Error para trabajos de un tipo sin manejador registrado
+class UnknownJobKindError(Exception):
+    pass
+
+
+# Función para saber si sigue vivo el proceso dueño de un trabajo. En Windows os.kill(pid, 0) terminaría el proceso,
+# así que allí sólo se reconoce como vivo el proceso actual.
+def _process_alive(pid):
+    if pid is None:
+        return False
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # Existe, pero es de otro usuario
+        return True
+    except OSError:
+        return False
+    return True
+
+
+# Cola de trabajos en segundo plano: un grupo de hilos del proceso los ejecuta y una tabla SQLite guarda su estado,
+# su avance y su resultado, así la página puede recargarse o reconectarse sin perder un trabajo en curso.
+# Los parámetros y resultados se guardan como JSON; lo que no debe persistir (API Key, caché, limitador) se pasa
+# aparte en submit y sólo vive en memoria.
+class JobQueue:
+    def __init__(self, path=DEFAULT_PATH, workers=DEFAULT_WORKERS, retention=DEFAULT_RETENTION):
+        self.retention = retention
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="trabajo")
+        self.counters = {"submitted": 0, "completed": 0, "errors": 0}
+
+        # path=None deja la tabla en memoria (los trabajos no sobreviven al proceso)
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, params TEXT NOT NULL,"
+            " progress REAL NOT NULL, partial TEXT, result TEXT, error TEXT,"
+            " created REAL NOT NULL, updated REAL NOT NULL, owner INTEGER)"
+        )
+        if "owner" not in {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN owner INTEGER")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_updated ON jobs (updated)")
+        self._recover()
+
+    # Marca como fallidos los trabajos pendientes cuyo proceso dueño (owner, su PID) ya no existe: nadie los va a
+    # ejecutar. Los de otros procesos vivos que comparten la tabla siguen su curso.
+    def _recover(self):
+        with self._lock:
+            pending = self._db.execute(
+                "SELECT DISTINCT owner FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+            ).fetchall()
+            for (owner,) in pending:
+                if _process_alive(owner):
+                    continue
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, error = ?, updated = ? WHERE status IN (?, ?) AND owner IS ?",
+                    (FAILED, "Trabajo interrumpido al reiniciarse el servidor.", time.time(), QUEUED, RUNNING, owner),
+                )
+
+    # Registra la función que ejecuta los trabajos de un tipo: handler(params, report, **runtime) -> resultado.
+    # report(progress=None, partial=None) guarda el avance (0..1) y un resultado parcial para mostrarlo.
+    def register(self, kind, handler):
+        self._handlers[kind] = handler
+
+    # Encola un trabajo y devuelve su id sin esperar a que empiece
+    def submit(self, kind, params, **runtime):
+        if kind not in self._handlers:
+            raise UnknownJobKindError(f"No hay manejador para los trabajos de tipo {kind!r}.")
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, status, params, progress, created, updated, owner)"
+                " VALUES (?, ?, ?, ?, 0, ?, ?, ?)",
+                (job_id, kind, QUEUED, json.dumps(params, ensure_ascii=False), now, now, os.getpid()),
+            )
+            self.counters["submitted"] += 1
+            self._purge(now)
+        self._pool.submit(self._run, job_id, kind, params, runtime)
+        return job_id
+
+    def _update(self, job_id, **columns):
+        columns["updated"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in columns)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*columns.values(), job_id))
+
+    def _run(self, job_id, kind, params, runtime):
+        self._update(job_id, status=RUNNING)
+        last_report = 0.0
+
+        # Los parciales sin avance se escriben como mucho cada REPORT_INTERVAL segundos (el streaming llama por
+        # cada token); un avance se escribe siempre
+        def report(progress=None, partial=None):
+            nonlocal last_report
+            now = time.monotonic()
+            if progress is None and now - last_report < REPORT_INTERVAL:
+                return
+            last_report = now
+            columns = {}
+            if progress is not None:
+                columns["progress"] = progress
+            if partial is not None:
+                columns["partial"] = json.dumps(partial, ensure_ascii=False)
+            if columns:
+                self._update(job_id, **columns)
+
+        try:
+            result = self._handlers[kind](params, report, **runtime)
+        except Exception as e:  # El error se guarda en el trabajo y la página lo muestra
+            self._update(job_id, status=FAILED, error=str(e) or type(e).__name__)
+            with self._lock:
+                self.counters["errors"] += 1
+            return
+        self._update(job_id, status=DONE, progress=1.0, partial=None, result=json.dumps(result, ensure_ascii=False))
+        with self._lock:
+            self.counters["completed"] += 1
+
+    # Devuelve el estado de un trabajo como dict, o None si no existe o ya se purgó
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, kind, status, params, progress, partial, result, error, created, updated"
+                " FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(("id", "kind", "status", "params", "progress", "partial", "result", "error", "created",
+                        "updated"), row))
+        for name in ("params", "partial", "result"):
+            job[name] = json.loads(job[name]) if job[name] is not None else None
+        job["finished"] = job["status"] in FINISHED
+        return job
+
+    # Borra los trabajos terminados hace más de retention segundos
+    def _purge(self, now):
+        self._db.execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated < ?", (*FINISHED, now - self.retention)
+        )
+
+    def stats(self):
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+            return {**self.counters, **{status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)}, **dict(rows)}
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,271 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from correccion.http_client import LATENCY_BUCKETS, LatencyHistogram, latency_histogram, retry_counters
+
+# Instrumentación por etapa: cada llamada a la API y cada etapa de la interfaz deja un evento con sus tiempos y
+# tokens. Los eventos alimentan métricas en formato Prometheus, un log JSON (logger "correccion.metrics") y el
+# panel de depuración. Desactivada, cada punto de medida es una sola comprobación de un booleano.
+ENABLED = os.environ.get("CORRECCION_METRICS", "").lower() in ("1", "true", "yes")
+METRICS_PORT = os.environ.get("CORRECCION_METRICS_PORT")  # Si se define, se sirve /metrics en ese puerto
+RECENT_EVENTS = 200  # Eventos recientes que se guardan para el panel de depuración
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # Las etapas locales duran milisegundos
+SCRIPT_RUNS = 50  # Ejecuciones calientes del script que se guardan para el informe de arranque
+
+_CONFIGURED = ENABLED
+
+logger = logging.getLogger("correccion.metrics")
+if os.environ.get("CORRECCION_JSON_LOGS", "").lower() in ("1", "true", "yes"):
+    # Una línea JSON por evento en stderr; si no, el logger queda para que lo configure quien lo use
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+_lock = threading.Lock()
+_recent = deque(maxlen=RECENT_EVENTS)
+_calls = {}  # (stage, model, outcome, cached) -> llamadas
+_tokens = {}  # (stage, model, tipo) -> tokens
+_api_seconds = {}  # (stage, model, fase) -> LatencyHistogram
+_ui_seconds = {}  # (stage,) -> LatencyHistogram
+_script_runs = {}  # script -> {"cold": segundos, "warm": deque de segundos}
+_server = None
+
+
+# Función para activar o desactivar la instrumentación en todo el proceso
+def set_enabled(enabled):
+    global ENABLED
+    ENABLED = bool(enabled)
+
+
+def enabled():
+    return ENABLED
+
+
+# Función para saber si la instrumentación se pidió para todo el proceso (CORRECCION_METRICS o /metrics servido),
+# y no sólo desde el panel de depuración de una sesión
+def configured():
+    return _CONFIGURED or _server is not None
+
+
+def _emit(event):
+    _recent.append(event)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(event, ensure_ascii=False))
+
+
+def _observe(histograms, key, seconds, buckets=LATENCY_BUCKETS):
+    histogram = histograms.get(key)
+    if histogram is None:
+        histogram = histograms[key] = LatencyHistogram(buckets)
+    histogram.observe(seconds)
+
+
+# Función para registrar una llamada a la API: etapa, modelo, tokens de usage y tiempos (cola, primer byte,
+# primer token, total). error es la excepción si la llamada falló.
+def record_call(stage, model, data=None, error=None):
+    if not ENABLED:
+        return
+    stage = stage or "otra"
+    timings = (data or {}).get("timings") or {}
+    usage = (data or {}).get("usage") or {}
+    cached = bool(timings.get("cached"))
+    outcome = "ok" if error is None else "error"
+    event = {
+        "time": time.time(),
+        "event": "api_call",
+        "stage": stage,
+        "model": model,
+        "outcome": outcome,
+        "cached": cached,
+        "stream": timings.get("stream"),
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "completion_tokens": usage.get("completion_tokens"),
+        **{phase: timings.get(phase) for phase in ("queue", "ttfb", "ttft", "total")},
+    }
+    if error is not None:
+        event["error"] = type(error).__name__
+    with _lock:
+        key = (stage, model, outcome, str(cached).lower())
+        _calls[key] = _calls.get(key, 0) + 1
+        if not cached:
+            for kind in ("prompt", "completion"):
+                tokens = usage.get(f"{kind}_tokens")
+                if tokens:
+                    _tokens[(stage, model, kind)] = _tokens.get((stage, model, kind), 0) + tokens
+            for phase in ("queue", "ttfb", "ttft", "total"):
+                if timings.get(phase) is not None:
+                    _observe(_api_seconds, (stage, model, phase), timings[phase])
+        _emit(event)
+
+
+# Función para registrar la duración de una etapa de la interfaz (prepaso, repintado, etc.)
+def record_stage(stage, seconds):
+    if not ENABLED:
+        return
+    with _lock:
+        _observe(_ui_seconds, (stage,), seconds, STAGE_BUCKETS)
+        _emit({"time": time.time(), "event": "stage", "stage": stage, "seconds": seconds})
+
+
+# Contexto para medir una etapa: with metrics.timer("render"): ...
+@contextmanager
+def timer(stage):
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+# Función para envolver un callback (como on_token) y medir cada llamada; desactivada, devuelve el mismo callback
+def timed(stage, callback):
+    if not ENABLED or callback is None:
+        return callback
+
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return callback(*args, **kwargs)
+        finally:
+            record_stage(stage, time.perf_counter() - start)
+
+    return wrapper
+
+
+# Función para registrar una ejecución completa del script de Streamlit. La primera del proceso es la fría
+# (importaciones y recursos de st.cache_resource); las siguientes, las de cada interacción, son calientes.
+# Se guarda siempre, porque cuesta una operación; el evento sólo se emite con la instrumentación activa.
+def record_script_run(script, seconds):
+    with _lock:
+        runs = _script_runs.get(script)
+        cold = runs is None
+        if cold:
+            _script_runs[script] = {"cold": seconds, "warm": deque(maxlen=SCRIPT_RUNS)}
+        else:
+            runs["warm"].append(seconds)
+    record_stage(f"script_{'cold' if cold else 'warm'}", seconds)
+    return cold
+
+
+# Función para obtener el informe de arranque: ejecución fría y estadísticas de las calientes (en segundos)
+def script_report(script):
+    with _lock:
+        runs = _script_runs.get(script) or {"cold": None, "warm": ()}
+        warm = sorted(runs["warm"])
+        cold = runs["cold"]
+    return {
+        "cold": cold,
+        "warm_runs": len(warm),
+        "warm_median": warm[len(warm) // 2] if warm else None,
+        "warm_max": warm[-1] if warm else None,
+    }
+
+
+# Función para obtener los eventos más recientes (el más nuevo al final)
+def recent_events(limit=RECENT_EVENTS):
+    with _lock:
+        return list(_recent)[-limit:]
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{str(value).replace(chr(34), "")}"' for name, value in labels.items()) + "}"
+
+
+def _histogram_lines(name, labels, snapshot):
+    lines = []
+    for bound, count in snapshot["buckets"]:
+        le = "+Inf" if bound == float("inf") else repr(float(bound))
+        lines.append(f"{name}_bucket{_labels(**labels, le=le)} {count}")
+    lines.append(f"{name}_sum{_labels(**labels)} {snapshot['sum']}")
+    lines.append(f"{name}_count{_labels(**labels)} {snapshot['count']}")
+    return lines
+
+
+# Función para exportar las métricas en el formato de texto de Prometheus
+def render_prometheus():
+    with _lock:
+        calls = dict(_calls)
+        tokens = dict(_tokens)
+        api_seconds = {key: histogram.snapshot() for key, histogram in _api_seconds.items()}
+        ui_seconds = {key: histogram.snapshot() for key, histogram in _ui_seconds.items()}
+
+    lines = ["# HELP correccion_api_calls_total Llamadas a la API por etapa, modelo y resultado.",
+             "# TYPE correccion_api_calls_total counter"]
+    for (stage, model, outcome, cached), count in sorted(calls.items()):
+        lines.append(f"correccion_api_calls_total{_labels(stage=stage, model=model, outcome=outcome, cached=cached)} {count}")
+    lines += ["# HELP correccion_api_tokens_total Tokens de entrada y salida según el campo usage.",
+              "# TYPE correccion_api_tokens_total counter"]
+    for (stage, model, kind), count in sorted(tokens.items()):
+        lines.append(f"correccion_api_tokens_total{_labels(stage=stage, model=model, type=kind)} {count}")
+    lines += ["# HELP correccion_api_seconds Tiempos de cada llamada: cola, primer byte, primer token y total.",
+              "# TYPE correccion_api_seconds histogram"]
+    for (stage, model, phase), snapshot in sorted(api_seconds.items()):
+        lines += _histogram_lines("correccion_api_seconds", {"stage": stage, "model": model, "phase": phase}, snapshot)
+    lines += ["# HELP correccion_stage_seconds Duración de las etapas de la interfaz.",
+              "# TYPE correccion_stage_seconds histogram"]
+    for (stage,), snapshot in sorted(ui_seconds.items()):
+        lines += _histogram_lines("correccion_stage_seconds", {"stage": stage}, snapshot)
+    lines += ["# HELP correccion_http_seconds Latencia HTTP hasta tener la respuesta.",
+              "# TYPE correccion_http_seconds histogram"]
+    lines += _histogram_lines("correccion_http_seconds", {}, latency_histogram.snapshot())
+    lines += ["# HELP correccion_http_retries_total Reintentos y errores del cliente HTTP.",
+              "# TYPE correccion_http_retries_total counter"]
+    for name, count in sorted(retry_counters.items()):
+        lines.append(f"correccion_http_retries_total{_labels(kind=name)} {count}")
+    # correccion.validation importa los prompts: se carga aquí para no alargar la importación de este módulo
+    from correccion import validation
+
+    failures = validation.stats()
+    lines += ["# HELP correccion_validation_failures_total Respuestas con fallos detectados y reparados, por tipo.",
+              "# TYPE correccion_validation_failures_total counter"]
+    for mode in validation.FAILURE_MODES:
+        for outcome, key in (("detected", mode), ("repaired", f"{mode}_repaired")):
+            lines.append(f"correccion_validation_failures_total{_labels(mode=mode, outcome=outcome)} {failures[key]}")
+    return "\n".join(lines) + "\n"
+
+
+# Función para crear el manejador de /metrics; http.server sólo se importa si se sirven las métricas
+def _handler_class():
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return MetricsHandler
+
+
+# Función para servir /metrics en un hilo (una sola vez por proceso); activa la instrumentación
+def serve(port=METRICS_PORT, host="0.0.0.0"):
+    global _server
+    if port is None:
+        return None
+    from http.server import ThreadingHTTPServer
+
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, int(port)), _handler_class())
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+    set_enabled(True)
+    return _server
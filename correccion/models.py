@@ -0,0 +1,68 @@
+import json
+import os
+
+# Tabla de modelos de Together: ventana de contexto (tokens), familia de tokenizador,
+# precio en USD por millón de tokens de entrada y de salida, y para el enrutador (correccion.router):
+# velocidad de generación y tiempo hasta el primer token nominales (orientativos; las medidas reales los
+# sustituyen con el uso) y calidad relativa de 1 a 3.
+MODELS = {
+    "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo": {
+        "context": 131072,
+        "tokenizer": "llama3",
+        "input_price": 0.18,
+        "output_price": 0.18,
+        "tokens_per_second": 170,
+        "ttft": 0.3,
+        "quality": 1,
+    },
+    "mistralai/Mistral-7B-Instruct-v0.3": {
+        "context": 32768,
+        "tokenizer": "mistral",
+        "input_price": 0.20,
+        "output_price": 0.20,
+        "tokens_per_second": 130,
+        "ttft": 0.3,
+        "quality": 1,
+    },
+    "mistralai/Mixtral-8x7B-Instruct-v0.1": {
+        "context": 32768,
+        "tokenizer": "mistral",
+        "input_price": 0.60,
+        "output_price": 0.60,
+        "tokens_per_second": 90,
+        "ttft": 0.5,
+        "quality": 2,
+    },
+    "meta-llama/Meta-Llama-3.1-70B-Instruct-Turbo": {
+        "context": 131072,
+        "tokenizer": "llama3",
+        "input_price": 0.88,
+        "output_price": 0.88,
+        "tokens_per_second": 70,
+        "ttft": 0.6,
+        "quality": 3,
+    },
+}
+
+# Valores prudentes para modelos que no están en la tabla
+DEFAULT_MODEL_INFO = {
+    "context": 8192,
+    "tokenizer": "llama3",
+    "input_price": 0.0,
+    "output_price": 0.0,
+    "tokens_per_second": 50,
+    "ttft": 1.0,
+    "quality": 1,
+}
+
+# CORRECCION_MODELS_FILE: JSON {modelo: {campo: valor}} que añade modelos a la tabla o cambia sus datos
+MODELS_FILE = os.environ.get("CORRECCION_MODELS_FILE")
+if MODELS_FILE:
+    with open(MODELS_FILE, encoding="utf-8") as handle:
+        for name, info in json.load(handle).items():
+            MODELS[name] = {**MODELS.get(name, DEFAULT_MODEL_INFO), **info}
+
+
+# Función para obtener los datos de un modelo
+def model_info(model):
+    return MODELS.get(model, DEFAULT_MODEL_INFO)
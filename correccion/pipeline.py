@@ -0,0 +1,651 @@
+import time
+from collections import namedtuple
+
+from correccion import chunking, edits, executor, metrics, pipelined, prompts, router, service, validation
+
+# Procesamiento por etapas, sin Streamlit. Un Pipeline ejecuta en orden etapas enchufables (prepaso, estimación,
+# análisis, corrección, validación, presentación, historial) con un mismo juego de clientes y una sola medición
+# por etapa. Las etapas por fragmento se ejecutan sobre cada fragmento del texto, varios a la vez si el texto no
+# cabe en una petición; las de documento, una vez y en el hilo de quien llama. Lo que se muestra queda en un
+# Renderer: las interfaces de Streamlit y los trabajos en segundo plano ponen el suyo; el lote y el banco de
+# pruebas, ninguno.
+
+# Clientes compartidos por todas las etapas: api_key para correccion.together_api (que usa la sesión con keep-alive
+# de correccion.http_client), la caché de respuestas, el limitador y el nivel de servicio de correccion.router
+Clients = namedtuple("Clients", ["api_key", "response_cache", "limiter", "tier"], defaults=(None, None, None))
+
+
+# Presentación de un Pipeline; esta base no muestra nada. Todos los métodos se llaman en el hilo que ejecuta el
+# pipeline, así que pueden usar Streamlit.
+class Renderer:
+    stream = False  # Pedir las respuestas en streaming y recibir el texto parcial en partial()
+
+    # Comienzo de las etapas por fragmento: state["chunked"] ya dice si el texto se procesa por fragmentos
+    def begin_chunks(self, state):
+        pass
+
+    # Texto parcial de una etapa ("analysis" o "correction") mientras se genera; sólo si el texto cabe en un fragmento
+    def partial(self, stage, content):
+        pass
+
+    # Fin de una etapa: las de documento y, si el texto cabe en un fragmento, las de fragmento (chunk es ese fragmento)
+    def stage(self, stage, state, chunk=None):
+        pass
+
+    # Fin de un fragmento, en el orden del texto; state ya lleva el análisis y la corrección acumulados y el avance
+    def chunk(self, state, chunk):
+        pass
+
+    # Etapa Render: el resultado completo
+    def result(self, state):
+        pass
+
+
+# Etapa base. name identifica la etapa en los tiempos y las métricas; con per_chunk, run recibe cada fragmento
+# (un dict con index, body, context y lo que le añaden las etapas anteriores) y si no, una vez el documento.
+class Stage:
+    name = None
+    per_chunk = False
+
+    def run(self, pipeline, state, chunk=None):
+        raise NotImplementedError
+
+    # Segundo intento tras una respuesta vacía (Validate); por defecto se repite la etapa entera
+    def retry(self, pipeline, state, chunk=None):
+        self.run(pipeline, state, chunk)
+
+
+# Prepaso local de tipografía y faltas frecuentes: las etapas siguientes reciben el texto ya limpio
+class Prepass(Stage):
+    name = "prepass"
+
+    def run(self, pipeline, state, chunk=None):
+        state["prepass"] = service.run_prepass(state["text"])
+        state["text"] = state["prepass"]["corrected"]
+
+
+# Tokens y costo máximo estimados antes de enviar nada
+class Estimate(Stage):
+    name = "estimate"
+
+    def __init__(self, review=False, correction_format="inline", fanout=None, store=None):
+        self.review = review
+        self.correction_format = correction_format
+        self.fanout = fanout
+        self.store = store  # El almacén de Incremental: se estima el reanálisis incremental
+
+    def run(self, pipeline, state, chunk=None):
+        if self.store is not None:
+            state["estimate"] = service.estimate_incremental(
+                state["genre"], state["audience"], state["text"], self.store,
+                correction_format=self.correction_format, tier=pipeline.clients.tier,
+            )
+            return
+        state["estimate"] = service.estimate_request(
+            state["genre"], state["audience"], state["text"], review=self.review,
+            correction_format=self.correction_format, tier=pipeline.clients.tier, fanout=self.fanout,
+        )
+
+
+# Análisis literario de cada fragmento; review=True usa el análisis de app.py (sin corrección posterior)
+class Analysis(Stage):
+    name = "analysis"
+    per_chunk = True
+
+    def __init__(self, fanout=None, review=False):
+        self.fanout = fanout
+        self.review = review
+
+    def run(self, pipeline, state, chunk=None):
+        clients = pipeline.clients
+        request = service.review if self.review else service.analyze
+        response = request(
+            clients.api_key, state["genre"], state["audience"], chunk["body"], context=chunk["context"],
+            on_token=pipeline.on_token(self.name), response_cache=clients.response_cache, limiter=clients.limiter,
+            tier=clients.tier, fanout=self.fanout,
+        )
+        chunk["analysis_response"] = response
+        chunk["analysis"] = service.require_content(response, "Análisis")
+        chunk["model"] = response.get("model")
+
+
+# Notas breves de cada sección del reanálisis incremental, que hacen de análisis para su corrección. Sólo llevan los
+# encabezados que apliquen, así que Validate no pide las secciones del análisis que falten (sections = False).
+class Notes(Stage):
+    name = "notes"
+    per_chunk = True
+    sections = False
+
+    def run(self, pipeline, state, chunk=None):
+        clients = pipeline.clients
+        response = service.annotate(
+            clients.api_key, state["genre"], state["audience"], chunk["body"], response_cache=clients.response_cache,
+            limiter=clients.limiter, tier=clients.tier,
+        )
+        chunk["analysis_response"] = response
+        chunk["analysis"] = service.require_content(response, "Análisis")
+        chunk["model"] = response.get("model")
+
+
+# Corrección de estilo de cada fragmento a partir de su análisis, con justificaciones inline o como lista de
+# ediciones que se aplica localmente (chunk["resolved"], el resultado de edits.resolve)
+class Correction(Stage):
+    name = "correction"
+    per_chunk = True
+
+    def __init__(self, correction_format="inline", compact=None):
+        self.correction_format = correction_format
+        self.compact = compact
+
+    def run(self, pipeline, state, chunk=None):
+        clients = pipeline.clients
+        response = service.correct(
+            clients.api_key, state["genre"], state["audience"], chunk["analysis"], chunk["body"],
+            context=chunk["context"], on_token=_correction_token(pipeline, self.correction_format),
+            response_cache=clients.response_cache, limiter=clients.limiter,
+            correction_format=self.correction_format, tier=clients.tier, compact=self.compact,
+        )
+        _set_correction(chunk, response, self.correction_format)
+
+
+# Análisis y corrección solapados (correccion.pipelined), en lugar de Analysis y Correction: "pipelined" arranca la
+# corrección con el análisis parcial y "parallel" corrige sin análisis a la vez que éste y concilia ambos al final
+class Overlapped(Stage):
+    name = "overlapped"
+    per_chunk = True
+
+    def __init__(self, mode="pipelined", correction_format="inline", fanout=None):
+        self.mode = mode
+        self.correction_format = correction_format
+        self.fanout = fanout
+
+    def _calls(self, pipeline, state, chunk):
+        clients = pipeline.clients
+        calls = dict(response_cache=clients.response_cache, limiter=clients.limiter, tier=clients.tier)
+
+        def analyze(on_token=None):
+            return service.analyze(
+                clients.api_key, state["genre"], state["audience"], chunk["body"], context=chunk["context"],
+                on_token=on_token, fanout=self.fanout, **calls
+            )
+
+        def correct(analysis, on_token=None):
+            return service.correct(
+                clients.api_key, state["genre"], state["audience"], analysis, chunk["body"],
+                context=chunk["context"], on_token=on_token, correction_format=self.correction_format, **calls
+            )
+
+        def reconcile(analysis, correction):
+            return service.reconcile(clients.api_key, analysis, correction, **calls)
+
+        return analyze, correct, reconcile
+
+    def run(self, pipeline, state, chunk=None):
+        analyze, correct, reconcile = self._calls(pipeline, state, chunk)
+        on_analysis_token = pipeline.on_token("analysis")
+        on_correction_token = _correction_token(pipeline, self.correction_format)
+        if self.mode == "parallel":
+            analysis_response, correction_response, reconciliation_response, timings = pipelined.run_parallel(
+                analyze, correct, reconcile, on_analysis_token, on_correction_token
+            )
+            chunk["reconciliation"] = pipelined.response_content(reconciliation_response)
+        else:
+            analysis_response, correction_response, timings = pipelined.run_pipelined(
+                analyze, correct, on_analysis_token, on_correction_token
+            )
+        chunk["overlap"] = timings
+        chunk["analysis_response"] = analysis_response
+        chunk["correction_response"] = correction_response
+        self._set_results(chunk)
+
+    # Tras una respuesta vacía sólo se repite la mitad que llegó vacía: un análisis vacío se pide de nuevo y una
+    # corrección vacía (o que no llegó a pedirse) se pide ya con el análisis completo, así que no hay que conciliar
+    def retry(self, pipeline, state, chunk=None):
+        analyze, correct, _ = self._calls(pipeline, state, chunk)
+        if not pipelined.response_content(chunk.get("analysis_response")):
+            chunk["analysis_response"] = analyze(on_token=pipeline.on_token("analysis"))
+        if not pipelined.response_content(chunk.get("correction_response")):
+            analysis = service.require_content(chunk["analysis_response"], "Análisis")
+            chunk["correction_response"] = correct(
+                analysis, on_token=_correction_token(pipeline, self.correction_format)
+            )
+        self._set_results(chunk)
+
+    def _set_results(self, chunk):
+        chunk["analysis"] = service.require_content(chunk["analysis_response"], "Análisis")
+        chunk["model"] = chunk["analysis_response"].get("model")
+        _set_correction(chunk, chunk["correction_response"], self.correction_format)
+
+
+# Reanálisis incremental (service.iter_incremental), en lugar de Analysis y Correction: cada sección es un fragmento
+# con sus notas como análisis, y las que no cambiaron desde el envío anterior llegan del almacén con reused=True.
+# Las secciones nuevas se validan y reparan como en los demás modos (validated_section) antes de guardarse; una que
+# no se pudo procesar lleva su texto sin cambios y chunk["error"].
+class Incremental(Stage):
+    name = "incremental"
+
+    def __init__(self, store, correction_format="inline"):
+        self.store = store
+        self.correction_format = correction_format
+
+    def run(self, pipeline, state, chunk=None):
+        clients = pipeline.clients
+        state.update(chunked=True, incremental=True, words=service.count_words(state["text"]))
+        pipeline.renderer.begin_chunks(state)
+        for section, result, reused in service.iter_incremental(
+            clients.api_key, state["genre"], state["audience"], state["text"], self.store, clients.response_cache,
+            clients.limiter, pipeline.concurrency, self.correction_format, clients.tier,
+            worker=lambda section: validated_section(
+                clients, state["genre"], state["audience"], section, self.correction_format
+            ),
+        ):
+            chunk = _new_chunk(section.index, section.body)
+            chunk.update(analysis=result["notes"], correction=result["correction"], reused=reused)
+            if result.get("error"):
+                chunk["error"] = result["error"]
+            if result.get("repairs") and not reused:
+                chunk["repairs"] = result["repairs"]
+            if self.correction_format == "edits":
+                chunk["resolved"] = {
+                    "corrected": result["correction"], "annotated": result["annotated"], "edits": result["edits"]
+                }
+            pipeline.add_chunk(state, chunk)
+
+
+# Validación y reparación de lo que devuelve una etapa por fragmento (Analysis, Correction u Overlapped) con
+# correccion.validation, pidiendo sólo la parte rota: una respuesta vacía repite la etapa una vez (las vacías no se
+# guardan en la caché); una cortada por max_tokens se continúa donde quedó; al análisis se le piden sólo las
+# secciones que faltan; de una lista de ediciones ilegible se rescatan las completas; las URLs alteradas se
+# restauran y los párrafos que perdieron alguna se corrigen de nuevo uno a uno. chunk["repairs"] dice qué falló y si
+# se reparó. Lleva el nombre de la etapa envuelta: los tiempos y el Renderer no distinguen una de otra.
+class Validate(Stage):
+    per_chunk = True
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.name = stage.name
+        self.correction_format = getattr(stage, "correction_format", "inline")
+
+    def run(self, pipeline, state, chunk=None):
+        before = chunk.get("analysis_response"), chunk.get("correction_response")
+        try:
+            self._run_stage(pipeline, state, chunk)
+        except service.UnexpectedResponseError:
+            try:
+                self._run_stage(pipeline, state, chunk, retry=True)
+            except service.UnexpectedResponseError:
+                _repaired(chunk, "empty", False)
+                raise
+            _repaired(chunk, "empty", True)
+        if chunk.get("analysis_response") is not before[0]:
+            self._check_analysis(pipeline, state, chunk)
+        if chunk.get("correction_response") is not before[1]:
+            self._check_correction(pipeline, state, chunk)
+
+    # La etapa envuelta (su retry tras una respuesta vacía); una lista de ediciones ilegible se repara después desde
+    # chunk["correction_response"]
+    def _run_stage(self, pipeline, state, chunk, retry=False):
+        try:
+            (self.stage.retry if retry else self.stage.run)(pipeline, state, chunk)
+        except edits.EditParseError:
+            pass
+
+    def _check_analysis(self, pipeline, state, chunk):
+        clients = pipeline.clients
+        response = chunk["analysis_response"]
+        if validation.truncated(response):
+            response = chunk["analysis_response"] = _continue(clients, chunk, response)
+            chunk["analysis"] = service.require_content(response, "Análisis")
+            if validation.truncated(response):
+                return  # Las secciones que falten son las que no llegaron a escribirse
+        if not getattr(self.stage, "sections", True):
+            return
+        missing = validation.missing_sections(chunk["analysis"])
+        if not missing:
+            return
+        if len(missing) == len(prompts.ANALYSIS_SECTIONS):
+            # Sin ninguna sección reconocible no hay estructura que completar: el análisis se muestra tal cual
+            _repaired(chunk, "structure", False)
+            return
+        sections = service.analyze_sections(
+            clients.api_key, state["genre"], state["audience"], chunk["body"], chunk["context"],
+            response_cache=clients.response_cache, limiter=clients.limiter, tier=clients.tier,
+            review=getattr(self.stage, "review", False), titles=missing,
+        )
+        chunk["analysis"] = chunk["analysis"].rstrip() + "\n\n" + service.require_content(sections, "Análisis")
+        _repaired(chunk, "structure", not validation.missing_sections(chunk["analysis"]))
+
+    def _check_correction(self, pipeline, state, chunk):
+        response = chunk["correction_response"]
+        if validation.truncated(response):
+            response = _continue(pipeline.clients, chunk, response)
+            chunk.pop("correction", None)
+        # Sin continuación la corrección sólo falta si su lista de ediciones no se pudo leer
+        if "correction" not in chunk:
+            try:
+                _set_correction(chunk, response, self.correction_format)
+            except edits.EditParseError:
+                salvaged = validation.salvage_edits(pipelined.response_content(response) or "")
+                _repaired(chunk, "structure", salvaged is not None)
+                if salvaged is None:
+                    raise
+                _set_correction(chunk, response, self.correction_format, salvaged)
+        if self.correction_format != "edits":
+            self._check_links(pipeline, state, chunk)
+
+    # Las ediciones que tocan un hipervínculo ya se rechazan al validarlas: sólo la corrección inline puede perderlos
+    def _check_links(self, pipeline, state, chunk):
+        body = chunk["body"]
+        lost, added = edits.compare_urls(body, chunk["correction"])
+        if not (lost or added):
+            return
+        correction, lost, added = validation.restore_urls(body, chunk["correction"])
+        damaged = validation.damaged_paragraphs(body, correction, lost) if lost else None
+        if damaged:
+            clients = pipeline.clients
+            paragraphs = list(chunking.iter_paragraphs(body))
+            replacements = {}
+            for index in damaged:
+                response = service.correct(
+                    clients.api_key, state["genre"], state["audience"], chunk.get("analysis", ""), paragraphs[index],
+                    response_cache=clients.response_cache, limiter=clients.limiter, tier=clients.tier,
+                    compact=getattr(self.stage, "compact", None),
+                )
+                fixed = pipelined.response_content(response)
+                if fixed:
+                    replacements[index] = validation.restore_urls(paragraphs[index], fixed)[0]
+            correction = validation.replace_paragraphs(correction, replacements)
+            lost, added = edits.compare_urls(body, correction)
+        chunk["correction"] = correction
+        _repaired(chunk, "links", not (lost or added))
+
+
+# Función para continuar una respuesta cortada hasta validation.MAX_CONTINUATIONS veces
+def _continue(clients, chunk, response):
+    for _ in range(validation.MAX_CONTINUATIONS):
+        response = service.continue_response(clients.api_key, response, clients.response_cache, clients.limiter)
+        if not validation.truncated(response):
+            break
+    _repaired(chunk, "truncated", not validation.truncated(response))
+    return response
+
+
+def _repaired(chunk, mode, repaired):
+    validation.record(mode, repaired)
+    repairs = chunk.setdefault("repairs", {})
+    repairs[mode] = repairs.get(mode, True) and repaired
+
+
+# Etapa de presentación: entrega el resultado completo al Renderer
+class Render(Stage):
+    name = "render"
+
+    def run(self, pipeline, state, chunk=None):
+        pipeline.renderer.result(state)
+
+
+# Guarda el resultado en el historial de búsqueda (correccion.results.ResultStore); sólo encola, sin esperar al disco.
+# Con un solo modelo en todos los fragmentos se guarda ese modelo; si no, el nivel del router.
+class Record(Stage):
+    name = "record"
+
+    def __init__(self, result_store, author=None):
+        self.result_store = result_store
+        self.author = author
+
+    def run(self, pipeline, state, chunk=None):
+        if not state["analysis"]:
+            return
+        models = {chunk.get("model") for chunk in state["chunks"]}
+        model = next(iter(models)) if len(models) == 1 else None
+        self.result_store.add(
+            state["text"], state["analysis"], state["correction"] or None, state["genre"], state["audience"],
+            author=self.author, model=model or pipeline.clients.tier or router.DEFAULT_TIER,
+            timings=dict(state["timings"], total=time.perf_counter() - state["start"]),
+        )
+
+
+def _correction_token(pipeline, correction_format):
+    # La lista de ediciones es JSON: no se muestra mientras se genera
+    return pipeline.on_token("correction") if correction_format != "edits" else None
+
+
+# La respuesta queda en el fragmento antes de leer la lista de ediciones, para que Validate pueda repararla si no es
+# válida; content sustituye al contenido de la respuesta (las ediciones rescatadas de un JSON roto)
+def _set_correction(chunk, response, correction_format, content=None):
+    correction = content or service.require_content(response, "Corrección de Estilo")
+    chunk["correction_response"] = response
+    chunk["model"] = response.get("model") or chunk.get("model")
+    if correction_format == "edits":
+        chunk["resolved"] = edits.resolve(chunk["body"], correction)
+        chunk["correction"] = chunk["resolved"]["corrected"]
+    else:
+        chunk["correction"] = correction
+
+
+def _new_chunk(index, body, context=None):
+    return {"index": index, "body": body, "context": context, "timings": {}}
+
+
+def _edit_dict(edit):
+    return edit._asdict() if hasattr(edit, "_asdict") else dict(edit)
+
+
+# Ejecución de unas etapas sobre un texto. run() devuelve el estado del documento: text (tras el prepaso), chunks
+# (los dicts de cada fragmento), analysis y correction acumulados, edits (con el índice de su fragmento), words,
+# progress, seconds y timings (segundos por etapa, sumados entre fragmentos). Si una etapa lanza una excepción,
+# pipeline.state conserva lo hecho hasta entonces y, en el hilo de quien llama, state["stage"] dice cuál fue.
+class Pipeline:
+    def __init__(self, stages, clients, renderer=None, concurrency=executor.DEFAULT_CONCURRENCY):
+        self.stages = list(stages)
+        self.clients = clients
+        self.renderer = renderer or Renderer()
+        self.concurrency = concurrency
+        self.state = None
+        self._single = False
+        # Sin un Renderer que muestre cada fragmento, el análisis y la corrección se unen una sola vez al final
+        self._progressive = type(self.renderer).chunk is not Renderer.chunk
+
+    # Callback de streaming de una etapa, o None si no hay que pedir streaming: con varios fragmentos a la vez
+    # los textos parciales se mezclarían, y sus llamadas van en otros hilos
+    def on_token(self, stage):
+        if not (self.renderer.stream and self._single):
+            return None
+        renderer = self.renderer
+        return metrics.timed("render_partial", lambda content: renderer.partial(stage, content))
+
+    def run(self, genre, audience, text):
+        state = self.state = {
+            "genre": genre, "audience": audience, "text": text, "chunked": False, "incremental": False, "chunks": [],
+            "analysis": "", "correction": "", "edits": [], "done_words": 0, "progress": 0.0, "timings": {},
+            "start": time.perf_counter(),
+        }
+        index = 0
+        while index < len(self.stages):
+            if not self.stages[index].per_chunk:
+                stage = self.stages[index]
+                self._run_stage(stage, state)
+                self.renderer.stage(stage.name, state)
+                index += 1
+                continue
+            group = []
+            while index < len(self.stages) and self.stages[index].per_chunk:
+                group.append(self.stages[index])
+                index += 1
+            self._run_chunks(group, state)
+        state["seconds"] = time.perf_counter() - state["start"]
+        return state
+
+    def _run_stage(self, stage, state, chunk=None):
+        if chunk is None or self._single:
+            state["stage"] = stage.name
+        start = time.perf_counter()
+        stage.run(self, state, chunk)
+        seconds = time.perf_counter() - start
+        metrics.record_stage(stage.name, seconds)
+        timings = (state if chunk is None else chunk)["timings"]
+        timings[stage.name] = timings.get(stage.name, 0.0) + seconds
+
+    # Etapas por fragmento: un texto que cabe en una petición se procesa aquí mismo, etapa a etapa y con streaming;
+    # uno largo, por fragmentos en un grupo acotado de hilos, recibiendo los resultados en el orden del texto
+    def _run_chunks(self, stages, state):
+        text = state["text"]
+        state["chunked"] = service.needs_chunking(text)
+        state["words"] = service.count_words(text)
+        self.renderer.begin_chunks(state)
+        if not state["chunked"]:
+            # El cuerpo normalizado de service.split_document, no el texto tal cual: las ediciones se miden sobre él
+            # y service.tracked_chunks vuelve a partir el texto del mismo modo para aplicarlas
+            first = next(iter(service.split_document(text)), None)
+            chunk = _new_chunk(0, first.body if first else text)
+            self._single = True
+            try:
+                for stage in stages:
+                    self._run_stage(stage, state, chunk)
+                    self.renderer.stage(stage.name, state, chunk)
+            finally:
+                self._single = False
+            self.add_chunk(state, chunk)
+        else:
+            def process(item):
+                chunk = _new_chunk(item.index, item.body, item.context or None)
+                for stage in stages:
+                    self._run_stage(stage, state, chunk)
+                return chunk
+
+            for _, chunk in executor.run_ordered(service.split_document(text), process, self.concurrency):
+                self.add_chunk(state, chunk)
+        if not self._progressive:
+            self._merge(state)
+
+    # Añade un fragmento terminado al documento (las etapas que producen sus propios fragmentos también la usan)
+    def add_chunk(self, state, chunk):
+        state["chunks"].append(chunk)
+        if chunk.get("resolved"):
+            state["edits"] += [dict(_edit_dict(edit), chunk=chunk["index"]) for edit in chunk["resolved"]["edits"]]
+        for name, seconds in chunk["timings"].items():
+            state["timings"][name] = state["timings"].get(name, 0.0) + seconds
+        state["done_words"] += service.count_words(chunk["body"])
+        state["progress"] = min(state["done_words"] / state["words"], 1.0) if state["words"] else 1.0
+        state["seconds"] = time.perf_counter() - state["start"]
+        if self._progressive:
+            self._merge(state)
+            self.renderer.chunk(state, chunk)
+
+    def _merge(self, state):
+        state["analysis"] = chunking.merge_analyses(
+            [chunk.get("analysis") for chunk in state["chunks"]], labels=not state["incremental"]
+        )
+        state["correction"] = chunking.stitch([chunk.get("correction") for chunk in state["chunks"]])
+
+
+# Función para el resultado de un documento con las claves de siempre: analysis, correction, words, chunks,
+# seconds y, en formato "edits", las ediciones con desplazamientos relativos a su fragmento. Si Validate encontró
+# fallos, "repairs" cuenta por tipo los fragmentos afectados y los reparados.
+def document_result(state, correction_format="inline"):
+    result = {
+        "analysis": state["analysis"],
+        "correction": state["correction"],
+        "words": service.count_words(state["text"]),
+        "chunks": len(state["chunks"]),
+        "seconds": state["seconds"],
+    }
+    if correction_format == "edits":
+        result["edits"] = state["edits"]
+    repairs = repair_counts(state["chunks"])
+    if repairs:
+        result["repairs"] = repairs
+    return result
+
+
+# Función para contar los fallos de validación de unos fragmentos: {tipo: {"detected": n, "repaired": n}}
+def repair_counts(chunks):
+    counts = {}
+    for chunk in chunks:
+        for mode, repaired in chunk.get("repairs", {}).items():
+            entry = counts.setdefault(mode, {"detected": 0, "repaired": 0})
+            entry["detected"] += 1
+            entry["repaired"] += repaired
+    return counts
+
+
+# Función para tomar notas y corregir una sección del reanálisis incremental con las etapas validadas de los demás
+# modos (reintento de una respuesta vacía, continuación de una cortada, URLs restauradas, ediciones rescatadas).
+# Devuelve el dict de service.process_section con los repairs de Validate; partial=True si algo quedó sin reparar
+# o la lista de ediciones se rescató a medias, y entonces iter_incremental no lo guarda.
+def validated_section(clients, genre, audience, section, correction_format="inline"):
+    stages = [Validate(Notes()), Validate(Correction(correction_format))]
+    state = Pipeline(stages, clients, concurrency=1).run(genre, audience, section.body)
+    chunk = state["chunks"][0]
+    result = {"notes": chunk["analysis"], "correction": chunk["correction"], "annotated": None, "edits": []}
+    if chunk.get("resolved"):
+        result.update(
+            annotated=chunk["resolved"]["annotated"], edits=[_edit_dict(edit) for edit in chunk["resolved"]["edits"]]
+        )
+    repairs = chunk.get("repairs", {})
+    if repairs:
+        result["repairs"] = repairs
+        # En la corrección, "structure" sólo puede ser una lista de ediciones rescatada a medias
+        result["partial"] = not all(repairs.values()) or "structure" in repairs
+    return result
+
+
+# Función para el reanálisis incremental sin presentación (service.process_incremental), con cada sección validada
+def process_incremental(api_key, genre, audience, text, store, response_cache=None, limiter=None,
+                        concurrency=executor.DEFAULT_CONCURRENCY, correction_format="inline", tier=None):
+    clients = Clients(api_key, response_cache, limiter, tier)
+    return service.process_incremental(
+        api_key, genre, audience, text, store, response_cache, limiter, concurrency, correction_format, tier,
+        worker=lambda section: validated_section(clients, genre, audience, section, correction_format),
+    )
+
+
+# Función para analizar y corregir un texto de cualquier longitud (por fragmentos si hace falta) sin presentación
+def process_document(api_key, genre, audience, text, response_cache=None, limiter=None,
+                     concurrency=executor.DEFAULT_CONCURRENCY, correction_format="inline", tier=None, fanout=None,
+                     renderer=None):
+    stages = [Validate(Analysis(fanout)), Validate(Correction(correction_format))]
+    state = Pipeline(stages, Clients(api_key, response_cache, limiter, tier), renderer, concurrency).run(
+        genre, audience, text
+    )
+    return document_result(state, correction_format)
+
+
+# Presentación de los trabajos en segundo plano: el avance por fragmento y, si el texto cabe en uno, el texto de
+# cada etapa mientras se genera, enviados a report de correccion.jobs
+class JobReporter(Renderer):
+    def __init__(self, report, stream=True):
+        self.report = report
+        self.stream = stream
+        self.partial_result = {"analysis": "", "correction": "", "chunks": 0}
+
+    def partial(self, stage, content):
+        self.partial_result[stage] = content
+        self.report(partial=self.partial_result)
+
+    def chunk(self, state, chunk):
+        self.partial_result.update(
+            analysis=state["analysis"], correction=state["correction"], chunks=len(state["chunks"])
+        )
+        self.report(state["progress"], self.partial_result)
+
+
+# Función que ejecuta los trabajos "document" de correccion.jobs: params trae genre, audience, text y, opcionalmente,
+# correction_format, tier, concurrency, fanout, author, mode ("pipelined" o "parallel", como Overlapped; sin él,
+# análisis y corrección en secuencia) y stream (False: sólo se guarda el avance por fragmento, no cada token);
+# api_key, response_cache, limiter y result_store no se guardan con el trabajo. Con result_store el resultado queda
+# además en el historial de búsqueda.
+def document_job(params, report, api_key, response_cache=None, limiter=None, result_store=None):
+    correction_format = params.get("correction_format", "inline")
+    if params.get("mode"):
+        stages = [Validate(Overlapped(params["mode"], correction_format, params.get("fanout")))]
+    else:
+        stages = [Validate(Analysis(params.get("fanout"))), Validate(Correction(correction_format))]
+    if result_store is not None:
+        stages.append(Record(result_store, params.get("author")))
+    state = Pipeline(
+        stages, Clients(api_key, response_cache, limiter, params.get("tier")),
+        JobReporter(report, params.get("stream", True)),
+        params.get("concurrency", executor.DEFAULT_CONCURRENCY),
+    ).run(params["genre"], params["audience"], params["text"])
+    return document_result(state, correction_format)
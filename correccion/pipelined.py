@@ -0,0 +1,185 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+# Caracteres de análisis a partir de los cuales la corrección puede arrancar en modo canalizado
+MIN_ANALYSIS_CHARS = 800
+
+# Cada cuánto (segundos) el hilo principal repinta el texto parcial de la corrección
+POLL_INTERVAL = 0.1
+
+
+# Función para extraer el contenido de una respuesta de chat completions
+def response_content(api_response):
+    try:
+        return api_response['choices'][0]['message']['content']
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+# Función para recortar un análisis parcial al último párrafo completo, o None si aún es muy corto
+def partial_analysis(text, min_chars=MIN_ANALYSIS_CHARS):
+    if len(text) < min_chars:
+        return None
+    cut = text.rfind("\n\n")
+    if cut < min_chars:
+        return None
+    return text[:cut].rstrip()
+
+
+# Llamada ejecutada en un hilo de fondo que expone el texto parcial y su propia duración.
+# El hilo no toca Streamlit: el hilo principal lee `partial` y repinta.
+class BackgroundCall:
+    def __init__(self, executor, fn, *args):
+        self.partial = ""
+        self.elapsed = None
+        self.future = executor.submit(self._run, fn, *args)
+
+    def _on_token(self, partial):
+        self.partial = partial
+
+    def _run(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args, on_token=self._on_token)
+        finally:
+            self.elapsed = time.perf_counter() - start
+
+    # Espera el resultado repintando el texto parcial con on_token
+    def result(self, on_token=None):
+        shown = None
+        while not self.future.done():
+            wait([self.future], timeout=POLL_INTERVAL)
+            if on_token and self.partial and self.partial is not shown:
+                shown = self.partial
+                on_token(shown)
+        return self.future.result()
+
+
+# Función para comparar la duración real con la del flujo secuencial (suma de etapas)
+def compare_timings(stages, wall):
+    sequential = sum(stages.values())
+    return {
+        "etapas": stages,
+        "secuencial": sequential,
+        "real": wall,
+        "ahorro": 1 - wall / sequential if sequential else 0.0,
+    }
+
+
+# Modo secuencial (el flujo original): la corrección espera el análisis completo
+def run_sequential(analyze, correct, on_analysis_token=None, on_correction_token=None):
+    start = time.perf_counter()
+    analysis_response = analyze(on_token=on_analysis_token)
+    stages = {"análisis": time.perf_counter() - start}
+    analysis = response_content(analysis_response)
+    correction_response = None
+    if analysis:
+        correction_start = time.perf_counter()
+        correction_response = correct(analysis, on_token=on_correction_token)
+        stages["corrección"] = time.perf_counter() - correction_start
+    return analysis_response, correction_response, compare_timings(stages, time.perf_counter() - start)
+
+
+# Modo canalizado: la corrección arranca en cuanto hay bastante análisis parcial.
+# analyze(on_token) y correct(analysis, on_token) deben lanzar excepciones en vez de mostrarlas:
+# las de la corrección se relanzan aquí, en el hilo principal.
+def run_pipelined(analyze, correct, on_analysis_token=None, on_correction_token=None,
+                  min_chars=MIN_ANALYSIS_CHARS):
+    start = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=1)
+    background = None
+
+    def on_token(partial):
+        nonlocal background
+        if on_analysis_token:
+            on_analysis_token(partial)
+        if background is None:
+            seed = partial_analysis(partial, min_chars)
+            if seed:
+                background = BackgroundCall(executor, correct, seed)
+
+    try:
+        # El análisis siempre se pide en streaming para poder arrancar la corrección a mitad
+        analysis_response = analyze(on_token=on_token)
+        stages = {"análisis": time.perf_counter() - start}
+        if background is None:
+            # Análisis corto: no hubo parcial suficiente y se corrige con el análisis completo
+            analysis = response_content(analysis_response)
+            if not analysis:
+                return analysis_response, None, compare_timings(stages, time.perf_counter() - start)
+            background = BackgroundCall(executor, correct, analysis)
+        correction_response = background.result(on_correction_token)
+        stages["corrección"] = background.elapsed
+        return analysis_response, correction_response, compare_timings(stages, time.perf_counter() - start)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Modo paralelo: la corrección se hace sin análisis a la vez que éste, y después
+# reconcile(analysis, correction) emite notas breves que unen ambos resultados.
+def run_parallel(analyze, correct, reconcile, on_analysis_token=None, on_correction_token=None):
+    start = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        background = BackgroundCall(executor, correct, None)
+        analysis_response = analyze(on_token=on_analysis_token)
+        stages = {"análisis": time.perf_counter() - start}
+        correction_response = background.result(on_correction_token)
+        stages["corrección"] = background.elapsed
+        reconciliation_response = None
+        analysis = response_content(analysis_response)
+        correction = response_content(correction_response)
+        if analysis and correction:
+            reconcile_start = time.perf_counter()
+            reconciliation_response = reconcile(analysis, correction)
+            stages["conciliación"] = time.perf_counter() - reconcile_start
+        timings = compare_timings(stages, time.perf_counter() - start)
+        return analysis_response, correction_response, reconciliation_response, timings
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Modo en abanico: las llamadas calls (fn(on_token=None)) se lanzan a la vez y se devuelven sus respuestas en
+# el orden de calls junto con la duración de cada una. Con on_token, el hilo principal repinta join(partes),
+# las respuestas completas y el texto parcial de las demás en orden, a medida que avanzan; sin on_token las
+# llamadas no usan streaming. La excepción de cualquier llamada se relanza aquí en cuanto ocurre.
+def run_fanout(calls, on_token=None, join=None):
+    join = join or (lambda parts: "\n\n".join(part for part in parts if part))
+    executor = ThreadPoolExecutor(max_workers=max(1, len(calls)))
+    try:
+        if on_token is None:
+            timed = [executor.submit(_timed_call, call) for call in calls]
+            for future in wait(timed, return_when=FIRST_EXCEPTION).done:
+                future.result()  # Relanza la primera excepción sin esperar a las demás llamadas
+            results = [future.result() for future in timed]
+            return [response for response, _ in results], [elapsed for _, elapsed in results]
+
+        backgrounds = [BackgroundCall(executor, call) for call in calls]
+        shown = None
+        while True:
+            pending = [background.future for background in backgrounds if not background.future.done()]
+            if pending:
+                wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            parts = []
+            for background in backgrounds:
+                if background.future.done():
+                    # result() relanza la excepción de la llamada
+                    parts.append(response_content(background.future.result()) or "")
+                else:
+                    parts.append(background.partial)
+            assembled = join(parts)
+            if assembled and assembled != shown:
+                shown = assembled
+                on_token(shown)
+            if not pending:
+                break
+        responses = [background.future.result() for background in backgrounds]
+        return responses, [background.elapsed for background in backgrounds]
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _timed_call(call):
+    start = time.perf_counter()
+    response = call()
+    return response, time.perf_counter() - start
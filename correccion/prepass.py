@@ -0,0 +1,141 @@
+import re
+import time
+
+from correccion import edits
+
+# Prepaso local y determinista: corrige lo mecánico (espacios, signos de apertura, rayas de diálogo, comillas,
+# faltas frecuentes) antes de la corrección con el modelo, que así sólo tiene que ocuparse del estilo.
+# Lo que no es seguro aplicar se devuelve como aviso sin tocar el texto.
+
+# Faltas frecuentes sin ambigüedad: la forma incorrecta (en minúsculas) y su corrección
+MISSPELLINGS = {
+    "adios": "adiós", "algun": "algún", "alli": "allí", "almenos": "al menos",
+    "aqui": "aquí", "asi": "así", "atras": "atrás", "atraves": "a través", "através": "a través",
+    "aveces": "a veces", "cancion": "canción", "corazon": "corazón", "decia": "decía", "decision": "decisión",
+    "desicion": "decisión", "despues": "después", "despúes": "después", "dia": "día", "dias": "días",
+    "dificil": "difícil", "dijistes": "dijiste", "excepcion": "excepción", "exepcion": "excepción",
+    "exepción": "excepción", "expontaneo": "espontáneo", "expontáneo": "espontáneo", "facil": "fácil",
+    "fuistes": "fuiste", "habia": "había", "habian": "habían", "haiga": "haya", "hechar": "echar",
+    "hicistes": "hiciste", "jamas": "jamás", "nadien": "nadie", "ningun": "ningún", "ojala": "ojalá",
+    "podia": "podía", "podian": "podían", "porfavor": "por favor", "preveer": "prever",
+    "queria": "quería", "quizas": "quizás", "rapido": "rápido", "rapidamente": "rápidamente", "razon": "razón",
+    "sentia": "sentía", "sinembargo": "sin embargo", "tambien": "también", "tambíen": "también",
+    "tenian": "tenían", "todavia": "todavía", "traves": "través",
+}
+
+# Faltas probables que también son palabras válidas (tenia, el parásito; ademas, de ademar; ósea, sin su tilde) o
+# del portugués (veia): sólo se avisa, con las correcciones posibles
+AMBIGUOUS_MISSPELLINGS = {
+    "ademas": ("además",), "osea": ("o sea", "ósea"), "tenia": ("tenía",), "veia": ("veía",),
+}
+
+_WORD = re.compile(r"\b[^\W\d_]+\b")
+_DOUBLE_SPACE = re.compile(r"(?<=\S)[ \t]{2,}(?=\S)")
+_SPACE_BEFORE_PUNCTUATION = re.compile(r"(?<=\w)[ \t]+(?=[,;:.!?…](?!\w))")
+_ELLIPSIS = re.compile(r"(?<!\.)\.{3}(?!\.)")
+# Sólo ante letra o ¿¡: un guion ante cifra es un signo menos ("-5 grados")
+_DIALOGUE_DASH = re.compile(r"^(?P<indent>[ \t]*)(?P<dash>--?)(?=[¿¡]|[^\W\d_])", re.MULTILINE)
+_LIST_DASH = re.compile(r"^[ \t]*- (?=[¿¡A-ZÁÉÍÓÚÑ])", re.MULTILINE)
+_DOUBLE_HYPHEN = re.compile(r"(?<=[\w ])--(?=[\w ])")
+_INCISO_HYPHEN = re.compile(r"(?<=[?!.,…])-(?=[a-záéíóúñ])")
+_STRAIGHT_QUOTES = re.compile(r'"(?P<inner>[^"\n]+)"')
+_CURLY_QUOTES = re.compile(r"“(?P<inner>[^”\n]+)”")
+# Una pregunta o exclamación: lo que va desde el inicio de la oración hasta el signo de cierre, sin apertura
+_UNOPENED = re.compile(
+    r"(?:^|(?<=[.!?…;:\n—«\"(]))(?P<lead>[\s*_]*(?:--?|—)?)(?P<body>[^.!?…;:\n¿¡—«»“”\"()*_]+)(?P<close>[?!])",
+    re.MULTILINE,
+)
+_OPENING = {"?": "¿", "!": "¡"}
+
+
+# Función para conservar las mayúsculas de la palabra original en su corrección
+def _match_case(word, replacement):
+    if word.isupper() and len(word) > 1:
+        return replacement.upper()
+    if word[0].isupper():
+        return replacement[0].upper() + replacement[1:]
+    return replacement
+
+
+# Función para proponer las correcciones de faltas frecuentes y avisar de las ambiguas
+def _misspellings(text):
+    for match in _WORD.finditer(text):
+        word = match.group()
+        replacement = MISSPELLINGS.get(word.lower())
+        if replacement:
+            yield match.start(), match.end(), _match_case(word, replacement), "ORT", "falta frecuente"
+        elif word.lower() in AMBIGUOUS_MISSPELLINGS:
+            options = " o ".join(f"«{_match_case(word, option)}»" for option in AMBIGUOUS_MISSPELLINGS[word.lower()])
+            yield match.start(), match.end(), None, "ORT", f"¿{options}? Falta probable, pero no segura"
+
+
+# Función para proponer las correcciones de espacios, puntos suspensivos, rayas y comillas
+def _typography(text):
+    for match in _DOUBLE_SPACE.finditer(text):
+        yield match.start(), match.end(), " ", "TIP", "espacio doble"
+    for match in _SPACE_BEFORE_PUNCTUATION.finditer(text):
+        yield match.start(), match.end(), "", "PUN", "espacio antes del signo"
+    for match in _ELLIPSIS.finditer(text):
+        yield match.start(), match.end(), "…", "TIP", "puntos suspensivos"
+    for match in _DIALOGUE_DASH.finditer(text):
+        yield match.start("dash"), match.end("dash"), "—", "TIP", "raya de diálogo"
+    for match in _DOUBLE_HYPHEN.finditer(text):
+        yield match.start(), match.end(), "—", "TIP", "raya"
+    for match in _INCISO_HYPHEN.finditer(text):
+        yield match.start(), match.end(), "—", "TIP", "raya del inciso del narrador"
+    for pattern in (_STRAIGHT_QUOTES, _CURLY_QUOTES):
+        for match in pattern.finditer(text):
+            yield match.start(), match.start() + 1, "«", "TIP", "comillas angulares"
+            yield match.end() - 1, match.end(), "»", "TIP", "comillas angulares"
+
+
+# Función para proponer los signos de apertura ¿ y ¡. Si la oración tiene una coma o un punto y coma, la pregunta
+# puede empezar a mitad de ella ("Dime, ¿vienes?"), así que sólo se avisa.
+def _openings(text):
+    for match in _UNOPENED.finditer(text):
+        body = match.group("body")
+        if not _WORD.search(body):
+            continue
+        opening = _OPENING[match.group("close")]
+        if "," in body:
+            yield match.start("body"), match.end("body"), None, "PUN", f"falta «{opening}» y no está claro dónde va"
+        else:
+            yield match.start("body"), match.start("body"), opening, "PUN", "signo de apertura"
+
+
+# Función para los avisos de guiones que pueden ser diálogo o una lista en markdown
+def _dialogue_flags(text):
+    for match in _LIST_DASH.finditer(text):
+        yield match.start(), match.end(), None, "TIP", "¿raya de diálogo o lista? Si es diálogo, usa «—» sin espacio"
+
+
+# Función para ejecutar el prepaso. Devuelve las ediciones aplicadas (edits.Edit), los avisos (edits.Edit con
+# replacement None), el texto corregido, la vista anotada y los segundos empleados. Nunca toca hipervínculos.
+def run(text):
+    start = time.perf_counter()
+    protected = edits.link_spans(text)
+    proposed = []
+    flags = []
+    for rule in (_misspellings, _typography, _openings, _dialogue_flags):
+        for edit_start, edit_end, replacement, reason, note in rule(text):
+            if any(link_start < edit_end and edit_start < link_end for link_start, link_end in protected):
+                continue
+            edit = edits.Edit(edit_start, edit_end, text[edit_start:edit_end], replacement, reason, note)
+            (flags if replacement is None else proposed).append(edit)
+
+    applied = []
+    last_start, last_end = -1, -1
+    for edit in sorted(proposed, key=lambda edit: (edit.start, edit.end)):
+        # Dos inserciones en el mismo punto, o ediciones solapadas: se queda la primera
+        if edit.start < last_end or (edit.start == last_start and edit.start == edit.end):
+            continue
+        applied.append(edit)
+        last_start, last_end = edit.start, edit.end
+
+    return {
+        "edits": applied,
+        "flags": sorted(flags, key=lambda edit: edit.start),
+        "corrected": edits.apply_edits(text, applied),
+        "annotated": edits.render_annotated(text, applied),
+        "seconds": time.perf_counter() - start,
+    }
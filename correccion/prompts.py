@@ -0,0 +1,354 @@
+import os
+from textwrap import dedent
+
+from correccion import budget, compaction
+from correccion.edits import REASON_CODES
+
+# Versión de las plantillas: súbela al cambiar cualquier prompt para invalidar la caché de respuestas
+PROMPT_VERSION = "4"
+
+# Modelos de cada etapa sin enrutador (correccion.router elige otros según el nivel de servicio)
+ANALYSIS_MODEL = "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo"
+CORRECTION_MODEL = "mistralai/Mixtral-8x7B-Instruct-v0.1"
+RECONCILIATION_MODEL = "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo"
+REVIEW_MODEL = "mistralai/Mixtral-8x7B-Instruct-v0.1"  # app.py: sólo análisis, sin corrección
+
+# Prompts compactos en la corrección: instrucciones sin repetir las del sistema, análisis destilado en viñetas y
+# prefijo fijo delante de lo variable. Desactivados por defecto hasta comparar la calidad de las correcciones con
+# los prompts completos sobre los textos de muestra (CORRECCION_COMPACT_PROMPTS=1 los activa).
+COMPACT_PROMPTS = os.environ.get("CORRECCION_COMPACT_PROMPTS", "0").lower() in ("1", "true", "yes", "si", "sí")
+
+# Análisis en abanico: una petición por sección a la vez, cada una con su parte de los tokens de salida
+# (CORRECCION_ANALYSIS_FANOUT=1 lo activa por defecto)
+ANALYSIS_FANOUT = os.environ.get("CORRECCION_ANALYSIS_FANOUT", "0").lower() in ("1", "true", "yes", "si", "sí")
+
+# Secciones del análisis, en el orden en que se muestran, con el aspecto que cubre cada una
+ANALYSIS_SECTIONS = (
+    ("Temas", "los temas, las ideas centrales y su tratamiento"),
+    ("Desarrollo de Personajes", "la construcción, las motivaciones, la evolución y las voces de los personajes"),
+    ("Estructura Narrativa", "la organización del relato, el ritmo, la tensión, las transiciones y el punto de vista"),
+    ("Estilo y Tono", "el lenguaje, la sintaxis, las figuras, el registro y el tono respecto del género y la audiencia"),
+)
+
+# Parámetros de muestreo comunes a todas las llamadas
+SAMPLING_PARAMS = {
+    "temperature": 0.5,  # Reducida para respuestas más enfocadas
+    "top_p": 0.7,
+    "top_k": 50,
+    "repetition_penalty": 1,
+    "stop": ["<|eot_id|>"],
+}
+
+ANALYSIS_SYSTEM_PROMPT = dedent("""
+    Eres un crítico literario experto que proporciona análisis detallados y recomendaciones de estilo basadas en el género y la audiencia especificados.
+    **No debes corregir, modificar ni repetir el texto proporcionado.**
+    Tu única tarea es analizar el texto y ofrecer sugerencias de mejora enfocadas en aspectos literarios específicos como temas, desarrollo de personajes, estructura narrativa, tono y estilo.
+""")
+
+NOTES_SYSTEM_PROMPT = dedent("""
+    Eres un crítico literario experto que toma notas breves sobre una sección de un texto más largo, según el género y la audiencia especificados.
+    **No debes corregir, modificar ni repetir el texto proporcionado.**
+""")
+
+CORRECTION_SYSTEM_PROMPT = dedent("""
+    Eres un editor experto en corrección de estilo, ortografía, gramática y puntuación que revisa textos literarios.
+    **No debes realizar cambios que alteren el contenido original del autor.**
+    Tu tarea es corregir el estilo, ortografía, gramática y puntuación del texto proporcionado basado en el análisis y las recomendaciones previas.
+    **Preserva todos los hipervínculos existentes en el texto. No agregues nuevos hipervínculos a menos que sean necesarios. No alteres las URLs de los hipervínculos existentes.**
+    **Después de cada cambio realizado, añade una justificación entre corchetes y en color rojo.**
+""")
+
+EDITS_SYSTEM_PROMPT = dedent("""
+    Eres un editor experto en corrección de estilo, ortografía, gramática y puntuación que revisa textos literarios.
+    **No debes realizar cambios que alteren el contenido original del autor.**
+    **No reescribas el texto completo:** devuelve únicamente la lista de cambios en JSON.
+    **No modifiques hipervínculos ni URLs.**
+""")
+
+RECONCILIATION_SYSTEM_PROMPT = dedent("""
+    Eres un editor literario que compara un análisis con una corrección de estilo ya realizada.
+    **No reescribas ni repitas el texto corregido.**
+    Tu única tarea es señalar, de forma breve, qué recomendaciones del análisis no quedaron reflejadas en la corrección.
+""")
+
+
+# Función para armar el payload de una llamada con los parámetros comunes
+def build_payload(model, messages, max_tokens):
+    return {
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        **SAMPLING_PARAMS,
+    }
+
+
+# Bloque de contexto para los fragmentos de un manuscrito largo (no se analiza ni se corrige)
+def _context_block(context):
+    if not context:
+        return []
+    return [
+        "**Contexto previo (fragmento anterior del manuscrito; úsalo sólo como referencia, no lo analices, corrijas ni repitas):**",
+        context,
+        "",
+    ]
+
+
+# Payload del análisis literario; app.py usa su propio modelo y no menciona los hipervínculos
+def analysis_payload(genre, audience, text, model=ANALYSIS_MODEL, preserve_links=True, context=None):
+    instructions = [
+        "- No repitas el análisis previamente proporcionado.",
+        "- No corrijas ni modifiques el texto original de ninguna manera.",
+        "- Enfócate únicamente en proporcionar observaciones, críticas constructivas y sugerencias de mejora relacionadas directamente con el contenido del texto.",
+    ]
+    if preserve_links:
+        instructions += [
+            "- Preserva todos los hipervínculos existentes en el texto. No agregues nuevos hipervínculos a menos que sean necesarios.",
+            "- No alteres las URLs de los hipervínculos existentes.",
+        ]
+    instructions.append(
+        "- Organiza el análisis en secciones claras como **Temas**, **Desarrollo de Personajes**, **Estructura Narrativa**, **Estilo y Tono**, etc."
+    )
+    messages = [
+        {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": "\n".join([
+                "Por favor, analiza el siguiente texto y proporciona una crítica literaria junto con recomendaciones de estilo específicas.",
+                "",
+                "**Instrucciones adicionales:**",
+                *instructions,
+                "",
+                f"**Género:** {genre}",
+                f"**Audiencia:** {audience}",
+                "",
+                *_context_block(context),
+                "**Texto:**",
+                text,
+            ])
+        }
+    ]
+    max_tokens = budget.analysis_max_tokens(budget.count_tokens(text, model))
+    return build_payload(model, messages, budget.fit_max_tokens(model, messages, max_tokens))
+
+
+# Payload de una sola sección del análisis (modo en abanico): mismo sistema e instrucciones que el análisis
+# completo, pero centrado en un aspecto y con la parte de los tokens de salida que le toca
+def section_payload(genre, audience, text, section, model=ANALYSIS_MODEL, preserve_links=True, context=None):
+    focus = dict(ANALYSIS_SECTIONS)[section]
+    instructions = [
+        "- No corrijas ni modifiques el texto original de ninguna manera.",
+        f"- Trata sólo {focus}; otras secciones del análisis se piden por separado.",
+        f"- Empieza con el encabezado **{section}** y no añadas otros encabezados.",
+    ]
+    if preserve_links:
+        instructions.append("- Preserva todos los hipervínculos existentes en el texto y no alteres sus URLs.")
+    messages = [
+        {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": "\n".join([
+                f"Por favor, analiza el siguiente texto en cuanto a **{section}** y proporciona una crítica literaria junto con recomendaciones de estilo específicas.",
+                "",
+                "**Instrucciones adicionales:**",
+                *instructions,
+                "",
+                f"**Género:** {genre}",
+                f"**Audiencia:** {audience}",
+                "",
+                *_context_block(context),
+                "**Texto:**",
+                text,
+            ])
+        }
+    ]
+    max_tokens = budget.section_max_tokens(budget.count_tokens(text, model), len(ANALYSIS_SECTIONS))
+    return build_payload(model, messages, budget.fit_max_tokens(model, messages, max_tokens))
+
+
+# Payload de las notas de una sección para el reanálisis incremental: mismos encabezados que el análisis,
+# así las notas de todas las secciones se fusionan en un informe del documento sin otra llamada
+def notes_payload(genre, audience, text, model=ANALYSIS_MODEL):
+    messages = [
+        {"role": "system", "content": NOTES_SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": "\n".join([
+                "Toma notas breves, en viñetas, con las observaciones y recomendaciones de estilo más importantes para esta sección.",
+                "",
+                "**Instrucciones adicionales:**",
+                "- No corrijas ni modifiques el texto original de ninguna manera.",
+                "- Preserva todos los hipervínculos existentes en el texto y no alteres sus URLs.",
+                "- Usa sólo los encabezados que apliquen de **Temas**, **Desarrollo de Personajes**, **Estructura Narrativa** y **Estilo y Tono**.",
+                "",
+                f"**Género:** {genre}",
+                f"**Audiencia:** {audience}",
+                "",
+                "**Texto:**",
+                text,
+            ])
+        }
+    ]
+    max_tokens = budget.notes_max_tokens(budget.count_tokens(text, model))
+    return build_payload(model, messages, budget.fit_max_tokens(model, messages, max_tokens))
+
+
+# Instrucciones fijas de los prompts compactos de corrección. Van al principio del mensaje y no cambian entre
+# peticiones, así el prefijo (sistema + instrucciones) es idéntico byte a byte y el proveedor puede reutilizarlo
+# desde su caché de prompts; lo que varía (recomendaciones, contexto, texto) va detrás.
+COMPACT_CORRECTION_INSTRUCTIONS = "\n".join([
+    "Corrige el estilo, la ortografía, la gramática y la puntuación del texto original siguiendo las recomendaciones.",
+    "- Mejora la claridad y el flujo sin cambiar el contenido.",
+    '- Tras cada cambio, su justificación entre corchetes en <span style="color:red">[...]</span>.',
+    "- Responde sólo con el texto corregido completo, con las justificaciones inline.",
+])
+COMPACT_EDITS_INSTRUCTIONS = "\n".join([
+    "Corrige el estilo, la ortografía, la gramática y la puntuación del texto original siguiendo las recomendaciones.",
+    'Responde sólo con un objeto JSON {"edits": [...]}. Cada edición es {"start": <desplazamiento en caracteres>, '
+    '"original": "<fragmento exacto>", "replacement": "<sustituto>", "reason": "<código>", "note": "<justificación breve>"}.',
+    "Códigos de motivo: " + ", ".join(f"{code} ({name})" for code, name in REASON_CODES.items()) + ".",
+    "- Fragmentos originales copiados carácter por carácter, lo más cortos posible, sin solaparse.",
+    '- Si no hace falta ningún cambio: {"edits": []}.',
+])
+
+
+# Mensaje de usuario de un prompt compacto: instrucciones fijas, recomendaciones destiladas, contexto y texto
+def _compact_message(instructions, analysis, text, context):
+    recommendations = compaction.distill(analysis) if analysis else None
+    return "\n".join([
+        instructions,
+        "",
+        *(["**Recomendaciones:**", recommendations, ""] if recommendations else []),
+        *_context_block(context),
+        "**Texto Original:**",
+        text,
+    ])
+
+
+# Payload de la corrección de estilo con justificaciones inline; analysis=None corrige sin análisis previo
+def correction_payload(analysis, text, context=None, model=CORRECTION_MODEL, compact=False):
+    if compact:
+        messages = [
+            {"role": "system", "content": CORRECTION_SYSTEM_PROMPT},
+            {"role": "user", "content": _compact_message(COMPACT_CORRECTION_INSTRUCTIONS, analysis, text, context)},
+        ]
+        max_tokens = budget.correction_max_tokens(budget.count_tokens(text, model))
+        return build_payload(model, messages, budget.fit_max_tokens(model, messages, max_tokens))
+    if analysis is None:
+        request = [
+            "Realiza una corrección de estilo del texto proporcionado. Incluye también correcciones ortográficas, gramaticales y de puntuación. Después de cada cambio realizado, añade una justificación entre corchetes y en color rojo.",
+            "",
+        ]
+    else:
+        request = [
+            "Basado en el siguiente análisis y recomendaciones, realiza una corrección de estilo del texto proporcionado. Incluye también correcciones ortográficas, gramaticales y de puntuación. Después de cada cambio realizado, añade una justificación entre corchetes y en color rojo.",
+            "",
+            "**Análisis y Recomendaciones:**",
+            analysis,
+            "",
+        ]
+    messages = [
+        {"role": "system", "content": CORRECTION_SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": "\n".join([
+                *request,
+                *_context_block(context),
+                "**Texto Original:**",
+                text,
+                "",
+                "**Instrucciones adicionales:**",
+                "- No corrijas ni modifiques el contenido del texto.",
+                "- Enfócate únicamente en mejorar la claridad, el flujo, el estilo, la ortografía, la gramática y la puntuación.",
+                "- Preserva todos los hipervínculos existentes en el texto. No agregues nuevos hipervínculos a menos que sean necesarios.",
+                "- No alteres las URLs de los hipervínculos existentes.",
+                "- Para cada cambio realizado, proporciona una justificación detallada entre corchetes y estilizada en color rojo.",
+                "- Presenta el texto corregido con las justificaciones inline.",
+            ])
+        }
+    ]
+    # La salida repite el texto y añade justificaciones, así que se dimensiona a partir de él
+    max_tokens = budget.correction_max_tokens(budget.count_tokens(text, model))
+    return build_payload(model, messages, budget.fit_max_tokens(model, messages, max_tokens))
+
+
+# Payload de la corrección como lista de ediciones en JSON (la salida crece con los cambios, no con el texto)
+def edits_payload(analysis, text, context=None, model=CORRECTION_MODEL, compact=False):
+    if compact:
+        messages = [
+            {"role": "system", "content": EDITS_SYSTEM_PROMPT},
+            {"role": "user", "content": _compact_message(COMPACT_EDITS_INSTRUCTIONS, analysis, text, context)},
+        ]
+        max_tokens = budget.edits_max_tokens(budget.count_tokens(text, model))
+        payload = build_payload(model, messages, budget.fit_max_tokens(model, messages, max_tokens))
+        payload["response_format"] = {"type": "json_object"}
+        return payload
+    reasons = ", ".join(f"{code} ({name})" for code, name in REASON_CODES.items())
+    request = ["Corrige el estilo, la ortografía, la gramática y la puntuación del texto original."]
+    if analysis is not None:
+        request += ["Ten en cuenta el siguiente análisis y recomendaciones.", "", "**Análisis y Recomendaciones:**", analysis]
+    messages = [
+        {"role": "system", "content": EDITS_SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": "\n".join([
+                *request,
+                "",
+                *_context_block(context),
+                "**Texto Original:**",
+                text,
+                "",
+                "**Formato de respuesta:**",
+                'Responde sólo con un objeto JSON {"edits": [...]}, sin texto adicional. Cada edición es',
+                '{"start": <desplazamiento en caracteres dentro del texto original>, "original": "<fragmento exacto del texto original>", '
+                '"replacement": "<texto que lo sustituye>", "reason": "<código>", "note": "<justificación breve>"}.',
+                f"Códigos de motivo: {reasons}.",
+                "- Copia el fragmento original carácter por carácter y hazlo lo más corto posible.",
+                "- No incluyas ediciones que no cambien nada ni ediciones que se solapen.",
+                '- Si el texto no necesita cambios, responde {"edits": []}.',
+            ])
+        }
+    ]
+    max_tokens = budget.edits_max_tokens(budget.count_tokens(text, model))
+    payload = build_payload(model, messages, budget.fit_max_tokens(model, messages, max_tokens))
+    payload["response_format"] = {"type": "json_object"}  # Modo JSON de Together
+    return payload
+
+
+# Plantilla de la conciliación, preparada una vez al importar el módulo
+RECONCILIATION_TEMPLATE = dedent("""
+    Compara el análisis con la corrección y enumera, en viñetas breves, las recomendaciones del análisis que la corrección no aplicó y cómo aplicarlas.
+    Si la corrección ya las cubre todas, responde únicamente: "La corrección refleja el análisis."
+
+    **Análisis y Recomendaciones:**
+    {analysis}
+
+    **Texto Corregido:**
+    {correction}
+""")
+
+
+# Payload de la conciliación entre un análisis y una corrección hecha sin él (salida corta)
+def reconciliation_payload(analysis, correction, model=RECONCILIATION_MODEL):
+    messages = [
+        {"role": "system", "content": RECONCILIATION_SYSTEM_PROMPT},
+        {"role": "user", "content": RECONCILIATION_TEMPLATE.format(analysis=analysis, correction=correction)},
+    ]
+    return build_payload(model, messages, budget.fit_max_tokens(model, messages, 500))
+
+
+# Instrucción para continuar una respuesta cortada por max_tokens
+CONTINUATION_INSTRUCTION = (
+    "Tu respuesta anterior se interrumpió por el límite de longitud. Continúa exactamente donde se cortó, "
+    "sin repetir nada de lo ya escrito ni añadir introducciones."
+)
+
+
+# Payload de la continuación de una respuesta cortada: el mismo prompt, lo ya generado como respuesta del asistente
+# y la instrucción de seguir. Sin response_format: la continuación de un JSON no es un objeto JSON por sí sola.
+def continuation_payload(payload, partial):
+    messages = payload["messages"] + [
+        {"role": "assistant", "content": partial},
+        {"role": "user", "content": CONTINUATION_INSTRUCTION},
+    ]
+    model = payload["model"]
+    return build_payload(model, messages, budget.fit_max_tokens(model, messages, payload["max_tokens"]))
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from correccion.cache import normalize_text
+
+# Ubicación y ritmo de escritura por defecto del almacén de resultados
+DEFAULT_PATH = os.environ.get("CORRECCION_RESULTS_PATH", os.path.join(".cache", "resultados.sqlite3"))
+BATCH_SIZE = 50  # Resultados por transacción
+FLUSH_INTERVAL = 1.0  # Segundos máximos que un resultado espera en la cola antes de escribirse
+SNIPPET_WORDS = 24  # Palabras del fragmento de contexto en los resultados de búsqueda
+# Coincidencias más recientes que se ordenan por relevancia: bm25 cuesta en proporción a las coincidencias, y un
+# término habitual ("personaje") aparece en casi todos los análisis; con la ventana la consulta sigue por debajo de
+# los 100 ms con decenas de miles de documentos
+RANK_WINDOW = int(os.environ.get("CORRECCION_RESULTS_RANK_WINDOW", "5000"))
+
+_COLUMNS = ("id", "created", "input_hash", "author", "genre", "audience", "analysis", "correction", "model",
+            "timings", "words")
+_TERM = re.compile(r"\w+\*?")
+
+
+# Función para la huella de un texto de entrada (normalizado, como la caché de respuestas)
+def input_hash(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+# Función para convertir una búsqueda libre en una consulta FTS5 segura: cada palabra entre comillas (todas deben
+# aparecer) y "palabra*" como prefijo; así los signos que FTS5 interpreta no provocan errores de sintaxis
+def fts_query(text, any_term=False):
+    terms = []
+    for term in _TERM.findall(text):
+        prefix = term.endswith("*")
+        term = term.rstrip("*")
+        if term:
+            terms.append(f'"{term}"' + ("*" if prefix else ""))
+    return (" OR " if any_term else " ").join(terms)
+
+
+# Almacén persistente de análisis y correcciones con índice de texto completo (SQLite FTS5).
+# add() sólo encola: un hilo escribe los resultados por lotes, así guardar no añade latencia a la petición.
+class ResultStore:
+    def __init__(self, path=DEFAULT_PATH, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()  # Conexión SQLite
+        self._counters_lock = threading.Lock()  # Contadores: add() no espera a que termine un lote
+        # errors: resultados que no se pudieron guardar (se descartan; last_error dice por qué)
+        self.counters = {"queued": 0, "written": 0, "batches": 0, "errors": 0, "searches": 0}
+        self.last_error = None
+
+        # path=None deja el almacén en memoria
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " id INTEGER PRIMARY KEY, created REAL NOT NULL, input_hash TEXT NOT NULL, author TEXT,"
+            " genre TEXT, audience TEXT, analysis TEXT, correction TEXT, model TEXT, timings TEXT, words INTEGER)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_input_hash ON results (input_hash)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_author ON results (author, created)")
+        # Índice externo sobre results: sin tildes ni mayúsculas, así "caracter" encuentra "carácter"
+        self._db.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS results_fts USING fts5("
+            " author, genre, audience, analysis, correction,"
+            " content='results', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        )
+        self._writer = threading.Thread(target=self._write_loop, name="resultados", daemon=True)
+        self._writer.start()
+
+    # Encola un resultado para guardarlo. model es el modelo que respondió o, si respondieron varios (manuscritos
+    # por fragmentos), el nivel del router; timings es un dict con las duraciones (se guarda como JSON).
+    def add(self, text, analysis, correction=None, genre=None, audience=None, author=None, model=None, timings=None):
+        with self._counters_lock:
+            self.counters["queued"] += 1
+        # La huella y el JSON se calculan en el hilo de escritura
+        self._queue.put((time.time(), text, author or None, genre, audience, analysis, correction, model, timings))
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            # Un lote que falla se descarta y se cuenta, pero el hilo sigue vivo y flush() no se queda esperando
+            try:
+                rows = [
+                    (created, input_hash(text), author, genre, audience, analysis, correction, model,
+                     json.dumps(timings or {}, ensure_ascii=False), len(text.split()))
+                    for created, text, author, genre, audience, analysis, correction, model, timings
+                    in filter(None, batch)
+                ]
+                if rows:
+                    self._write(rows)
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                with self._counters_lock:
+                    self.counters["errors"] += sum(1 for item in batch if item is not None)
+                    self.last_error = f"{type(e).__name__}: {e}"
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, rows):
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                for row in rows:
+                    cursor = self._db.execute(
+                        "INSERT INTO results (created, input_hash, author, genre, audience, analysis, correction,"
+                        " model, timings, words) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        row,
+                    )
+                    self._db.execute(
+                        "INSERT INTO results_fts (rowid, author, genre, audience, analysis, correction)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        (cursor.lastrowid, row[2], row[3], row[4], row[5], row[6]),
+                    )
+                self._db.execute("COMMIT")
+            except sqlite3.Error:
+                self._db.execute("ROLLBACK")
+                raise
+        with self._counters_lock:
+            self.counters["written"] += len(rows)
+            self.counters["batches"] += 1
+
+    # Espera a que se escriba todo lo encolado (pruebas, cierre del proceso)
+    def flush(self):
+        self._queue.put(None)
+        self._queue.join()
+
+    def _rows(self, query, params):
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        results = []
+        for row in rows:
+            result = dict(zip(_COLUMNS + ("snippet",), row))
+            result["timings"] = json.loads(result["timings"]) if result["timings"] else {}
+            results.append(result)
+        return results
+
+    # Búsqueda de texto completo en autor, género, audiencia, análisis y corrección, ordenada por relevancia (bm25)
+    # entre las RANK_WINDOW coincidencias más recientes, con filtros exactos opcionales. Cada resultado lleva un
+    # fragmento de contexto con los términos en negrita.
+    def search(self, text, genre=None, audience=None, author=None, limit=20, any_term=False):
+        match = fts_query(text, any_term)
+        with self._counters_lock:
+            self.counters["searches"] += 1
+        if not match:
+            return self.recent(genre=genre, audience=audience, author=author, limit=limit)
+        where = " FROM results_fts JOIN results r ON r.id = results_fts.rowid WHERE results_fts MATCH ?"
+        params = [match]
+        for column, value in (("genre", genre), ("audience", audience), ("author", author)):
+            if value:
+                where += f" AND r.{column} = ?"
+                params.append(value)
+        # Sin filtros la ventana se calcula sólo con el índice, sin leer la tabla
+        window = (
+            "SELECT r.id" + where if len(params) > 1
+            else "SELECT rowid FROM results_fts WHERE results_fts MATCH ?"
+        )
+        with self._lock:
+            oldest = self._db.execute(window + " ORDER BY 1 DESC LIMIT 1 OFFSET ?", params + [RANK_WINDOW - 1]).fetchone()
+        if oldest:
+            where += " AND results_fts.rowid >= ?"
+            params.append(oldest[0])
+        query = (
+            "SELECT " + ", ".join(f"r.{column}" for column in _COLUMNS)
+            + f", snippet(results_fts, -1, '**', '**', '…', {SNIPPET_WORDS})" + where
+        )
+        return self._rows(query + " ORDER BY bm25(results_fts) LIMIT ?", params + [limit])
+
+    # Resultados más recientes, con los mismos filtros que search
+    def recent(self, genre=None, audience=None, author=None, limit=20):
+        query = "SELECT " + ", ".join(_COLUMNS) + ", NULL FROM results WHERE 1"
+        params = []
+        for column, value in (("genre", genre), ("audience", audience), ("author", author)):
+            if value:
+                query += f" AND {column} = ?"
+                params.append(value)
+        return self._rows(query + " ORDER BY created DESC LIMIT ?", params + [limit])
+
+    # Resultados anteriores del mismo texto de entrada (misma huella)
+    def find_input(self, text, limit=5):
+        return self._rows(
+            "SELECT " + ", ".join(_COLUMNS) + ", NULL FROM results WHERE input_hash = ? ORDER BY created DESC LIMIT ?",
+            (input_hash(text), limit),
+        )
+
+    # Análisis de textos parecidos: busca cualquiera de las palabras largas más frecuentes del texto
+    def similar(self, text, terms=8, limit=5, **filters):
+        words = Counter(word for word in re.findall(r"\w{6,}", normalize_text(text).lower()))
+        query = " ".join(word for word, _ in words.most_common(terms))
+        return self.search(query, limit=limit, any_term=True, **filters) if query else []
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        with self._counters_lock:
+            return {**self.counters, "entries": entries, "pending": self._queue.qsize()}
@@ -0,0 +1,153 @@
+import os
+import threading
+import time
+
+import requests
+
+from correccion import budget
+from correccion.models import MODELS, model_info
+from correccion.together_api import RateLimitError
+
+# Niveles de servicio: cuánto se rebaja o se sube la calidad mínima que cada tarea exige por defecto
+TIER_QUALITY = {"fast": -1, "balanced": 0, "thorough": 1}
+TIERS = tuple(TIER_QUALITY)
+DEFAULT_TIER = os.environ.get("CORRECCION_TIER", "balanced")
+
+# Calidad mínima por tarea en el nivel "balanced" (reproduce los modelos fijos de correccion.prompts)
+TASK_QUALITY = {"analysis": 1, "notes": 1, "reconciliation": 1, "review": 2, "correction": 2}
+
+MAX_ATTEMPTS = 3  # Modelo principal y hasta dos de respaldo
+COOLDOWN = 60.0  # Segundos que un modelo que falló pasa al final de la lista
+EWMA_ALPHA = 0.3  # Peso de cada medida nueva en las medias móviles
+
+# Errores que justifican probar otro modelo: límite de peticiones o de tiempo, y fallos de conexión
+FALLBACK_ERRORS = (RateLimitError, requests.exceptions.Timeout, requests.exceptions.ConnectionError)
+
+
+def _ewma(previous, value):
+    return value if previous is None else previous + EWMA_ALPHA * (value - previous)
+
+
+# Enrutador de modelos: ordena los modelos de la tabla para cada tarea y nivel, y con las latencias medidas
+# por modelo corrige con el uso las velocidades nominales de correccion.models.
+class ModelRouter:
+    def __init__(self, models=None):
+        self.models = models if models is not None else MODELS
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _model_stats(self, model):
+        return self._stats.setdefault(
+            model, {"calls": 0, "failures": 0, "ttft": None, "seconds_per_token": None, "cooling_until": 0.0}
+        )
+
+    # Función para estimar los segundos de una llamada: primer token más la generación de completion_tokens
+    def estimate_seconds(self, model, completion_tokens):
+        info = model_info(model)
+        with self._lock:
+            stats = self._stats.get(model) or {}
+        ttft = stats.get("ttft") if stats.get("ttft") is not None else info["ttft"]
+        seconds_per_token = stats.get("seconds_per_token") or 1.0 / info["tokens_per_second"]
+        return ttft + completion_tokens * seconds_per_token
+
+    # Función para ordenar los modelos de una tarea: primero los que cumplen la calidad del nivel, del más rápido
+    # al más lento; después el resto como respaldo, de mayor a menor calidad. Los que fallaron hace poco, al final.
+    def rank(self, task, tier=DEFAULT_TIER, completion_tokens=1000):
+        floor = min(3, max(1, TASK_QUALITY.get(task, 1) + TIER_QUALITY.get(tier, 0)))
+        now = time.monotonic()
+        with self._lock:
+            cooling = {model for model, stats in self._stats.items() if stats["cooling_until"] > now}
+
+        def order(model):
+            quality = model_info(model)["quality"]
+            eligible = quality >= floor
+            return (
+                model in cooling,
+                not eligible,
+                0 if eligible else -quality,
+                self.estimate_seconds(model, completion_tokens),
+            )
+
+        return sorted(self.models, key=order)
+
+    # Función para registrar una respuesta: actualiza el primer token y los segundos por token del modelo
+    def observe(self, model, data):
+        timings = data.get("timings") or {}
+        if timings.get("cached"):
+            return
+        usage = data.get("usage") or {}
+        tokens = usage.get("completion_tokens")
+        if not tokens:
+            try:
+                tokens = budget.count_tokens(data["choices"][0]["message"]["content"], model)
+            except (KeyError, IndexError, TypeError):
+                tokens = 0
+        with self._lock:
+            stats = self._model_stats(model)
+            stats["calls"] += 1
+            ttft = timings.get("ttft")
+            total = timings.get("total")
+            if timings.get("stream") and ttft is not None:
+                stats["ttft"] = _ewma(stats["ttft"], ttft)
+            if total is not None and tokens:
+                # Sin streaming el primer token llega con el último: se descuenta la estimación de espera inicial
+                start = ttft if timings.get("stream") and ttft is not None else (stats["ttft"] or model_info(model)["ttft"])
+                stats["seconds_per_token"] = _ewma(stats["seconds_per_token"], max(total - start, 0.0) / tokens)
+
+    # Función para registrar un fallo (429, tiempo agotado, conexión): el modelo queda un rato en la cola
+    def record_failure(self, model):
+        with self._lock:
+            stats = self._model_stats(model)
+            stats["failures"] += 1
+            stats["cooling_until"] = time.monotonic() + COOLDOWN
+
+    # Función para hacer una llamada enrutada. build(model) arma el payload (lanza BudgetExceededError si el
+    # prompt no cabe en su contexto); send(payload, fail_fast) lo envía, y con fail_fast=True no insiste ante
+    # un 429 ni reintenta, porque queda otro modelo al que pasar. La respuesta lleva "route" con el modelo usado.
+    def complete(self, task, tier, build, send, completion_tokens=1000):
+        candidates = []
+        error = None
+        for model in self.rank(task, tier, completion_tokens):
+            try:
+                candidates.append((model, build(model)))
+            except budget.BudgetExceededError as e:
+                error = error or e
+            if len(candidates) == MAX_ATTEMPTS:
+                break
+        if not candidates:
+            raise error
+
+        failed = []
+        for position, (model, payload) in enumerate(candidates):
+            try:
+                data = send(payload, position < len(candidates) - 1)
+            except FALLBACK_ERRORS as e:
+                self.record_failure(model)
+                failed.append(model)
+                error = e
+                continue
+            self.observe(model, data)
+            data["route"] = {"model": model, "tier": tier, "failed": failed}
+            return data
+        raise error
+
+    def snapshot(self):
+        now = time.monotonic()
+        rows = []
+        with self._lock:
+            for model in self.models:
+                stats = self._stats.get(model) or {}
+                seconds_per_token = stats.get("seconds_per_token")
+                rows.append({
+                    "modelo": model,
+                    "llamadas": stats.get("calls", 0),
+                    "fallos": stats.get("failures", 0),
+                    "primer token (s)": stats.get("ttft"),
+                    "tokens/s": 1.0 / seconds_per_token if seconds_per_token else None,
+                    "en espera": stats.get("cooling_until", 0.0) > now,
+                })
+        return rows
+
+
+# Enrutador del proceso: las medidas de latencia se comparten entre sesiones y documentos
+model_router = ModelRouter()
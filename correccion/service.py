@@ -0,0 +1,515 @@
+import time
+
+from correccion import (
+    budget, cache, chunking, compaction, docx_io, edits, executor, incremental, pipelined, prepass, prompts, router,
+    together_api, validation,
+)
+from correccion.pipelined import response_content
+
+# Las funciones de este módulo no usan Streamlit: lanzan requests.exceptions.RequestException
+# ante errores de la API, UnexpectedResponseError si la respuesta no trae contenido y
+# budget.BudgetExceededError si un prompt no cabe en el contexto del modelo.
+
+# Formatos de corrección: el texto completo con justificaciones inline, o una lista de ediciones en JSON
+CORRECTION_FORMATS = ("inline", "edits")
+
+
+# Error para respuestas de la API sin choices[0].message.content
+class UnexpectedResponseError(Exception):
+    pass
+
+
+# Función para contar palabras
+def count_words(text):
+    return len(text.split())
+
+
+# Función para contar tokens con el tokenizador del modelo de corrección, el más exigente del flujo
+def count_text_tokens(text):
+    return budget.count_tokens(text, prompts.CORRECTION_MODEL)
+
+
+# Función para saber si un texto cabe en una sola petición o debe ir por fragmentos
+def needs_chunking(text):
+    return count_text_tokens(text) > chunking.DEFAULT_CHUNK_TOKENS
+
+
+# Función para dividir un documento en fragmentos medidos con el tokenizador del modelo de corrección
+def split_document(text):
+    return chunking.split_into_chunks(text, count_tokens=count_text_tokens)
+
+
+# Función para el prepaso local; añade una estimación de los tokens de salida que el modelo ya no tiene que
+# generar (cada cambio con su justificación inline)
+def run_prepass(text):
+    result = prepass.run(text)
+    result["saved_tokens"] = sum(
+        count_text_tokens(f"{edit.replacement} [{edits.REASON_CODES[edit.reason]}: {edit.note}]")
+        for edit in result["edits"]
+    )
+    return result
+
+
+# Función para estimar, antes de enviar nada, los tokens y el costo máximo de procesar un texto.
+# review=True estima el flujo de app.py (sólo análisis con su propio modelo). Con tier se estima con el modelo
+# que correccion.router elegiría en primer lugar. Con fanout el análisis cuenta una petición por sección.
+def estimate_request(genre, audience, text, review=False, correction_format="inline", tier=None, fanout=None):
+    fanout = prompts.ANALYSIS_FANOUT if fanout is None else fanout
+    analysis_model = _estimate_model(
+        "review" if review else "analysis", prompts.REVIEW_MODEL if review else prompts.ANALYSIS_MODEL, tier
+    )
+    correction_model = _estimate_model("correction", prompts.CORRECTION_MODEL, tier)
+    estimate = {"chunks": 0, "text_tokens": 0, "prompt_tokens": 0, "max_completion_tokens": 0, "max_cost": 0.0}
+    for chunk in split_document(text):
+        context = chunk.context or None
+        if fanout:
+            analysis_plans = [
+                budget.plan_payload(prompts.section_payload(
+                    genre, audience, chunk.body, title, model=analysis_model, preserve_links=not review,
+                    context=context
+                ))
+                for title, _ in prompts.ANALYSIS_SECTIONS
+            ]
+        else:
+            analysis_plans = [budget.plan_payload(prompts.analysis_payload(
+                genre, audience, chunk.body, model=analysis_model, preserve_links=not review, context=context
+            ))]
+        if review:
+            plans = analysis_plans
+        else:
+            plans = analysis_plans + [
+                _correction_plan(chunk.body, context, analysis_plans, correction_format, correction_model)
+            ]
+        _add_plans(estimate, chunk.body, plans)
+    return estimate
+
+
+# Función para estimar el reanálisis incremental: notas y corrección de cada sección que no está en el almacén de
+# la sesión (store). La primera vez son todas, y al ser secciones de pocos párrafos hay muchas más peticiones que en
+# el modo normal, cada una con sus instrucciones: la primera pasada cuesta más que un análisis completo. sections y
+# reused dicen cuántas secciones hay y cuántas se reutilizan; chunks cuenta las que se enviarán.
+def estimate_incremental(genre, audience, text, store, correction_format="inline", tier=None):
+    notes_model = _estimate_model("notes", prompts.ANALYSIS_MODEL, tier)
+    correction_model = _estimate_model("correction", prompts.CORRECTION_MODEL, tier)
+    estimate = {
+        "chunks": 0, "text_tokens": 0, "prompt_tokens": 0, "max_completion_tokens": 0, "max_cost": 0.0,
+        "sections": 0, "reused": 0,
+    }
+    for section in split_incremental(text):
+        estimate["sections"] += 1
+        if store.get(section_key(section, genre, audience, correction_format, tier)) is not None:
+            estimate["reused"] += 1
+            continue
+        notes_plans = [budget.plan_payload(prompts.notes_payload(genre, audience, section.body, model=notes_model))]
+        plans = notes_plans + [_correction_plan(section.body, None, notes_plans, correction_format, correction_model)]
+        _add_plans(estimate, section.body, plans)
+    return estimate
+
+
+def _estimate_model(task, default, tier):
+    return default if tier is None else router.model_router.rank(task, tier)[0]
+
+
+# El análisis aún no existe: se reserva su salida máxima (o la de su destilado) en el prompt de la corrección
+def _correction_plan(body, context, analysis_plans, correction_format, model):
+    analysis_tokens = sum(plan["max_tokens"] for plan in analysis_plans)
+    builder = prompts.edits_payload if correction_format == "edits" else prompts.correction_payload
+    plan = budget.plan_payload(builder("", body, context=context, model=model, compact=prompts.COMPACT_PROMPTS))
+    plan["prompt_tokens"] += (
+        min(analysis_tokens, compaction.DISTILLED_TOKENS) if prompts.COMPACT_PROMPTS else analysis_tokens
+    )
+    return plan
+
+
+def _add_plans(estimate, body, plans):
+    estimate["chunks"] += 1
+    estimate["text_tokens"] += count_text_tokens(body)
+    for plan in plans:
+        estimate["prompt_tokens"] += plan["prompt_tokens"]
+        estimate["max_completion_tokens"] += plan["max_tokens"]
+        estimate["max_cost"] += budget.estimate_cost(plan["model"], plan["prompt_tokens"], plan["max_tokens"])
+
+
+# Función para enviar la llamada de una etapa. Con tier, correccion.router elige el modelo según el nivel de
+# servicio y pasa a otro si el principal agota el tiempo o el límite de peticiones; sin tier se usa
+# default_model. build(model) arma el payload y fields son los campos de la clave de caché. La respuesta lleva en
+# "request" el payload enviado, para poder pedir su continuación si se corta (continue_response).
+def _complete(api_key, task, build, default_model, template, fields, on_token=None, response_cache=None, limiter=None,
+              tier=None, expected_tokens=1000):
+    def send(payload, fail_fast=False):
+        key = cache.payload_cache_key(payload, prompts.PROMPT_VERSION, template=template, **fields)
+        api_response = together_api.chat_completion(
+            api_key, payload, on_token=on_token, cache=response_cache, cache_key=key, limiter=limiter, stage=task,
+            fail_fast=fail_fast
+        )
+        api_response["request"] = payload
+        return api_response
+
+    if tier is None:
+        return send(build(default_model))
+    return router.model_router.complete(task, tier, build, send, expected_tokens)
+
+
+# Función para pedir el análisis literario; con fanout (por defecto, prompts.ANALYSIS_FANOUT) se pide por secciones
+def analyze(api_key, genre, audience, text, context=None, on_token=None, response_cache=None, limiter=None, tier=None,
+            fanout=None):
+    if prompts.ANALYSIS_FANOUT if fanout is None else fanout:
+        return analyze_sections(api_key, genre, audience, text, context, on_token, response_cache, limiter, tier)
+    return _complete(
+        api_key, "analysis",
+        lambda model: prompts.analysis_payload(genre, audience, text, model=model, context=context),
+        prompts.ANALYSIS_MODEL, "analysis", dict(genre=genre, audience=audience, text=text, context=context),
+        on_token, response_cache, limiter, tier, count_text_tokens(text) // 2,
+    )
+
+
+# Función para pedir el análisis de app.py (otro modelo, sin instrucciones sobre hipervínculos)
+def review(api_key, genre, audience, text, context=None, on_token=None, response_cache=None, limiter=None, tier=None,
+           fanout=None):
+    if prompts.ANALYSIS_FANOUT if fanout is None else fanout:
+        return analyze_sections(
+            api_key, genre, audience, text, context, on_token, response_cache, limiter, tier, review=True
+        )
+    return _complete(
+        api_key, "review",
+        lambda model: prompts.analysis_payload(
+            genre, audience, text, model=model, preserve_links=False, context=context
+        ),
+        prompts.REVIEW_MODEL, "review", dict(genre=genre, audience=audience, text=text, context=context),
+        on_token, response_cache, limiter, tier, count_text_tokens(text) // 2,
+    )
+
+
+# Función para pedir el análisis en abanico: una petición por sección de prompts.ANALYSIS_SECTIONS, todas a la vez y
+# con una parte de los tokens de salida cada una. Devuelve una respuesta con la forma de la de analyze: el contenido
+# son las secciones en orden, usage suma el de todas, "sections" guarda el modelo, usage y duración de cada una y
+# "parts" las respuestas de cada sección. on_token recibe el análisis armado con lo que haya llegado de cada sección.
+# titles limita la petición a esas secciones (las que faltaban en un análisis, correccion.validation).
+def analyze_sections(api_key, genre, audience, text, context=None, on_token=None, response_cache=None, limiter=None,
+                     tier=None, review=False, titles=None):
+    task, default_model = ("review", prompts.REVIEW_MODEL) if review else ("analysis", prompts.ANALYSIS_MODEL)
+    titles = titles or [title for title, _ in prompts.ANALYSIS_SECTIONS]
+    sections = len(prompts.ANALYSIS_SECTIONS)
+
+    def section_call(title):
+        def call(on_token=None):
+            return _complete(
+                api_key, task,
+                lambda model: prompts.section_payload(
+                    genre, audience, text, title, model=model, preserve_links=not review, context=context
+                ),
+                default_model, f"{task}-section",
+                dict(genre=genre, audience=audience, text=text, context=context, section=title),
+                on_token, response_cache, limiter, tier, count_text_tokens(text) // (2 * sections),
+            )
+        return call
+
+    start = time.perf_counter()
+    responses, elapsed = pipelined.run_fanout(
+        [section_call(title) for title in titles], on_token, lambda parts: _join_sections(titles, parts)
+    )
+    section_timings = [response.get("timings") or {} for response in responses]
+    return {
+        "model": responses[0].get("model"),
+        "choices": _section_choices(titles, responses),
+        "usage": _sum_usage(responses),
+        "timings": {
+            "ttft": min(timings.get("ttft", 0.0) for timings in section_timings),
+            "total": time.perf_counter() - start,
+            "stream": on_token is not None,
+            "cached": all(timings.get("cached") for timings in section_timings),
+        },
+        "sections": [
+            {"section": title, "model": response.get("model"), "usage": response.get("usage"), "seconds": seconds}
+            for title, response, seconds in zip(titles, responses, elapsed)
+        ],
+        "parts": responses,
+    }
+
+
+# Texto de una sección del análisis en abanico, con su encabezado si el modelo no lo escribió
+def _section_text(title, content):
+    content = content.strip()
+    return content if content.startswith(("**", "#")) else f"**{title}**\n\n{content}"
+
+
+def _join_sections(titles, parts):
+    return "\n\n".join(_section_text(title, part) for title, part in zip(titles, parts) if part.strip())
+
+
+def _section_choices(titles, responses):
+    return [{
+        "message": {
+            "role": "assistant", "content": _join_sections(titles, [response_content(r) or "" for r in responses])
+        },
+        # Si alguna sección se cortó por max_tokens, el análisis armado también está incompleto
+        "finish_reason": next(
+            (reason for reason in (_finish_reason(r) for r in responses) if reason == "length"),
+            _finish_reason(responses[0]),
+        ),
+    }]
+
+
+def _sum_usage(responses):
+    usage = {}
+    for response in responses:
+        for name, value in (response.get("usage") or {}).items():
+            if isinstance(value, int):
+                usage[name] = usage.get(name, 0) + value
+    return usage
+
+
+def _finish_reason(api_response):
+    try:
+        return api_response["choices"][0].get("finish_reason")
+    except (KeyError, IndexError, TypeError, AttributeError):
+        return None
+
+
+# Función para pedir las notas de una sección (reanálisis incremental)
+def annotate(api_key, genre, audience, text, response_cache=None, limiter=None, tier=None):
+    return _complete(
+        api_key, "notes",
+        lambda model: prompts.notes_payload(genre, audience, text, model=model),
+        prompts.ANALYSIS_MODEL, "notes", dict(genre=genre, audience=audience, text=text),
+        None, response_cache, limiter, tier, count_text_tokens(text) // 3,
+    )
+
+
+# Función para pedir la corrección de estilo, con justificaciones inline o como lista de ediciones.
+# Con el prompt compacto (compact=True, o prompts.COMPACT_PROMPTS, desactivado de serie, si no se indica) la
+# respuesta lleva en "compaction" los tokens de entrada ahorrados frente al prompt completo; las respuestas de la
+# caché no cuentan, no se pagaron.
+def correct(api_key, genre, audience, analysis, text, context=None, on_token=None, response_cache=None, limiter=None,
+            correction_format="inline", tier=None, compact=None):
+    compact = prompts.COMPACT_PROMPTS if compact is None else compact
+    builder = prompts.edits_payload if correction_format == "edits" else prompts.correction_payload
+    sent = {}
+
+    def build(model):
+        sent["payload"] = builder(analysis, text, context=context, model=model, compact=compact)
+        return sent["payload"]
+
+    api_response = _complete(
+        api_key, "correction", build,
+        prompts.CORRECTION_MODEL, f"correction-{correction_format}" + ("-compact" if compact else ""),
+        dict(genre=genre, audience=audience, analysis=analysis, text=text, context=context),
+        on_token, response_cache, limiter, tier, count_text_tokens(text),
+    )
+    if compact and "payload" in sent and not (api_response.get("timings") or {}).get("cached"):
+        api_response["compaction"] = compaction.savings(
+            f"correction-{correction_format}", builder, analysis, sent["payload"]
+        )
+    return api_response
+
+
+# Función para pedir la conciliación entre un análisis y una corrección hecha sin él
+def reconcile(api_key, analysis, correction, response_cache=None, limiter=None, tier=None):
+    return _complete(
+        api_key, "reconciliation",
+        lambda model: prompts.reconciliation_payload(analysis, correction, model=model),
+        prompts.RECONCILIATION_MODEL, "reconciliation", dict(analysis=analysis, correction=correction),
+        None, response_cache, limiter, tier, 500,
+    )
+
+
+# Función para pedir la continuación de una respuesta cortada por max_tokens: se reenvía su prompt ("request") con
+# lo ya generado como respuesta del asistente, así que sólo se paga el resto. Del análisis en abanico se continúan
+# sólo las secciones cortadas. Devuelve la respuesta completa con la forma de la original; finish_reason y usage
+# son los de la última continuación sumados, y una respuesta sin "request" se devuelve tal cual.
+def continue_response(api_key, api_response, response_cache=None, limiter=None):
+    if "parts" in api_response:
+        parts = [
+            continue_response(api_key, part, response_cache, limiter) if _finish_reason(part) == "length" else part
+            for part in api_response["parts"]
+        ]
+        titles = [section["section"] for section in api_response["sections"]]
+        return dict(api_response, choices=_section_choices(titles, parts), usage=_sum_usage(parts), parts=parts)
+    payload = api_response.get("request")
+    if payload is None:
+        return api_response
+    partial = response_content(api_response) or ""
+    continuation = _complete(
+        api_key, "continuation", lambda model: prompts.continuation_payload(payload, partial), payload["model"],
+        "continuation", dict(messages=payload["messages"], partial=partial), None, response_cache, limiter,
+        expected_tokens=payload["max_tokens"] // 2,
+    )
+    return dict(
+        api_response,
+        choices=[{
+            "message": {"role": "assistant", "content": partial + (response_content(continuation) or "")},
+            "finish_reason": _finish_reason(continuation),
+        }],
+        usage=_sum_usage([api_response, continuation]),
+    )
+
+
+# Función para extraer el contenido o lanzar UnexpectedResponseError
+def require_content(api_response, stage):
+    content = response_content(api_response)
+    if not content:
+        raise UnexpectedResponseError(f"Respuesta inesperada de la API de {stage}.")
+    return content
+
+
+# Función para leer un manuscrito .docx párrafo a párrafo (ruta o archivo subido); lanza docx_io.DocxError
+def read_docx(source):
+    return docx_io.read_text(source)
+
+
+# Función para emparejar cada fragmento de un texto con sus ediciones (las de correccion.pipeline llevan "chunk")
+def tracked_chunks(text, applied):
+    by_chunk = {}
+    for edit in applied:
+        by_chunk.setdefault(edit["chunk"], []).append(edit)
+    for chunk in split_document(text):
+        yield chunk.body, by_chunk.get(chunk.index, [])
+
+
+# Función para exportar una corrección a .docx en target (ruta o archivo binario). tracked, un iterable de
+# (texto original, ediciones), se escribe como cambios marcados; si no, corrections, los textos corregidos con
+# justificaciones inline, se escriben con las justificaciones en rojo. Se escribe párrafo a párrafo.
+def export_docx(target, corrections=(), tracked=None):
+    if tracked is not None:
+        paragraphs = (
+            paragraph
+            for body, body_edits in tracked
+            for paragraph in docx_io.split_paragraphs(docx_io.edit_segments(body, body_edits))
+        )
+    else:
+        paragraphs = (
+            docx_io.inline_segments(paragraph)
+            for correction in corrections
+            for paragraph in chunking.iter_paragraphs(correction)
+        )
+    docx_io.write_docx(target, paragraphs)
+
+
+# Función para dividir un texto en las secciones del reanálisis incremental
+def split_incremental(text):
+    return incremental.split_sections(text, count_tokens=count_text_tokens)
+
+
+# Función para calcular la clave del resultado de una sección: sólo depende de su contenido y de la configuración
+# (con tier, los modelos los elige el enrutador y la clave lleva el nivel en su lugar). La plantilla
+# "section-validated" deja sin usar los resultados guardados antes de que las secciones se validaran.
+def section_key(section, genre, audience, correction_format, tier=None):
+    models = f"{prompts.ANALYSIS_MODEL}+{prompts.CORRECTION_MODEL}" if tier is None else f"router-{tier}"
+    return cache.cache_key(
+        models, prompts.PROMPT_VERSION,
+        {"template": f"section-validated-{correction_format}"}, genre=genre, audience=audience,
+        fingerprint=section.fingerprint
+    )
+
+
+# Función para tomar notas y corregir una sección; devuelve un dict serializable para guardarlo:
+# notes, correction (con justificaciones, o el texto limpio en formato "edits"), annotated y edits. De una lista de
+# ediciones ilegible se rescatan las completas (validation.salvage_edits) y el resultado lleva partial=True.
+def process_section(api_key, genre, audience, section, response_cache=None, limiter=None, correction_format="inline",
+                    tier=None):
+    notes = require_content(
+        annotate(api_key, genre, audience, section.body, response_cache=response_cache, limiter=limiter, tier=tier),
+        "Análisis"
+    )
+    correction = require_content(
+        correct(api_key, genre, audience, notes, section.body,
+                response_cache=response_cache, limiter=limiter, correction_format=correction_format, tier=tier),
+        "Corrección de Estilo"
+    )
+    result = {"notes": notes, "correction": correction, "annotated": None, "edits": []}
+    if correction_format == "edits":
+        try:
+            resolved = edits.resolve(section.body, correction)
+        except edits.EditParseError:
+            salvaged = validation.salvage_edits(correction)
+            validation.record("structure", salvaged is not None)
+            if salvaged is None:
+                raise
+            resolved = edits.resolve(section.body, salvaged)
+            result["partial"] = True
+        result.update(
+            correction=resolved["corrected"],
+            annotated=resolved["annotated"],
+            edits=[edit._asdict() for edit in resolved["edits"]],
+        )
+    return result
+
+
+# Resultado de una sección que no se pudo procesar: el texto sin cambios y el error. No se guarda, así que la sección
+# se vuelve a enviar la próxima vez.
+def failed_section(section, error):
+    return {
+        "notes": "", "correction": section.body, "annotated": section.body, "edits": [],
+        "error": f"{type(error).__name__}: {error}",
+    }
+
+
+# Función para el reanálisis incremental: recorre las secciones en orden y sólo envía a la API las que no
+# están en el almacén de la sesión (store) ni en la caché persistente. Genera (sección, resultado, reutilizada).
+# Una sección cuya respuesta no se puede usar (vacía o con una lista de ediciones ilegible) no detiene las demás:
+# llega como failed_section. Sólo se guardan los resultados completos (sin error ni partial). worker(section)
+# sustituye a process_section (correccion.pipeline.validated_section valida y repara cada sección).
+def iter_incremental(api_key, genre, audience, text, store, response_cache=None, limiter=None,
+                     concurrency=executor.DEFAULT_CONCURRENCY, correction_format="inline", tier=None, worker=None):
+    planned = []
+    for section in split_incremental(text):
+        key = section_key(section, genre, audience, correction_format, tier)
+        stored = store.get(key)
+        if stored is None and response_cache is not None:
+            stored = response_cache.get(key)
+            if stored is not None:
+                store.set(key, stored)
+        planned.append((section, key, stored))
+
+    def attempt(section):
+        try:
+            if worker is not None:
+                return worker(section)
+            return process_section(api_key, genre, audience, section, response_cache, limiter, correction_format, tier)
+        except (UnexpectedResponseError, edits.EditParseError) as e:
+            return failed_section(section, e)
+
+    pending = [section for section, _, stored in planned if stored is None]
+    processed = executor.run_ordered(pending, attempt, concurrency)
+    for section, key, stored in planned:
+        if stored is not None:
+            yield section, stored, True
+            continue
+        _, result = next(processed)
+        if not (result.get("error") or result.get("partial")):
+            store.set(key, result)
+            if response_cache is not None:
+                response_cache.set(key, result)
+        yield section, result, False
+
+
+# Función para el reanálisis incremental completo: el análisis del documento se rehace fusionando las notas
+# de cada sección, sin llamar a la API por las secciones que no cambiaron; failed cuenta las que quedaron sin corregir
+def process_incremental(api_key, genre, audience, text, store, response_cache=None, limiter=None,
+                        concurrency=executor.DEFAULT_CONCURRENCY, correction_format="inline", tier=None, worker=None):
+    start = time.perf_counter()
+    notes = []
+    corrections = []
+    reused = 0
+    failed = 0
+    reprocessed_words = 0
+    for section, result, was_stored in iter_incremental(
+        api_key, genre, audience, text, store, response_cache, limiter, concurrency, correction_format, tier, worker
+    ):
+        notes.append(result["notes"])
+        corrections.append(result["correction"])
+        failed += bool(result.get("error"))
+        if was_stored:
+            reused += 1
+        else:
+            reprocessed_words += count_words(section.body)
+    return {
+        "analysis": chunking.merge_analyses(notes, labels=False),
+        "correction": chunking.stitch(corrections),
+        "words": count_words(text),
+        "sections": len(corrections),
+        "reused": reused,
+        "failed": failed,
+        "reprocessed_words": reprocessed_words,
+        "seconds": time.perf_counter() - start,
+    }
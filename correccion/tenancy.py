@@ -0,0 +1,283 @@
+# Admisión por usuario sobre la API Key compartida: identifica al usuario con un JWT, aplica sus cuotas de tokens
+# por minuto y de documentos por día, reparte el límite compartido entre usuarios con una cola justa ponderada
+# (los planes de pago pesan más) y lleva los contadores de uso para la facturación.
+#
+#   python -m correccion.tenancy token usuario@ejemplo.com --plan pro      # emite un JWT de prueba
+#   python -m correccion.tenancy usage --since 2026-10-01                  # uso por usuario y día, en JSONL
+#
+# Sin CORRECCION_JWT_SECRET las aplicaciones funcionan como hasta ahora, sin usuarios ni cuotas.
+import argparse
+import heapq
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+from datetime import date, datetime, timezone
+
+from correccion.executor import TokenBucket
+
+JWT_SECRET = os.environ.get("CORRECCION_JWT_SECRET")
+JWT_ALGORITHMS = ("HS256",)
+DEFAULT_PATH = os.environ.get("CORRECCION_USAGE_PATH", os.path.join(".cache", "uso.sqlite3"))
+MAX_QUOTA_WAIT = 60.0  # Segundos que una llamada puede esperar por la cuota del usuario antes de rechazarse
+
+# Planes: cuotas y peso en la cola justa (un usuario de peso 4 recibe cuatro veces más turno que uno de peso 1)
+PLANS = {
+    "free": {"tokens_per_minute": 20000, "documents_per_day": 5, "weight": 1},
+    "pro": {"tokens_per_minute": 60000, "documents_per_day": 100, "weight": 4},
+    "business": {"tokens_per_minute": 150000, "documents_per_day": 1000, "weight": 10},
+}
+DEFAULT_PLAN = "free"
+
+# Usuario autenticado: id es el claim "sub" y plan una clave de PLANS
+User = namedtuple("User", ["id", "plan"])
+
+
+# Error para tokens ausentes, caducados o con firma inválida
+class AuthError(Exception):
+    pass
+
+
+# Error para peticiones que superan la cuota del plan del usuario
+class QuotaExceededError(Exception):
+    pass
+
+
+# Función para verificar un JWT (PyJWT sólo se importa si hay usuarios) y obtener el usuario
+def verify_token(token, secret=JWT_SECRET, algorithms=JWT_ALGORITHMS):
+    import jwt
+
+    if not token:
+        raise AuthError("Falta el token de acceso.")
+    try:
+        claims = jwt.decode(token, secret, algorithms=list(algorithms), options={"require": ["sub", "exp"]})
+    except jwt.PyJWTError as e:
+        raise AuthError(f"Token de acceso inválido: {e}")
+    plan = claims.get("plan", DEFAULT_PLAN)
+    return User(str(claims["sub"]), plan if plan in PLANS else DEFAULT_PLAN)
+
+
+# Función para emitir un JWT firmado (pruebas y herramientas internas)
+def issue_token(user_id, plan=DEFAULT_PLAN, secret=JWT_SECRET, days=30):
+    import jwt
+
+    return jwt.encode({"sub": user_id, "plan": plan, "exp": int(time.time()) + days * 86400}, secret,
+                      algorithm=JWT_ALGORITHMS[0])
+
+
+def _today():
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+# Cola justa ponderada (start-time fair queuing) delante del limitador compartido: las llamadas entran al
+# limitador de una en una, en orden de su etiqueta virtual, que avanza tokens / peso por cada llamada del usuario.
+# Un usuario con muchas llamadas encoladas no retrasa a los demás más de lo que le corresponde por su peso.
+class FairQueue:
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self._condition = threading.Condition()
+        self._heap = []
+        self._sequence = itertools.count()
+        self._virtual = 0.0
+        self._finish = {}  # usuario -> etiqueta final de su última llamada
+        self._busy = False
+
+    # Espera turno y luego el del limitador compartido; devuelve los segundos esperados
+    def acquire(self, user_id, weight, tokens):
+        start = time.monotonic()
+        with self._condition:
+            tag = max(self._virtual, self._finish.get(user_id, 0.0))
+            self._finish[user_id] = tag + tokens / weight
+            entry = (tag, next(self._sequence))
+            heapq.heappush(self._heap, entry)
+            while self._busy or self._heap[0] != entry:
+                self._condition.wait()
+            heapq.heappop(self._heap)
+            self._busy = True
+            self._virtual = tag
+            # Los usuarios sin llamadas pendientes ya no necesitan su etiqueta
+            self._finish = {user: finish for user, finish in self._finish.items() if finish > tag}
+        try:
+            self.limiter.acquire(tokens)
+        finally:
+            with self._condition:
+                self._busy = False
+                self._condition.notify_all()
+        return time.monotonic() - start
+
+    def pending(self):
+        with self._condition:
+            return len(self._heap)
+
+
+# Contadores de uso por usuario y día en SQLite; alimentan las cuotas diarias y la facturación
+class UsageStore:
+    def __init__(self, path=DEFAULT_PATH):
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS usage ("
+            " user TEXT NOT NULL, day TEXT NOT NULL, plan TEXT NOT NULL, documents INTEGER NOT NULL DEFAULT 0,"
+            " requests INTEGER NOT NULL DEFAULT 0, prompt_tokens INTEGER NOT NULL DEFAULT 0,"
+            " completion_tokens INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (user, day))"
+        )
+        self._lock = threading.Lock()
+
+    def _ensure(self, user, day):
+        self._db.execute("INSERT OR IGNORE INTO usage (user, day, plan) VALUES (?, ?, ?)", (user.id, day, user.plan))
+
+    # Cuenta un documento nuevo si cabe en la cuota diaria; si no, lanza QuotaExceededError
+    def admit_document(self, user, limit):
+        day = _today()
+        with self._lock:
+            self._ensure(user, day)
+            cursor = self._db.execute(
+                "UPDATE usage SET documents = documents + 1, plan = ? WHERE user = ? AND day = ? AND documents < ?",
+                (user.plan, user.id, day, limit),
+            )
+            if cursor.rowcount == 0:
+                raise QuotaExceededError(
+                    f"Has alcanzado el límite de {limit} documentos por día del plan {user.plan}."
+                )
+
+    def record(self, user, prompt_tokens, completion_tokens):
+        day = _today()
+        with self._lock:
+            self._ensure(user, day)
+            self._db.execute(
+                "UPDATE usage SET requests = requests + 1, prompt_tokens = prompt_tokens + ?,"
+                " completion_tokens = completion_tokens + ? WHERE user = ? AND day = ?",
+                (prompt_tokens, completion_tokens, user.id, day),
+            )
+
+    # Filas de uso (dicts) entre dos días ISO, ambos incluidos, opcionalmente de un solo usuario
+    def usage(self, since=None, until=None, user_id=None):
+        query = "SELECT user, day, plan, documents, requests, prompt_tokens, completion_tokens FROM usage WHERE 1"
+        params = []
+        for clause, value in (("day >= ?", since), ("day <= ?", until), ("user = ?", user_id)):
+            if value is not None:
+                query += f" AND {clause}"
+                params.append(value)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY day, user", params).fetchall()
+        columns = ("user", "day", "plan", "documents", "requests", "prompt_tokens", "completion_tokens")
+        return [dict(zip(columns, row)) for row in rows]
+
+
+# Admisión de todo el proceso: cuotas por usuario (tokens por minuto en memoria, documentos por día en SQLite)
+# y cola justa delante del limitador compartido de la API Key
+class Tenancy:
+    def __init__(self, limiter, path=DEFAULT_PATH, plans=None):
+        self.plans = plans if plans is not None else PLANS
+        self.queue = FairQueue(limiter)
+        self.store = UsageStore(path)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def plan(self, user):
+        return self.plans.get(user.plan, self.plans[DEFAULT_PLAN])
+
+    def bucket(self, user):
+        with self._lock:
+            bucket = self._buckets.get(user.id)
+            if bucket is None or bucket.rate * 60 != self.plan(user)["tokens_per_minute"]:
+                bucket = self._buckets[user.id] = TokenBucket(self.plan(user)["tokens_per_minute"])
+            return bucket
+
+    # Función para admitir un documento nuevo del usuario (lanza QuotaExceededError)
+    def admit_document(self, user):
+        self.store.admit_document(user, self.plan(user)["documents_per_day"])
+
+    # Limitador para pasar a correccion.service en nombre del usuario
+    def limiter_for(self, user):
+        return UserLimiter(self, user)
+
+    # Uso del día y cuotas del plan del usuario
+    def account(self, user):
+        rows = self.store.usage(since=_today(), until=_today(), user_id=user.id)
+        usage = rows[0] if rows else {"documents": 0, "requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        return {**usage, **self.plan(user), "user": user.id, "plan": user.plan}
+
+
+# Limitador de un usuario con la interfaz de executor.RateLimiter (acquire, pause, settle, stats): primero su
+# cuota de tokens por minuto, luego la cola justa y el limitador compartido. settle cuenta el uso real.
+class UserLimiter:
+    def __init__(self, tenancy, user):
+        self.tenancy = tenancy
+        self.user = user
+
+    def acquire(self, tokens):
+        bucket = self.tenancy.bucket(self.user)
+        wait = bucket.reserve(tokens)
+        if wait > MAX_QUOTA_WAIT:
+            bucket.reserve(-tokens)
+            raise QuotaExceededError(
+                f"La petición supera la cuota de {self.tenancy.plan(self.user)['tokens_per_minute']} tokens por "
+                f"minuto del plan {self.user.plan}; inténtalo en un minuto."
+            )
+        if wait > 0:
+            time.sleep(wait)
+        return wait + self.tenancy.queue.acquire(self.user.id, self.tenancy.plan(self.user)["weight"], tokens)
+
+    def pause(self, seconds):
+        self.tenancy.queue.limiter.pause(seconds)
+
+    # Tras una llamada: devuelve al usuario la parte de la reserva que no se usó y la cuenta para facturar
+    def settle(self, estimated, usage):
+        usage = usage or {}
+        prompt_tokens = usage.get("prompt_tokens") or 0
+        completion_tokens = usage.get("completion_tokens") or 0
+        if prompt_tokens or completion_tokens:
+            unused = estimated - prompt_tokens - completion_tokens
+            if unused > 0:
+                self.tenancy.bucket(self.user).reserve(-unused)
+        self.tenancy.queue.limiter.settle(estimated, usage)
+        self.tenancy.store.record(self.user, prompt_tokens, completion_tokens)
+
+    def stats(self):
+        return self.tenancy.queue.limiter.stats()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m correccion.tenancy", description="Usuarios, cuotas y uso.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    token = commands.add_parser("token", help="Emitir un JWT firmado con CORRECCION_JWT_SECRET")
+    token.add_argument("user", help="Id del usuario (claim sub)")
+    token.add_argument("--plan", choices=sorted(PLANS), default=DEFAULT_PLAN)
+    token.add_argument("--days", type=int, default=30, help="Días de validez")
+    usage = commands.add_parser("usage", help="Uso por usuario y día en JSONL, para facturar")
+    usage.add_argument("--since", type=date.fromisoformat, help="Primer día (AAAA-MM-DD)")
+    usage.add_argument("--until", type=date.fromisoformat, help="Último día (AAAA-MM-DD)")
+    usage.add_argument("--user", help="Sólo este usuario")
+    usage.add_argument("--path", default=DEFAULT_PATH, help="Base SQLite de uso")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "token":
+        if not JWT_SECRET:
+            print("Define la variable de entorno CORRECCION_JWT_SECRET.", file=sys.stderr)
+            return 2
+        print(issue_token(args.user, args.plan, days=args.days))
+        return 0
+    rows = UsageStore(args.path).usage(
+        since=args.since.isoformat() if args.since else None,
+        until=args.until.isoformat() if args.until else None,
+        user_id=args.user,
+    )
+    for row in rows:
+        print(json.dumps(row, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+import json
+import os
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+from correccion import http_client, metrics
+from correccion.executor import estimate_payload_tokens
+
+# TOGETHER_API_URL permite apuntar a otro servidor compatible (por ejemplo, el simulado de bench/)
+API_URL = os.environ.get("TOGETHER_API_URL", "https://api.together.xyz/v1/chat/completions")
+
+# Intervalo mínimo (segundos) entre dos repintados del texto parcial en modo streaming
+RENDER_INTERVAL = 0.05
+
+
+# Segundos de espera ante un 429 sin cabecera Retry-After, y reintentos antes de rendirse
+DEFAULT_RETRY_AFTER = 5.0
+MAX_RATE_LIMIT_RETRIES = 5
+
+
+# Error para las respuestas 429: lleva los segundos que pide esperar Retry-After
+class RateLimitError(requests.exceptions.HTTPError):
+    def __init__(self, retry_after, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.retry_after = retry_after
+
+
+# Función para leer Retry-After, que puede venir en segundos o como fecha HTTP
+def parse_retry_after(value):
+    if not value:
+        return DEFAULT_RETRY_AFTER
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+
+# Función para comprobar el estado HTTP, distinguiendo los 429
+def raise_for_status(response):
+    if response.status_code == 429:
+        raise RateLimitError(
+            parse_retry_after(response.headers.get("Retry-After")),
+            f"429 Too Many Requests para {response.url}",
+            response=response,
+        )
+    response.raise_for_status()  # Esto lanzará una excepción si hay un error HTTP
+
+
+# Función para construir las cabeceras de autenticación
+def build_headers(api_key):
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+
+# Función para una llamada sin streaming: espera la respuesta completa
+def post_chat_completion(api_key, payload, retries=http_client.MAX_RETRIES):
+    start = time.perf_counter()
+    response = http_client.post(
+        API_URL, retries=retries, headers=build_headers(api_key), data=json.dumps(dict(payload, stream=False))
+    )
+    raise_for_status(response)
+    data = response.json()
+    total = time.perf_counter() - start
+    # Sin streaming el primer token llega junto con el último; ttfb es lo que tardaron las cabeceras
+    data["timings"] = {"ttfb": response.elapsed.total_seconds(), "ttft": total, "total": total, "stream": False}
+    return data
+
+
+# Función para leer los eventos server-sent ("data: {...}") de una respuesta en streaming
+def iter_sse_events(response):
+    for raw_line in response.iter_lines():
+        # Decodificamos nosotros: text/event-stream suele llegar sin charset y requests asumiría latin-1
+        line = raw_line.decode("utf-8", errors="replace").strip()
+        if not line.startswith("data:"):
+            continue  # Líneas vacías, comentarios y keep-alives
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        try:
+            yield json.loads(data)
+        except ValueError:
+            continue
+
+
+# Función para una llamada en streaming: acumula los fragmentos y avisa a on_token con el texto parcial
+def stream_chat_completion(api_key, payload, on_token=None, retries=http_client.MAX_RETRIES):
+    start = time.perf_counter()
+    ttft = None
+    last_render = 0.0
+    content = ""
+    finish_reason = None
+    usage = None
+    model = payload.get("model")
+
+    with http_client.post(
+        API_URL,
+        retries=retries,
+        headers=build_headers(api_key),
+        data=json.dumps(dict(payload, stream=True)),
+        stream=True,
+    ) as response:
+        raise_for_status(response)
+        ttfb = time.perf_counter() - start
+        for event in iter_sse_events(response):
+            model = event.get("model", model)
+            usage = event.get("usage") or usage
+            choices = event.get("choices") or []
+            if not choices:
+                continue
+            choice = choices[0]
+            finish_reason = choice.get("finish_reason") or finish_reason
+            delta = (choice.get("delta") or {}).get("content") or ""
+            if not delta:
+                continue
+            now = time.perf_counter()
+            if ttft is None:
+                ttft = now - start
+            content += delta
+            # Limitamos los repintados para no saturar el navegador con un mensaje por token
+            if on_token and now - last_render >= RENDER_INTERVAL:
+                on_token(content)
+                last_render = now
+
+    total = time.perf_counter() - start
+    if on_token:
+        on_token(content)
+    return {
+        "model": model,
+        "choices": [{
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": finish_reason,
+        }],
+        "usage": usage,
+        "timings": {"ttfb": ttfb, "ttft": ttft if ttft is not None else total, "total": total, "stream": True},
+    }
+
+
+# Función principal: streaming si hay on_token, con respaldo sin streaming si el stream falla antes del primer token.
+# Con cache y cache_key, una respuesta ya guardada se devuelve sin llamar a la API.
+# Con limiter, la llamada espera turno dentro de los límites por minuto y los 429 se reintentan tras Retry-After;
+# al terminar, limiter.settle recibe la estimación reservada y el uso real.
+# stage nombra la etapa (análisis, corrección...) en las métricas de correccion.metrics.
+# fail_fast=True no reintenta ni insiste ante un 429: lo usa correccion.router cuando queda otro modelo de respaldo.
+def chat_completion(api_key, payload, on_token=None, cache=None, cache_key=None, limiter=None, stage=None,
+                    fail_fast=False):
+    try:
+        data = _cached_chat_completion(api_key, payload, on_token, cache, cache_key, limiter, fail_fast)
+    except requests.exceptions.RequestException as e:
+        metrics.record_call(stage, payload.get("model"), error=e)
+        raise
+    metrics.record_call(stage, payload.get("model"), data)
+    return data
+
+
+def _cached_chat_completion(api_key, payload, on_token, cache, cache_key, limiter, fail_fast):
+    use_cache = cache is not None and cache_key is not None
+    if use_cache:
+        start = time.perf_counter()
+        data = cache.get(cache_key)
+        if data is not None:
+            total = time.perf_counter() - start
+            data["timings"] = {"ttft": total, "total": total, "stream": False, "cached": True}
+            if on_token:
+                _notify_content(on_token, data)
+            return data
+
+    data = _limited_chat_completion(api_key, payload, on_token, limiter, fail_fast)
+    if use_cache and _content(data):
+        cache.set(cache_key, {name: value for name, value in data.items() if name != "timings"})
+    return data
+
+
+def _content(data):
+    try:
+        return data["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+def _notify_content(on_token, data):
+    content = _content(data)
+    if content is not None:
+        on_token(content)
+
+
+def _limited_chat_completion(api_key, payload, on_token, limiter, fail_fast):
+    if limiter is None:
+        return _fetch_chat_completion(api_key, payload, on_token, fail_fast)
+    tokens = estimate_payload_tokens(payload)
+    queued = 0.0
+    retries = 0 if fail_fast else MAX_RATE_LIMIT_RETRIES
+    for attempt in range(retries + 1):
+        queued += limiter.acquire(tokens)
+        try:
+            data = _fetch_chat_completion(api_key, payload, on_token, fail_fast)
+            data["timings"]["queue"] = queued
+            limiter.settle(tokens, data.get("usage"))
+            return data
+        except RateLimitError as e:
+            if attempt == retries:
+                raise
+            limiter.pause(e.retry_after)
+
+
+def _fetch_chat_completion(api_key, payload, on_token, fail_fast=False):
+    retries = 0 if fail_fast else http_client.MAX_RETRIES
+    if on_token is None:
+        return post_chat_completion(api_key, payload, retries)
+
+    received = []
+
+    def track(partial):
+        received.append(True)
+        on_token(partial)
+
+    try:
+        return stream_chat_completion(api_key, payload, on_token=track, retries=retries)
+    except RateLimitError:
+        raise  # Repetir sin streaming sólo volvería a chocar con el límite
+    except requests.exceptions.RequestException:
+        if received or fail_fast:
+            raise  # Ya se mostró texto parcial, o hay otro modelo de respaldo: no repetimos la generación aquí
+        data = post_chat_completion(api_key, payload, retries)
+        _notify_content(on_token, data)
+        return data
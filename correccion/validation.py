@@ -0,0 +1,128 @@
+import json
+import re
+import threading
+import unicodedata
+from difflib import SequenceMatcher
+
+from correccion import chunking, edits
+from correccion.prompts import ANALYSIS_SECTIONS
+
+# Validación de las respuestas del modelo antes de mostrarlas, sin Streamlit ni llamadas a la API. Hay cuatro
+# fallos: respuesta vacía ("empty"), cortada por max_tokens ("truncated"), con hipervínculos perdidos o alterados
+# ("links") y con la estructura esperada rota ("structure": secciones del análisis que faltan o JSON de ediciones
+# inválido). Lo que se puede arreglar aquí se arregla sin gastar tokens; lo demás lo repara
+# correccion.pipeline.Validate con una petición sólo para la parte rota. Los contadores son de todo el proceso.
+FAILURE_MODES = ("empty", "truncated", "links", "structure")
+MAX_CONTINUATIONS = 2  # Continuaciones como máximo de una misma respuesta cortada
+URL_SIMILARITY = 0.6  # Parecido mínimo para tomar una URL nueva por la alteración de una perdida
+
+_lock = threading.Lock()
+totals = {name: 0 for mode in FAILURE_MODES for name in (mode, f"{mode}_repaired")}
+_SEPARATOR = re.compile(r"\s*,?\s*")
+# Títulos en negrita al principio de una línea, también seguidos del texto de la sección (1. **Temas:** El texto...),
+# y encabezados Markdown
+_TITLE = re.compile(
+    r"^\s*(?:#{1,6}\s*|\d+[.)]\s*|[-*+]\s+)?\*\*(?P<title>[^*]+?)\*\*|^\s*#{1,6}\s+(?P<plain>[^*\n]+?)\s*$",
+    re.MULTILINE,
+)
+
+# Raíces (sin tildes ni mayúsculas) con que se reconoce cada sección de prompts.ANALYSIS_SECTIONS en un título: el
+# modelo no siempre copia el sugerido (**Temática**, **Tema central**, **Caracterización**, **Lenguaje y tono**...)
+SECTION_STEMS = {
+    "Temas": ("tema", "idea", "motivo"),
+    "Desarrollo de Personajes": ("personaj", "caracteriz", "protagonist"),
+    "Estructura Narrativa": ("estructur", "trama", "ritmo", "composici"),
+    "Estilo y Tono": ("estil", "tono", "lenguaj", "registro", "prosa"),
+}
+
+
+# Función para contar un fallo detectado y si se reparó
+def record(mode, repaired):
+    with _lock:
+        totals[mode] += 1
+        if repaired:
+            totals[f"{mode}_repaired"] += 1
+
+
+def stats():
+    with _lock:
+        return dict(totals)
+
+
+# Función para saber si una respuesta se cortó por max_tokens
+def truncated(api_response):
+    try:
+        return api_response["choices"][0].get("finish_reason") == "length"
+    except (KeyError, IndexError, TypeError, AttributeError):
+        return False
+
+
+def _words(title):
+    decomposed = unicodedata.normalize("NFKD", title.casefold())
+    folded = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return re.findall(r"[a-z]+", folded)
+
+
+# Función para obtener las secciones de prompts.ANALYSIS_SECTIONS que faltan en un análisis. Un título cuenta como la
+# sección si alguna de sus palabras empieza por una de las raíces de SECTION_STEMS (**Tono y estilo**, ### Personajes,
+# 1. **Temática:** ...).
+def missing_sections(analysis):
+    words = [
+        word for match in _TITLE.finditer(analysis) for word in _words(match.group("title") or match.group("plain"))
+    ]
+    return [
+        title for title, _ in ANALYSIS_SECTIONS
+        if not any(word.startswith(SECTION_STEMS[title]) for word in words)
+    ]
+
+
+# Función para devolver a un texto corregido las URLs que el modelo alteró: cada URL añadida que se parece lo
+# bastante a una perdida se sustituye por ésta. Devuelve (texto, URLs aún perdidas, URLs aún añadidas).
+def restore_urls(original, corrected):
+    lost, added = edits.compare_urls(original, corrected)
+    for url in added:
+        if not lost:
+            break
+        match = max(lost, key=lambda candidate: SequenceMatcher(None, candidate, url).ratio())
+        if SequenceMatcher(None, match, url).ratio() >= URL_SIMILARITY:
+            corrected = re.sub(re.escape(url) + r"(?![^\s)<>\]\"'])", lambda _: match, corrected, count=1)
+            lost.remove(match)
+    lost, added = edits.compare_urls(original, corrected)
+    return corrected, lost, added
+
+
+# Función para ubicar los párrafos de una corrección que perdieron URLs: los índices de los párrafos del original
+# que las contienen, o None si original y corrección no tienen los mismos párrafos y no se pueden emparejar
+def damaged_paragraphs(original, corrected, lost):
+    source = list(chunking.iter_paragraphs(original))
+    if len(source) != len(list(chunking.iter_paragraphs(corrected))):
+        return None
+    return [index for index, paragraph in enumerate(source) if any(url in paragraph for url in lost)]
+
+
+# Función para reemplazar párrafos de una corrección por su versión reparada ({índice: párrafo})
+def replace_paragraphs(corrected, replacements):
+    paragraphs = list(chunking.iter_paragraphs(corrected))
+    for index, paragraph in replacements.items():
+        paragraphs[index] = paragraph.strip()
+    return "\n\n".join(paragraphs)
+
+
+# Función para rescatar las ediciones completas de un JSON inválido o cortado: lee uno a uno los objetos de la lista
+# "edits" hasta el primero que no se pueda leer. Devuelve un JSON válido con ellas, o None si no hay ninguna.
+def salvage_edits(content):
+    position = content.find("[")
+    if position == -1:
+        return None
+    decoder = json.JSONDecoder()
+    salvaged = []
+    position += 1
+    while True:
+        position = _SEPARATOR.match(content, position).end()
+        try:
+            item, position = decoder.raw_decode(content, position)
+        except ValueError:
+            break
+        if isinstance(item, dict):
+            salvaged.append(item)
+    return json.dumps({"edits": salvaged}, ensure_ascii=False) if salvaged else None
@@ -1,7 +1,18 @@
+import time
+
+# Inicio de la ejecución del script para el informe de arranque (la primera del proceso incluye las importaciones)
+SCRIPT_START = time.perf_counter()
+
 import streamlit as st
-import requests
-import json
-from textwrap import dedent
+
+import interfaz
+from correccion import incremental, jobs, pipeline, router, service
+
+# Segundos entre dos consultas del estado de un trabajo en segundo plano
+JOB_POLL_SECONDS = 1.0
+
+# Modo de pipeline.Overlapped de cada modo de ejecución que solapa análisis y corrección
+OVERLAPPED_MODES = {"Canalizado": "pipelined", "Paralelo": "parallel"}
 
 # Configuración de la página
 st.set_page_config(
@@ -18,203 +29,187 @@ st.markdown("""
 Bienvenido a la herramienta de análisis literario y corrección de estilo. Por favor, completa los campos a continuación para obtener una crítica literaria detallada, recomendaciones de estilo específicas y una versión corregida de tu texto con justificaciones de los cambios realizados.
 """)
 
-# Formulario de entrada
-with st.form(key='literary_analysis_form'):
-    # Área de texto para el contenido
-    text_input = st.text_area(
-        "Pega tu texto (máximo 2000 palabras):",
-        height=300,
-        help="Asegúrate de que tu texto no exceda las 2000 palabras."
+# Opciones en la barra lateral
+st.sidebar.header("⚙️ Opciones")
+stream_mode = interfaz.stream_option()
+correction_format = st.sidebar.radio(
+    "Formato de la corrección:",
+    options=list(service.CORRECTION_FORMATS),
+    format_func=lambda option: {
+        "inline": "Texto completo con justificaciones",
+        "edits": "Lista de ediciones (compacta)",
+    }[option],
+    help=(
+        "La lista de ediciones sólo envía los cambios, así que es más rápida y barata en textos con pocas "
+        "correcciones; se aplica localmente y se muestra anotada."
     )
-
-    # Selección de género
-    genre = st.selectbox(
-        "Selecciona el género:",
-        options=[
-            "Fantasía", "Ciencia Ficción", "Misterio", "Romance",
-            "Terror", "Aventura", "Drama", "Histórico", "Otro"
-        ]
+)
+use_prepass = st.sidebar.checkbox(
+    "Prepaso local de tipografía y faltas frecuentes",
+    value=True,
+    help=(
+        "Corrige al instante, sin llamar a la API, espacios dobles, signos de apertura, rayas de diálogo, comillas "
+        "y faltas frecuentes; el modelo recibe el texto ya limpio y se ocupa sólo del estilo."
     )
-
-    # Entrada de audiencia
-    audience = st.text_input(
-        "Define la audiencia:",
-        help="Por ejemplo: adolescentes, adultos jóvenes, adultos, etc."
+)
+execution_mode = st.sidebar.radio(
+    "Modo de ejecución:",
+    options=["Secuencial", "Canalizado", "Paralelo"],
+    help=(
+        "Secuencial: la corrección espera el análisis completo. "
+        "Canalizado: la corrección arranca con el análisis parcial en cuanto hay suficiente. "
+        "Paralelo: análisis y corrección a la vez, con una breve conciliación al final."
     )
+)
+service_tier = interfaz.tier_option()
+fanout_mode = interfaz.fanout_option()
+incremental_mode = st.sidebar.checkbox(
+    "Reanalizar sólo los párrafos modificados",
+    value=False,
+    help=(
+        "Divide el texto en secciones de pocos párrafos y recuerda el resultado de cada una: al volver a enviarlo, "
+        "sólo las secciones que cambiaron pasan por la API y el análisis se rehace con las notas guardadas. "
+        "La primera pasada cuesta más que el análisis normal (una petición de notas y otra de corrección por "
+        "sección); la estimación muestra lo que se enviará."
+    )
+)
+# Resultados por sección del reanálisis incremental, de la sesión
+section_store = st.session_state.setdefault("secciones", incremental.SectionStore()) if incremental_mode else None
+
+background_mode = st.sidebar.checkbox(
+    "Procesar en segundo plano",
+    value=False,
+    help=(
+        "El trabajo sigue en el servidor aunque cambies una opción o recargues la página, y el resultado se "
+        "recupera al volver, con el mismo modo de ejecución y streaming. No se aplica al reanálisis incremental."
+    )
+)
 
-    # Botón de envío
-    submit_button = st.form_submit_button(label='Analizar y Corregir')
+use_cache = interfaz.cache_option()
+debug_panel = interfaz.debug_option()
+concurrency = interfaz.concurrency_option()
 
-# Función para contar palabras
-def count_words(text):
-    return len(text.split())
+# Recursos compartidos por el proceso (interfaz): limitador, usuario y su cuota, caché, trabajos e historial
+current_user = interfaz.current_user()
+rate_limiter = interfaz.limiter_for(current_user)
+response_cache = interfaz.get_response_cache() if use_cache else None
+job_queue = interfaz.get_job_queue()
+result_store = interfaz.get_result_store()
+interfaz.start_process()
 
-# Función para llamar a la API de Together para Análisis Literario
-def call_together_api_analysis(api_key, genre, audience, text):
-    url = "https://api.together.xyz/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+# Formulario de entrada
+form = interfaz.input_form("Analizar y Corregir", docx_upload=True)
+
+# Función para elegir las etapas del análisis y la corrección según las opciones de la barra lateral; las
+# respuestas cortadas, vacías o con enlaces alterados se reparan (pipeline.Validate) antes de mostrarse
+def processing_stages():
+    if incremental_mode:
+        return [pipeline.Incremental(section_store, correction_format)]
+    if execution_mode == "Secuencial":
+        return [
+            pipeline.Validate(pipeline.Analysis(fanout_mode)), pipeline.Validate(pipeline.Correction(correction_format))
+        ]
+    return [pipeline.Validate(pipeline.Overlapped(OVERLAPPED_MODES[execution_mode], correction_format, fanout_mode))]
 
-    # Construcción de los mensajes para la API con instrucciones claras y específicas
-    messages = [
+# Función para encolar el texto como trabajo en segundo plano; el id queda en la sesión y en la URL para
+# recuperar el trabajo tras una recarga de la página
+def submit_job(api_key, text):
+    job_id = job_queue.submit(
+        "document",
         {
-            "role": "system",
-            "content": dedent("""
-                Eres un crítico literario experto que proporciona análisis detallados y recomendaciones de estilo basadas en el género y la audiencia especificados.
-                **No debes corregir, modificar ni repetir el texto proporcionado.**
-                Tu única tarea es analizar el texto y ofrecer sugerencias de mejora enfocadas en aspectos literarios específicos como temas, desarrollo de personajes, estructura narrativa, tono y estilo.
-            """)
+            "genre": form.genre, "audience": form.audience, "text": text, "correction_format": correction_format,
+            "tier": service_tier, "concurrency": concurrency, "fanout": fanout_mode,
+            "author": interfaz.author_id(current_user), "mode": OVERLAPPED_MODES.get(execution_mode),
+            "stream": stream_mode,
         },
-        {
-            "role": "user",
-            "content": dedent(f"""
-                Por favor, analiza el siguiente texto y proporciona una crítica literaria junto con recomendaciones de estilo específicas.
-
-                **Instrucciones adicionales:**
-                - No repitas el análisis previamente proporcionado.
-                - No corrijas ni modifiques el texto original de ninguna manera.
-                - Enfócate únicamente en proporcionar observaciones, críticas constructivas y sugerencias de mejora relacionadas directamente con el contenido del texto.
-                - Preserva todos los hipervínculos existentes en el texto. No agregues nuevos hipervínculos a menos que sean necesarios.
-                - No alteres las URLs de los hipervínculos existentes.
-                - Organiza el análisis en secciones claras como **Temas**, **Desarrollo de Personajes**, **Estructura Narrativa**, **Estilo y Tono**, etc.
-
-                **Género:** {genre}
-                **Audiencia:** {audience}
-
-                **Texto:**
-                {text}
-            """)
-        }
-    ]
-
-    payload = {
-        "model": "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo",
-        "messages": messages,
-        "max_tokens": 2000,  # Ajusta según tus necesidades y límites de la API
-        "temperature": 0.5,  # Reducida para respuestas más enfocadas
-        "top_p": 0.7,
-        "top_k": 50,
-        "repetition_penalty": 1,
-        "stop": ["<|eot_id|>"],
-        "stream": False  # Mantener como False para simplificar
-    }
-
-    try:
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
-        response.raise_for_status()  # Esto lanzará una excepción si hay un error HTTP
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        st.error(f"Error al comunicarse con la API de Análisis: {e}")
-        return None
-
-# Función para llamar a la API de Together para Corrección de Estilo y Ortografía con Justificaciones Inline
-def call_together_api_style_correction_with_justifications(api_key, analysis, text):
-    url = "https://api.together.xyz/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-
-    # Construcción de los mensajes para la API con instrucciones claras y específicas
-    messages = [
-        {
-            "role": "system",
-            "content": dedent("""
-                Eres un editor experto en corrección de estilo, ortografía, gramática y puntuación que revisa textos literarios.
-                **No debes realizar cambios que alteren el contenido original del autor.**
-                Tu tarea es corregir el estilo, ortografía, gramática y puntuación del texto proporcionado basado en el análisis y las recomendaciones previas.
-                **Preserva todos los hipervínculos existentes en el texto. No agregues nuevos hipervínculos a menos que sean necesarios. No alteres las URLs de los hipervínculos existentes.**
-                **Después de cada cambio realizado, añade una justificación entre corchetes y en color rojo.**
-            """)
-        },
-        {
-            "role": "user",
-            "content": dedent(f"""
-                Basado en el siguiente análisis y recomendaciones, realiza una corrección de estilo del texto proporcionado. Incluye también correcciones ortográficas, gramaticales y de puntuación. Después de cada cambio realizado, añade una justificación entre corchetes y en color rojo.
-
-                **Análisis y Recomendaciones:**
-                {analysis}
-
-                **Texto Original:**
-                {text}
-
-                **Instrucciones adicionales:**
-                - No corrijas ni modifiques el contenido del texto.
-                - Enfócate únicamente en mejorar la claridad, el flujo, el estilo, la ortografía, la gramática y la puntuación.
-                - Preserva todos los hipervínculos existentes en el texto. No agregues nuevos hipervínculos a menos que sean necesarios.
-                - No alteres las URLs de los hipervínculos existentes.
-                - Para cada cambio realizado, proporciona una justificación detallada entre corchetes y estilizada en color rojo.
-                - Presenta el texto corregido con las justificaciones inline.
-            """)
-        }
-    ]
-
-    payload = {
-        "model": "mistralai/Mixtral-8x7B-Instruct-v0.1",
-        "messages": messages,
-        "max_tokens": 3000,  # Aumentado para acomodar justificaciones
-        "temperature": 0.5,  # Reducida para respuestas más enfocadas
-        "top_p": 0.7,
-        "top_k": 50,
-        "repetition_penalty": 1,
-        "stop": ["<|eot_id|>"],
-        "stream": False  # Mantener como False para simplificar
-    }
-
-    try:
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        st.error(f"Error al comunicarse con la API de Corrección de Estilo: {e}")
-        return None
+        api_key=api_key, response_cache=response_cache, limiter=rate_limiter, result_store=result_store,
+    )
+    st.session_state["trabajo"] = job_id
+    st.query_params["trabajo"] = job_id
+
+# Función para olvidar el trabajo mostrado (sigue en la tabla hasta que se purgue)
+def forget_job():
+    st.session_state.pop("trabajo", None)
+    st.query_params.pop("trabajo", None)
+
+# Función para mostrar el estado de un trabajo en segundo plano; devuelve True si aún no terminó
+def show_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        forget_job()
+        return False
+    params = job["params"]
+    if not job["finished"]:
+        status = "en cola" if job["status"] == jobs.QUEUED else "en curso"
+        st.progress(job["progress"], text=f"⏳ Trabajo {status} · {job['progress']:.0%}")
+    content = job["result"] or job["partial"] or {}
+    st.subheader(interfaz.ANALYSIS_TITLE)
+    if content.get("analysis"):
+        st.markdown(content["analysis"])
+    st.subheader(interfaz.CORRECTION_TITLE)
+    if content.get("correction"):
+        st.markdown(content["correction"], unsafe_allow_html=True)
+    if job["status"] == jobs.FAILED:
+        st.error(f"El trabajo falló: {job['error']}")
+    elif job["status"] == jobs.DONE:
+        result = job["result"]
+        if "edits" in result:
+            st.caption(f"✏️ {len(result['edits'])} ediciones aplicadas")
+        interfaz.show_repairs(result.get("repairs"))
+        st.caption(
+            f"📈 {result['words']} palabras en {result['chunks']} fragmento(s) · {result['seconds']:.1f} s "
+            f"({params.get('tier') or router.DEFAULT_TIER})"
+        )
+        tracked = service.tracked_chunks(params["text"], result["edits"]) if "edits" in result else None
+        interfaz.offer_download([result["correction"]], tracked)
+    if job["finished"]:
+        st.button("Cerrar resultado", on_click=forget_job)
+    return not job["finished"]
 
 # Acción al enviar el formulario
-if submit_button:
-    # Validación de entrada
-    if not text_input.strip():
-        st.error("Por favor, pega tu texto para analizar y corregir.")
-    elif not audience.strip():
-        st.error("Por favor, define la audiencia.")
-    else:
-        word_count = count_words(text_input)
-        if word_count > 2000:
-            st.error(f"El texto excede el límite de 2000 palabras. Actualmente tiene {word_count} palabras.")
+if form.submitted:
+    text_input = interfaz.read_submission(form, current_user, "Por favor, pega tu texto para analizar y corregir.")
+    if text_input:
+        # Un envío nuevo reemplaza el trabajo en segundo plano que se estuviera mostrando
+        forget_job()
+        clients = pipeline.Clients(interfaz.get_api_key(), response_cache, rate_limiter, service_tier)
+        renderer = interfaz.StreamlitRenderer(stream_mode, rate_limiter, correction_format, execution_mode.lower())
+        # Las correcciones mecánicas se hacen antes de gastar tokens del modelo en ellas
+        stages = [pipeline.Prepass()] if use_prepass else []
+        stages.append(pipeline.Estimate(correction_format=correction_format, fanout=fanout_mode, store=section_store))
+        if background_mode and not incremental_mode:
+            # El trabajo recibe el texto ya limpio por el prepaso
+            state = interfaz.run_pipeline(
+                pipeline.Pipeline(stages, clients, renderer), form.genre, form.audience, text_input
+            )
+            # Sólo run() completo deja "seconds"; si la estimación falló (cuota, contexto), el error ya se mostró
+            if "seconds" in state:
+                submit_job(clients.api_key, state["text"])
         else:
+            stages += processing_stages()
+            stages += [pipeline.Render(), pipeline.Record(result_store, interfaz.author_id(current_user))]
+            if incremental_mode:
+                spinner = "Procesando las secciones modificadas..."
+            elif service.needs_chunking(text_input):
+                spinner = "Procesando tu manuscrito por fragmentos..."
+            else:
+                spinner = "Procesando tu solicitud..."
             # Mostrar spinner mientras se procesa la solicitud
-            with st.spinner("Procesando tu solicitud..."):
-                # Obtener la API Key desde los secretos
-                try:
-                    api_key = st.secrets["TOGETHER_API_KEY"]
-                except KeyError:
-                    st.error("La clave de la API no está configurada correctamente en los secrets.")
-                    st.stop()
-
-                # Primera llamada a la API para Análisis Literario
-                api_response_analysis = call_together_api_analysis(api_key, genre, audience, text_input)
-
-                if api_response_analysis:
-                    # Extraer la respuesta del modelo para el análisis
-                    try:
-                        analysis = api_response_analysis['choices'][0]['message']['content']
-                        st.subheader("📄 Análisis Literario")
-                        st.write(analysis)
-                    except (KeyError, IndexError):
-                        st.error("Respuesta inesperada de la API de Análisis.")
-                        analysis = None
-
-                # Segunda llamada a la API para Corrección de Estilo y Ortografía con Justificaciones Inline, si el análisis fue exitoso
-                if analysis:
-                    api_response_correction = call_together_api_style_correction_with_justifications(api_key, analysis, text_input)
-
-                    if api_response_correction:
-                        # Extraer la respuesta del modelo para la corrección de estilo con justificaciones
-                        try:
-                            correction = api_response_correction['choices'][0]['message']['content']
-                            st.subheader("✍️ Corrección de Estilo, Ortográfica, Gramatical y de Puntuación con Justificaciones")
-                            # Renderizar el texto corregido con justificaciones en rojo
-                            st.markdown(correction, unsafe_allow_html=True)
-                        except (KeyError, IndexError):
-                            st.error("Respuesta inesperada de la API de Corrección de Estilo.")
+            with st.spinner(spinner):
+                interfaz.run_pipeline(
+                    pipeline.Pipeline(stages, clients, renderer, concurrency), form.genre, form.audience, text_input
+                )
+
+# Trabajo en segundo plano de la sesión (o el indicado en la URL, tras una recarga)
+job_pending = False
+job_id = st.session_state.get("trabajo") or st.query_params.get("trabajo")
+if job_id:
+    job_pending = show_job(job_id)
+
+# Latencias, cuenta, caché, conexión, arranque y depuración
+interfaz.show_sidebar_panels("correcciones", SCRIPT_START, current_user, response_cache, debug_panel)
+
+# Mientras el trabajo siga en curso, la página se vuelve a ejecutar para mostrar su avance
+if job_pending:
+    time.sleep(JOB_POLL_SECONDS)
+    st.rerun()
@@ -0,0 +1,601 @@
+import io
+import time
+from collections import namedtuple
+
+import streamlit as st
+import requests
+
+from correccion import (
+    budget, cache, chunking, compaction, docx_io, edits, executor, http_client, jobs, metrics, pipeline, prompts,
+    results, router, service, tenancy, validation,
+)
+
+# Partes comunes de las interfaces de Streamlit (app.py, correcciones.py y las páginas): recursos del proceso,
+# opciones de la barra lateral, formulario, la presentación de correccion.pipeline y los paneles de estado.
+# Aquí sólo se muestra; el procesamiento está en el paquete correccion.
+
+GENRES = ["Fantasía", "Ciencia Ficción", "Misterio", "Romance", "Terror", "Aventura", "Drama", "Histórico", "Otro"]
+
+ANALYSIS_TITLE = "📄 Análisis Literario"
+CORRECTION_TITLE = "✍️ Corrección de Estilo, Ortográfica, Gramatical y de Puntuación con Justificaciones"
+
+# Nombre de cada etapa en los errores de comunicación con la API
+STAGE_NAMES = {"analysis": "Análisis", "correction": "Corrección de Estilo"}
+
+# Fallos de las respuestas que detecta correccion.validation
+FAILURE_NAMES = {
+    "empty": "respuesta vacía",
+    "truncated": "respuesta cortada",
+    "links": "hipervínculos alterados",
+    "structure": "estructura incompleta",
+}
+
+# Errores que el procesamiento lanza en vez de mostrar
+PIPELINE_ERRORS = (
+    requests.exceptions.RequestException, service.UnexpectedResponseError, budget.BudgetExceededError,
+    edits.EditParseError, tenancy.QuotaExceededError,
+)
+
+# Envío del formulario de entrada
+Submission = namedtuple("Submission", ["text", "docx_file", "genre", "audience", "submitted"])
+
+
+# Limitador de peticiones y tokens por minuto, compartido por todas las sesiones y páginas (la cuota es de la API Key)
+@st.cache_resource
+def get_rate_limiter():
+    return executor.RateLimiter()
+
+# Usuarios y cuotas, compartidos por el proceso (sólo si CORRECCION_JWT_SECRET está definido): las llamadas de
+# cada usuario pasan por su cuota de tokens por minuto y por la cola justa antes del limitador compartido
+@st.cache_resource
+def get_tenancy():
+    return tenancy.Tenancy(get_rate_limiter())
+
+# Caché de respuestas compartida por todas las sesiones del proceso
+@st.cache_resource
+def get_response_cache():
+    return cache.ResponseCache()
+
+# Cola de trabajos en segundo plano, compartida por todas las sesiones: sus hilos no dependen de la ejecución
+# del script, así que sobreviven a las recargas, y la tabla SQLite guarda los resultados para reconectarse
+@st.cache_resource
+def get_job_queue():
+    queue = jobs.JobQueue()
+    queue.register("document", pipeline.document_job)
+    return queue
+
+# Historial de análisis y correcciones con búsqueda de texto completo (página 🔎 Búsqueda), compartido por el proceso
+@st.cache_resource
+def get_result_store():
+    return results.ResultStore()
+
+# Exportador Prometheus en /metrics, uno por proceso (sólo si CORRECCION_METRICS_PORT está definido)
+@st.cache_resource
+def start_metrics_server():
+    return metrics.serve()
+
+# Sesión HTTP con keep-alive, creada una vez por proceso antes de la primera petición
+@st.cache_resource
+def get_http_session():
+    return http_client.get_session()
+
+# API Key leída de los secretos una vez por proceso; si falta, el KeyError no se guarda y se vuelve a intentar
+@st.cache_resource
+def load_api_key():
+    return st.secrets["TOGETHER_API_KEY"]
+
+# Función para crear los recursos del proceso que no se usan directamente desde la página
+def start_process():
+    start_metrics_server()
+    get_http_session()
+
+# Función para obtener la API Key desde los secretos
+def get_api_key():
+    try:
+        return load_api_key()
+    except KeyError:
+        st.error("La clave de la API no está configurada correctamente en los secrets.")
+        st.stop()
+
+# Función para identificar al usuario de la sesión con su token (de la URL o de la barra lateral); sin
+# CORRECCION_JWT_SECRET no hay usuarios y devuelve None. Un token no válido detiene la página.
+def current_user():
+    if not tenancy.JWT_SECRET:
+        return None
+    access_token = st.query_params.get("token") or st.sidebar.text_input("🔑 Token de acceso:", type="password")
+    try:
+        return tenancy.verify_token(access_token)
+    except tenancy.AuthError as e:
+        st.error(str(e))
+        st.stop()
+
+# Función para el limitador de las llamadas de la sesión: con usuario, su cuota antes del limitador compartido
+def limiter_for(user):
+    return get_rate_limiter() if user is None else get_tenancy().limiter_for(user)
+
+# Función para el autor con el que se guardan los resultados
+def author_id(user):
+    return user.id if user is not None else None
+
+# Opciones de la barra lateral comunes a las páginas de análisis
+def stream_option():
+    return st.sidebar.checkbox(
+        "Mostrar la respuesta mientras se genera",
+        value=True,
+        help="Desactívalo para esperar la respuesta completa (modo sin streaming)."
+    )
+
+def tier_option():
+    return st.sidebar.radio(
+        "Nivel de servicio:",
+        options=list(router.TIERS),
+        index=list(router.TIERS).index(router.DEFAULT_TIER),
+        format_func=lambda option: {
+            "fast": "⚡ Rápido",
+            "balanced": "⚖️ Equilibrado",
+            "thorough": "🔬 Exhaustivo",
+        }[option],
+        help=(
+            "Elige en cada etapa el modelo más rápido que cumpla la calidad del nivel y en cuyo contexto quepa el "
+            "texto. Si el modelo agota el tiempo o el límite de peticiones, se pasa automáticamente a otro."
+        )
+    )
+
+def fanout_option():
+    return st.sidebar.checkbox(
+        "Análisis por secciones en paralelo",
+        value=prompts.ANALYSIS_FANOUT,
+        help=(
+            "Pide cada sección del análisis (temas, personajes, estructura, estilo) en una petición aparte, todas a "
+            "la vez y con una parte de los tokens de salida cada una: el análisis tarda lo que la sección más lenta."
+        )
+    )
+
+def cache_option():
+    return st.sidebar.checkbox(
+        "Reutilizar respuestas guardadas",
+        value=True,
+        help="Si ya se analizó el mismo texto con el mismo género y audiencia, se muestra el resultado guardado sin volver a llamar a la API."
+    )
+
+def debug_option():
+    debug_panel = st.sidebar.checkbox(
+        "🐞 Panel de depuración",
+        value=metrics.configured(),
+        help="Mide cada llamada y cada etapa (cola, primer byte, primer token, tokens, repintado) y muestra los últimos eventos."
+    )
+    # Se aplica en cada ejecución, así desmarcar el panel vuelve a apagar la medición; si se configuró para todo el
+    # proceso sigue activa
+    metrics.set_enabled(debug_panel or metrics.configured())
+    return debug_panel
+
+def concurrency_option():
+    return st.sidebar.slider(
+        "Fragmentos en paralelo (textos largos):",
+        min_value=1,
+        max_value=8,
+        value=executor.DEFAULT_CONCURRENCY,
+        help="Más fragmentos a la vez acortan los manuscritos largos, dentro de los límites por minuto de la API."
+    )
+
+# Formulario de entrada; con docx_upload se puede subir un manuscrito .docx en lugar de pegar el texto
+def input_form(submit_label, docx_upload=False):
+    with st.form(key='literary_analysis_form'):
+        # Área de texto para el contenido
+        text = st.text_area(
+            "Pega tu texto:",
+            height=300,
+            help="Los textos de más de unas 1500 palabras se procesan por fragmentos."
+        )
+
+        # Manuscrito en Word, como alternativa al área de texto para los textos largos
+        docx_file = None
+        if docx_upload:
+            docx_file = st.file_uploader(
+                "O sube un manuscrito .docx:",
+                type=["docx"],
+                help="Se lee párrafo a párrafo; si subes un archivo, se usa en lugar del texto pegado."
+            )
+
+        # Selección de género
+        genre = st.selectbox("Selecciona el género:", options=GENRES)
+
+        # Entrada de audiencia
+        audience = st.text_input(
+            "Define la audiencia:",
+            help="Por ejemplo: adolescentes, adultos jóvenes, adultos, etc."
+        )
+
+        # Botón de envío
+        submitted = st.form_submit_button(label=submit_label)
+    return Submission(text, docx_file, genre, audience, submitted)
+
+# Función para validar un envío y descontarlo de la cuota diaria del usuario; devuelve el texto a procesar
+# (el del .docx subido, si lo hay) o None tras mostrar el error
+def read_submission(submission, user, empty_message):
+    text = submission.text
+    # Un .docx subido sustituye al texto pegado
+    if submission.docx_file is not None:
+        try:
+            with metrics.timer("docx"):
+                text = service.read_docx(submission.docx_file)
+        except docx_io.DocxError as e:
+            st.error(str(e))
+            st.stop()
+    if not text.strip():
+        st.error(empty_message)
+        return None
+    if not submission.audience.strip():
+        st.error("Por favor, define la audiencia.")
+        return None
+    # Con usuarios, cada envío cuenta para la cuota diaria de documentos de su plan
+    if user is not None:
+        try:
+            get_tenancy().admit_document(user)
+        except tenancy.QuotaExceededError as e:
+            st.error(str(e))
+            st.stop()
+    return text
+
+# Función para registrar y mostrar la latencia de una llamada
+def show_latency(stage, api_response):
+    timings = api_response.get("timings")
+    if not timings:
+        return
+    route = api_response.get("route") or {}
+    model = (route.get("model") or api_response.get("model") or "").rsplit("/", 1)[-1]
+    st.session_state.setdefault("latencias", []).append({"etapa": stage, "modelo": model, **timings})
+    fallback = f" (respaldo tras {len(route['failed'])} fallo(s))" if route.get("failed") else ""
+    if timings.get("cached"):
+        st.caption(f"⚡ Recuperado de la caché en {timings['total'] * 1000:.1f} ms")
+    else:
+        st.caption(
+            f"⏱️ Primer token: {timings['ttft']:.2f} s · Total: {timings['total']:.2f} s · {model}{fallback}"
+        )
+    sections = api_response.get("sections")
+    if sections:
+        detail = " · ".join(f"{section['section']}: {section['seconds']:.2f} s" for section in sections)
+        st.caption(
+            f"🔀 Secciones en paralelo — {detail} (suma {sum(section['seconds'] for section in sections):.2f} s)"
+        )
+    savings = api_response.get("compaction")
+    if savings:
+        st.caption(
+            f"🗜️ Prompt compacto: {savings['prompt_tokens']} tokens de entrada "
+            f"({savings['saved_tokens']} menos que el completo)"
+        )
+
+# Función para mostrar el presupuesto estimado antes de enviar el texto
+def show_estimate(estimate):
+    if "sections" in estimate:
+        # Reanálisis incremental: sólo se envían las secciones nuevas o modificadas
+        parts = (
+            f"{estimate['chunks']} de {estimate['sections']} secciones por enviar "
+            f"({estimate['reused']} reutilizadas)"
+        )
+    else:
+        parts = f"{estimate['chunks']} fragmento(s)"
+    st.caption(
+        f"🔢 ≈ {estimate['text_tokens']} tokens de texto en {parts} · "
+        f"{estimate['prompt_tokens']} de entrada y hasta {estimate['max_completion_tokens']} de salida · "
+        f"costo máximo estimado: US$ {estimate['max_cost']:.4f}"
+    )
+
+# Función para mostrar la comparación de tiempos frente al flujo secuencial
+def show_pipeline_timings(timings, mode):
+    st.session_state.setdefault("latencias", []).append({"etapa": f"Flujo {mode}", "total": timings["real"]})
+    detail = " · ".join(f"{stage}: {seconds:.2f} s" for stage, seconds in timings["etapas"].items())
+    st.caption(
+        f"⏱️ {detail} — secuencial estimado: {timings['secuencial']:.2f} s, "
+        f"real: {timings['real']:.2f} s (ahorro {timings['ahorro']:.0%})"
+    )
+
+# Función para mostrar el resumen de una corrección en formato de lista de ediciones
+def show_edit_summary(result):
+    by_reason = ", ".join(f"{count} de {reason.lower()}" for reason, count in edits.summarize(result["edits"]).items())
+    links = "🔗 hipervínculos intactos"
+    if result["lost_urls"] or result["added_urls"]:
+        links = f"⚠️ URLs perdidas: {result['lost_urls']} · añadidas: {result['added_urls']}"
+    st.caption(
+        f"✏️ {len(result['edits'])} ediciones aplicadas" + (f" ({by_reason})" if by_reason else "")
+        + f" · {len(result['rejected'])} descartadas · {links}"
+    )
+    with st.expander("Texto corregido sin anotaciones"):
+        st.markdown(result["corrected"])
+    if result["rejected"]:
+        with st.expander("Ediciones descartadas"):
+            st.table([
+                {"original": edit.get("original"), "reemplazo": edit.get("replacement"), "motivo": reason}
+                for edit, reason in result["rejected"]
+            ])
+
+# Función para mostrar los fallos de las respuestas que se repararon y los que no (pipeline.repair_counts)
+def show_repairs(repairs):
+    if not repairs:
+        return
+    repaired = [
+        f"{FAILURE_NAMES[mode]} ({counts['repaired']})" for mode, counts in repairs.items() if counts["repaired"]
+    ]
+    pending = [
+        f"{FAILURE_NAMES[mode]} ({counts['detected'] - counts['repaired']})"
+        for mode, counts in repairs.items() if counts["detected"] > counts["repaired"]
+    ]
+    if repaired:
+        st.caption(f"🩹 Reparado sin repetir la petición completa: {', '.join(repaired)}")
+    if pending:
+        st.warning(f"No se pudo reparar: {', '.join(pending)}. Revisa esa parte del resultado.")
+
+# Función para mostrar el resultado del prepaso local y los avisos que no se aplicaron
+def show_prepass(result):
+    st.caption(
+        f"🧹 Prepaso local: {len(result['edits'])} correcciones mecánicas en {result['seconds'] * 1000:.1f} ms "
+        f"(≈ {result['saved_tokens']} tokens de salida ahorrados) · {len(result['flags'])} avisos"
+    )
+    if result["edits"] or result["flags"]:
+        with st.expander("Correcciones y avisos del prepaso local"):
+            if result["edits"]:
+                st.markdown(result["annotated"], unsafe_allow_html=True)
+            if result["flags"]:
+                st.table([
+                    {"fragmento": flag.original, "motivo": edits.REASON_CODES[flag.reason], "aviso": flag.note}
+                    for flag in result["flags"]
+                ])
+
+# Función para mostrar el rendimiento de un manuscrito procesado por fragmentos
+def show_throughput(words, seconds, limiter):
+    st.session_state.setdefault("latencias", []).append({"etapa": "Manuscrito", "total": seconds})
+    limiter_stats = limiter.stats()
+    st.caption(
+        f"📈 {words} palabras en {seconds:.1f} s "
+        f"({words / seconds if seconds > 0 else 0.0:.1f} palabras/s) · "
+        f"esperas por límite: {limiter_stats['throttled']} · respuestas 429: {limiter_stats['rate_limited']}"
+    )
+
+# Función para ofrecer la descarga del texto corregido, unido a partir de sus fragmentos o secciones, en markdown
+# y en .docx. tracked, pares (texto original, ediciones) del formato de lista de ediciones, sale en el .docx como
+# cambios marcados; si no, el .docx lleva las justificaciones en rojo.
+def offer_download(corrections, tracked=None):
+    corrections = [correction for correction in corrections if correction]
+    if not corrections:
+        return
+    st.download_button(
+        "⬇️ Descargar texto corregido",
+        data=chunking.stitch(corrections),
+        file_name="texto_corregido.md",
+        mime="text/markdown",
+    )
+    document = io.BytesIO()
+    service.export_docx(document, corrections, tracked)
+    st.download_button(
+        "⬇️ Descargar .docx" + (" con cambios marcados" if tracked is not None else ""),
+        data=document.getvalue(),
+        file_name="texto_corregido.docx",
+        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    )
+
+
+# Presentación de correccion.pipeline en la página. Un texto que cabe en una petición se repinta mientras se
+# genera y se muestra etapa a etapa con sus latencias; uno largo, fragmento a fragmento con una barra de avance,
+# el rendimiento y la descarga al final. Sin correction_format sólo se muestra el análisis (app.py).
+class StreamlitRenderer(pipeline.Renderer):
+    def __init__(self, stream=True, limiter=None, correction_format=None, mode=None):
+        self.stream = stream
+        self.limiter = limiter or get_rate_limiter()
+        self.correction_format = correction_format
+        self.mode = mode  # Nombre del modo de ejecución en la comparación de tiempos de la etapa "overlapped"
+        self.progress = None
+
+    def begin_chunks(self, state):
+        if state["chunked"]:
+            if not state["incremental"]:
+                action = "analizará y corregirá" if self.correction_format else "analizará"
+                st.info(f"El texto tiene {state['words']} palabras: se {action} por fragmentos.")
+            self.progress = st.progress(0.0)
+        st.subheader(ANALYSIS_TITLE)
+        self.analysis_placeholder = st.empty()
+        self.analysis_container = st.container()
+        if self.correction_format:
+            st.subheader(CORRECTION_TITLE)
+            self.correction_placeholder = st.empty()
+            self.correction_container = st.container()
+
+    def partial(self, stage, content):
+        if stage == "analysis":
+            self.analysis_placeholder.markdown(content)
+        else:
+            self.correction_placeholder.markdown(content, unsafe_allow_html=True)
+
+    def stage(self, stage, state, chunk=None):
+        if stage == "prepass":
+            show_prepass(state["prepass"])
+        elif stage == "estimate":
+            show_estimate(state["estimate"])
+        elif chunk is None:
+            return
+        elif stage == "analysis":
+            with metrics.timer("render"):
+                self.analysis_placeholder.markdown(chunk["analysis"])
+            with self.analysis_container:
+                show_latency("Análisis", chunk["analysis_response"])
+        elif stage == "correction":
+            self._show_correction(chunk)
+            with self.correction_container:
+                show_latency("Corrección", chunk["correction_response"])
+        elif stage == "overlapped":
+            with metrics.timer("render"):
+                self.analysis_placeholder.markdown(chunk["analysis"])
+            self._show_correction(chunk)
+            with self.correction_container:
+                if chunk.get("reconciliation"):
+                    st.markdown("**🔗 Notas de conciliación con el análisis**")
+                    st.markdown(chunk["reconciliation"])
+                show_pipeline_timings(chunk["overlap"], self.mode)
+
+    # Corrección terminada: tal cual, o la lista de ediciones aplicada al texto con su resumen
+    def _show_correction(self, chunk):
+        resolved = chunk.get("resolved")
+        with metrics.timer("render"):
+            if resolved is None:
+                self.correction_placeholder.markdown(chunk["correction"], unsafe_allow_html=True)
+                return
+            self.correction_placeholder.markdown(resolved["annotated"], unsafe_allow_html=True)
+            with self.correction_container:
+                show_edit_summary(resolved)
+
+    def chunk(self, state, chunk):
+        if not state["chunked"]:
+            return
+        with metrics.timer("render"):
+            self.analysis_placeholder.markdown(state["analysis"])
+            if self.correction_format:
+                with self.correction_container:
+                    resolved = chunk.get("resolved")
+                    st.markdown(resolved["annotated"] if resolved else chunk["correction"], unsafe_allow_html=True)
+        number = chunk["index"] + 1
+        if state["incremental"]:
+            label = f"Sección {number} lista"
+        else:
+            label = f"Fragmento {number} {'corregido' if self.correction_format else 'analizado'}"
+        self.progress.progress(state["progress"], text=label)
+
+    def result(self, state):
+        chunks = state["chunks"]
+        show_repairs(pipeline.repair_counts(chunks))
+        if not state["chunked"]:
+            return
+        if state["incremental"]:
+            sent = sum(service.count_words(chunk["body"]) for chunk in chunks if not chunk["reused"])
+            st.caption(
+                f"♻️ {sum(chunk['reused'] for chunk in chunks)} de {len(chunks)} secciones reutilizadas · "
+                f"{sent} de {state['words']} palabras enviadas a la API"
+            )
+            failed = [chunk for chunk in chunks if chunk.get("error")]
+            if failed:
+                st.warning(
+                    f"{len(failed)} sección(es) no se pudieron corregir y se muestran sin cambios; se volverán a "
+                    f"enviar la próxima vez. Primer error: {failed[0]['error']}"
+                )
+        show_throughput(state["done_words"], state["seconds"], self.limiter)
+        if self.correction_format:
+            tracked = None
+            if self.correction_format == "edits":
+                tracked = [(chunk["body"], chunk["resolved"]["edits"]) for chunk in chunks]
+            offer_download([chunk["correction"] for chunk in chunks], tracked)
+
+# Función para mostrar un error del procesamiento: la etapa que falló si el texto cabía en una petición, o el
+# fragmento o la sección si se procesaba por partes
+def show_error(error, state):
+    if isinstance(error, requests.exceptions.RequestException):
+        stage = None if state["chunked"] else STAGE_NAMES.get(state.get("stage"))
+        st.error(f"Error al comunicarse con la API{' de ' + stage if stage else ''}: {error}")
+    elif state["chunked"]:
+        part = "sección" if state["incremental"] else "fragmento"
+        st.error(f"{error} ({part} {len(state['chunks']) + 1})")
+    elif isinstance(error, edits.EditParseError):
+        st.error(f"La lista de ediciones devuelta por la API no es válida: {error}")
+    else:
+        st.error(str(error))
+
+# Función para ejecutar un pipeline en la página y mostrar sus errores. Si un manuscrito falla a medias, se
+# muestra lo procesado hasta entonces. Devuelve el estado del documento.
+def run_pipeline(runner, genre, audience, text):
+    try:
+        return runner.run(genre, audience, text)
+    except PIPELINE_ERRORS as e:
+        show_error(e, runner.state)
+        if runner.state["chunked"] and runner.state["chunks"]:
+            runner.renderer.result(runner.state)
+        return runner.state
+
+# Paneles de estado de la barra lateral, al final del script: latencias de la sesión, cuenta del usuario, caché,
+# conexión con la API, arranque del script y, con debug_panel, los últimos eventos medidos
+def show_sidebar_panels(script, script_start, user=None, response_cache=None, debug_panel=False):
+    # Historial de latencias de la sesión
+    if st.session_state.get("latencias"):
+        with st.sidebar.expander("⏱️ Latencias registradas"):
+            st.table(st.session_state["latencias"][-10:])
+
+    # Uso del día y cuotas del usuario
+    if user is not None:
+        with st.sidebar.expander("👤 Cuenta"):
+            account = get_tenancy().account(user)
+            st.write(
+                f"{account['user']} · plan {account['plan']} · documentos hoy: {account['documents']} de "
+                f"{account['documents_per_day']} · tokens hoy: {account['prompt_tokens'] + account['completion_tokens']} "
+                f"(límite de {account['tokens_per_minute']} por minuto)"
+            )
+
+    # Estadísticas de la caché de respuestas
+    if response_cache is not None:
+        with st.sidebar.expander("🗄️ Caché de respuestas"):
+            cache_stats = response_cache.stats()
+            st.write(
+                f"Aciertos: {cache_stats['hits']} (memoria {cache_stats['memory_hits']}, disco {cache_stats['disk_hits']}) · "
+                f"Fallos: {cache_stats['misses']} · Tasa de acierto: {cache_stats['hit_rate']:.0%} · "
+                f"Entradas: {cache_stats['entries']}"
+            )
+            if st.button("Vaciar caché"):
+                response_cache.clear()
+
+    # Latencias y reintentos de la conexión con la API (compartidos por el proceso)
+    with st.sidebar.expander("🌐 Conexión con la API"):
+        http_latency = http_client.latency_histogram.snapshot()
+        st.write(
+            f"Peticiones: {http_latency['count']} · media: {http_latency['mean']:.2f} s · "
+            f"p50 ≤ {http_latency['p50']} s · p95 ≤ {http_latency['p95']} s · "
+            f"reintentos: {http_client.retry_counters['retries']}"
+        )
+        if http_latency["count"]:
+            st.table([{"≤ segundos": bound, "peticiones (acumulado)": count} for bound, count in http_latency["buckets"]])
+        prompt_savings = compaction.stats()
+        if prompt_savings["requests"]:
+            st.write(
+                f"Prompts compactos: {prompt_savings['requests']} · tokens de entrada ahorrados: "
+                f"{prompt_savings['saved_tokens']} de {prompt_savings['prompt_tokens'] + prompt_savings['saved_tokens']}"
+            )
+        failures = validation.stats()
+        if any(failures[mode] for mode in validation.FAILURE_MODES):
+            st.markdown("**Respuestas reparadas**")
+            st.table([
+                {"fallo": FAILURE_NAMES[mode], "detectados": failures[mode], "reparados": failures[f"{mode}_repaired"]}
+                for mode in validation.FAILURE_MODES
+            ])
+        st.markdown("**Modelos**")
+        st.dataframe([dict(row, modelo=row["modelo"].rsplit("/", 1)[-1]) for row in router.model_router.snapshot()])
+
+    # Tiempo de ejecución del script: la primera del proceso (fría) y la de cada interacción (caliente)
+    metrics.record_script_run(script, time.perf_counter() - script_start)
+    with st.sidebar.expander("🚀 Arranque del script"):
+        startup = metrics.script_report(script)
+        st.write(
+            f"Ejecución fría: {startup['cold'] * 1000:.0f} ms · ejecuciones calientes: {startup['warm_runs']}"
+            + (
+                f" (mediana {startup['warm_median'] * 1000:.0f} ms, máx. {startup['warm_max'] * 1000:.0f} ms)"
+                if startup["warm_runs"] else ""
+            )
+        )
+
+    # Panel de depuración: últimos eventos medidos y métricas en formato Prometheus
+    if debug_panel:
+        with st.sidebar.expander("🐞 Depuración", expanded=True):
+            events = metrics.recent_events(20)
+            if events:
+                st.dataframe([
+                    {
+                        "etapa": event["stage"],
+                        "modelo": (event.get("model") or "").rsplit("/", 1)[-1],
+                        "caché": event.get("cached"),
+                        "cola": event.get("queue"),
+                        "primer byte": event.get("ttfb"),
+                        "primer token": event.get("ttft"),
+                        "total": event.get("total", event.get("seconds")),
+                        "tokens entrada": event.get("prompt_tokens"),
+                        "tokens salida": event.get("completion_tokens"),
+                        "error": event.get("error"),
+                    }
+                    for event in reversed(events)
+                ])
+            else:
+                st.write("Aún no hay eventos medidos.")
+            prometheus = metrics.render_prometheus()
+            st.download_button("⬇️ Métricas (Prometheus)", data=prometheus, file_name="metrics.txt", mime="text/plain")
@@ -0,0 +1,54 @@
+import time
+
+import streamlit as st
+
+import interfaz
+
+# Configuración de la página
+st.set_page_config(page_title="Búsqueda de análisis anteriores", layout="wide")
+
+st.title("🔎 Búsqueda de análisis anteriores")
+
+st.markdown("""
+Busca entre los análisis y correcciones guardados. Las palabras se buscan sin distinguir tildes ni mayúsculas;
+termina una palabra en `*` para buscar por prefijo (por ejemplo, `personaj*`).
+""")
+
+# Historial compartido por el proceso: el mismo almacén en el que escriben las páginas de análisis
+result_store = interfaz.get_result_store()
+
+# Con usuarios, cada uno sólo ve sus propios resultados
+author = interfaz.author_id(interfaz.current_user())
+
+# Formulario de búsqueda
+with st.form(key="search_form"):
+    query = st.text_input("Buscar:", help="Vacío para ver los resultados más recientes.")
+    genre = st.selectbox("Género:", options=["Todos"] + interfaz.GENRES)
+    audience = st.text_input("Audiencia (exacta, opcional):")
+    limit = st.slider("Resultados:", min_value=5, max_value=100, value=20, step=5)
+    st.form_submit_button(label="Buscar")
+
+start = time.perf_counter()
+found = result_store.search(
+    query, genre=None if genre == "Todos" else genre, audience=audience.strip() or None, author=author, limit=limit
+)
+st.caption(f"{len(found)} resultado(s) en {(time.perf_counter() - start) * 1000:.1f} ms")
+
+for result in found:
+    created = time.strftime("%Y-%m-%d %H:%M", time.localtime(result["created"]))
+    model = (result["model"] or "").rsplit("/", 1)[-1]
+    with st.expander(f"{created} · {result['genre']} · {result['audience']} · {result['words']} palabras · {model}"):
+        if result["snippet"]:
+            st.markdown(result["snippet"])
+        st.markdown("**📄 Análisis Literario**")
+        st.markdown(result["analysis"])
+        if result["correction"]:
+            st.markdown("**✍️ Corrección**")
+            st.markdown(result["correction"], unsafe_allow_html=True)
+        timings = " · ".join(f"{stage}: {seconds:.2f} s" for stage, seconds in result["timings"].items() if seconds)
+        st.caption(f"⏱️ {timings} · huella {result['input_hash'][:12]}" if timings else f"huella {result['input_hash'][:12]}")
+
+# Estado del almacén
+with st.sidebar.expander("🗃️ Historial"):
+    store_stats = result_store.stats()
+    st.write(f"Resultados guardados: {store_stats['entries']} · búsquedas: {store_stats['searches']}")
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from correccion import batch
+
+
+# Tras una caída a mitad de una línea, el siguiente registro empieza en una línea propia y ambos se leen
+def test_trim_checkpoint_drops_partial_line(tmp_path):
+    output = tmp_path / "salida.jsonl"
+    complete = json.dumps({"id": "uno.txt"}) + "\n"
+    output.write_text(complete + '{"id": "dos.t', encoding="utf-8")
+
+    assert batch.trim_checkpoint(str(output), block_size=4) == len('{"id": "dos.t')
+    with open(output, "a", encoding="utf-8") as handle:
+        handle.write(json.dumps({"id": "tres.txt"}) + "\n")
+    assert batch.load_checkpoint(str(output)) == {"uno.txt", "tres.txt"}
+
+
+def test_trim_checkpoint_keeps_complete_file(tmp_path):
+    output = tmp_path / "salida.jsonl"
+    output.write_text(json.dumps({"id": "uno.txt"}) + "\n", encoding="utf-8")
+    assert batch.trim_checkpoint(str(output)) == 0
+    assert batch.trim_checkpoint(str(tmp_path / "no-existe.jsonl")) == 0
+
+
+# Un id absoluto o con ".." no saca el .docx de --docx-dir; el manuscrito original nunca se sobrescribe
+def test_export_path_stays_inside_docx_dir(tmp_path):
+    docx_dir = tmp_path / "salida"
+    assert batch.export_path(str(docx_dir), "cap/uno.txt") == str(docx_dir / "cap" / "uno.docx")
+    assert batch.export_path(str(docx_dir), str(tmp_path / "libro.docx")).startswith(str(docx_dir))
+    assert batch.export_path(str(docx_dir), "../../fuera.md") == str(docx_dir / "fuera.docx")
+    with pytest.raises(ValueError):
+        batch.export_path(str(docx_dir), "../..")
+    source = docx_dir / "libro.docx"
+    with pytest.raises(ValueError):
+        batch.export_path(str(docx_dir), "libro.docx", source=str(source))
+
+
+# Sin id, una entrada del manifiesto se identifica por su ruta relativa al manifiesto
+def test_manifest_id_defaults_to_relative_path(tmp_path):
+    manifest = tmp_path / "manifiesto.jsonl"
+    manifest.write_text(
+        json.dumps({"path": "cap/uno.txt"}) + "\n" + json.dumps({"path": str(tmp_path / "dos.docx")}) + "\n",
+        encoding="utf-8",
+    )
+    assert [entry["id"] for entry in batch.iter_documents(str(manifest), "Otro", "adultos")] == [
+        "cap/uno.txt", "dos.docx",
+    ]
+
+
+# Las líneas del manifiesto que no se pueden procesar dan un registro con error y el lote sigue con las demás
+def test_invalid_manifest_lines_become_error_records(tmp_path):
+    manifest = tmp_path / "manifiesto.jsonl"
+    manifest.write_text(
+        '{"id": "roto", "text": "Sin cerrar"\n'
+        '{"id": "vacío", "genre": "Cuento"}\n'
+        '["no", "es", "un", "objeto"]\n'
+        '{"id": "bien", "text": "Un texto."}\n',
+        encoding="utf-8",
+    )
+    entries = list(batch.iter_documents(str(manifest), "Otro", "adultos"))
+    assert [entry["id"] for entry in entries] == ["1", "vacío", "3", "bien"]
+    assert [bool(entry.get("error")) for entry in entries] == [True, True, True, False]
+    record = batch.process_entry(entries[1], "clave", None, None, 1, "inline")
+    assert record["id"] == "vacío" and "path" in record["error"]
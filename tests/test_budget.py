@@ -0,0 +1,45 @@
+import pytest
+
+from correccion import budget
+
+MISTRAL = "mistralai/Mistral-7B-Instruct-v0.3"
+
+
+# Las tildes y la ñ ocupan dos bytes y encarecen la palabra; Mistral parte las palabras en más tokens
+def test_count_tokens_by_tokenizer_family():
+    assert budget.count_tokens("casa y perro.") == 4
+    assert budget.count_tokens("extraordinariamente") == 4
+    assert budget.count_tokens("extraordinariamente", MISTRAL) == 5
+    assert (budget.count_tokens("camion"), budget.count_tokens("camión")) == (1, 2)
+
+
+def test_count_prompt_tokens_adds_chat_overhead():
+    messages = [{"role": "system", "content": "Hola."}, {"role": "user", "content": "casa"}]
+    overhead = 2 * budget.MESSAGE_OVERHEAD + budget.REPLY_OVERHEAD
+    assert budget.count_prompt_tokens(messages, MISTRAL) == 2 + 1 + overhead
+
+
+# max_tokens se recorta a lo que deja libre el prompt (8192 para modelos fuera de la tabla)
+def test_fit_max_tokens_clamps_to_context():
+    messages = [{"role": "user", "content": "casa " * 6000}]
+    prompt_tokens = budget.count_prompt_tokens(messages, "modelo-desconocido")
+    assert budget.fit_max_tokens(MISTRAL, messages, 2000) == 2000
+    assert budget.fit_max_tokens("modelo-desconocido", messages, 8000) == (
+        8192 - prompt_tokens - budget.SAFETY_MARGIN
+    )
+
+
+def test_fit_max_tokens_raises_when_prompt_leaves_no_room():
+    messages = [{"role": "user", "content": "casa " * 8000}]
+    with pytest.raises(budget.BudgetExceededError) as excinfo:
+        budget.fit_max_tokens("modelo-desconocido", messages, 2000)
+    assert excinfo.value.context == 8192
+    assert excinfo.value.prompt_tokens > 8000
+    assert isinstance(excinfo.value, ValueError)
+
+
+def test_plan_payload_prices_the_maximum_output():
+    payload = {"model": MISTRAL, "messages": [{"role": "user", "content": "casa"}], "max_tokens": 1000}
+    plan = budget.plan_payload(payload)
+    assert plan["context"] == 32768
+    assert plan["max_cost"] == pytest.approx((plan["prompt_tokens"] + 1000) * 0.20 / 1_000_000)
@@ -0,0 +1,64 @@
+from correccion import cache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        self.now += 1
+        return self.now
+
+
+# La clave ignora diferencias de espacios y Unicode, pero cambia con el modelo, la plantilla o el muestreo
+def test_cache_key_normalizes_text_and_separates_parameters():
+    key = cache.cache_key("modelo", 1, {"temperature": 0.3}, text="Café  con\r\nleche")
+    assert key == cache.cache_key("modelo", 1, {"temperature": 0.3}, text="Café con\nleche ")
+    assert key != cache.cache_key("otro", 1, {"temperature": 0.3}, text="Café con\nleche")
+    assert key != cache.cache_key("modelo", 2, {"temperature": 0.3}, text="Café con\nleche")
+    assert key != cache.cache_key("modelo", 1, {"temperature": 0.7}, text="Café con\nleche")
+
+    payload = {"model": "modelo", "messages": [], "stream": True, "temperature": 0.3}
+    assert cache.payload_cache_key(payload, 1, text="Café con\nleche") == key
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "time", clock)
+    store = cache.ResponseCache(str(tmp_path / "cache.sqlite3"), ttl=10)
+    store.set("clave", {"texto": "hola"})
+    assert store.get("clave") == {"texto": "hola"}
+
+    clock.now += 20
+    assert store.get("clave") is None
+    assert store.stats()["entries"] == 0
+    assert store.stats()["misses"] == 1
+
+
+# En disco se desaloja lo menos usado; una lectura renueva la entrada
+def test_disk_evicts_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache.time, "time", Clock())
+    store = cache.ResponseCache(str(tmp_path / "cache.sqlite3"), max_entries=2, memory_entries=0)
+    store.set("a", 1)
+    store.set("b", 2)
+    assert store.get("a") == 1
+    store.set("c", 3)
+
+    assert store.get("b") is None
+    assert (store.get("a"), store.get("c")) == (1, 3)
+    assert store.stats()["evictions"] == 1
+
+
+# El nivel en memoria descarta lo menos usado; la copia en disco sigue sirviendo
+def test_memory_level_is_lru_in_front_of_disk(tmp_path):
+    store = cache.ResponseCache(str(tmp_path / "cache.sqlite3"), memory_entries=1)
+    store.set("a", [1])
+    store.set("b", [2])
+    assert store.get("b") == [2]
+    assert store.get("a") == [1]
+    assert store.stats()["memory_hits"] == 1
+    assert store.stats()["disk_hits"] == 1
+
+    value = store.get("a")
+    value.append(3)
+    assert store.get("a") == [1]
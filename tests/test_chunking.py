@@ -0,0 +1,27 @@
+from correccion import chunking, service
+
+
+def _paragraph(number, words=120):
+    return f"Párrafo {number}. " + " ".join(["palabra"] * words) + "."
+
+
+# Cada fragmento lleva párrafos enteros, en orden, sin repetir ni perder ninguno; el contexto es el final del anterior
+def test_split_document_keeps_whole_paragraphs_in_order():
+    paragraphs = [_paragraph(number) for number in range(40)]
+    chunks = list(service.split_document("\n\n".join(paragraphs)))
+    assert len(chunks) > 1
+    assert [chunk.index for chunk in chunks] == list(range(len(chunks)))
+    rebuilt = [paragraph for chunk in chunks for paragraph in chunking.iter_paragraphs(chunk.body)]
+    assert rebuilt == paragraphs
+    assert all(service.count_text_tokens(chunk.body) <= chunking.DEFAULT_CHUNK_TOKENS for chunk in chunks)
+    assert not chunks[0].context
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.context and previous.body.endswith(chunk.context.split("\n\n")[-1])
+
+
+# Los saltos de línea de Windows y las líneas en blanco repetidas se normalizan; un texto corto es un fragmento
+def test_split_document_normalizes_short_text():
+    chunks = list(service.split_document("Hola.\r\n\r\n\r\nAdiós.\n\n"))
+    assert len(chunks) == 1
+    assert chunks[0].body == "Hola.\n\nAdiós."
+    assert not service.needs_chunking("Hola.\r\n\r\nAdiós.")
@@ -0,0 +1,64 @@
+import importlib
+
+import pytest
+
+from correccion import compaction, prompts, service
+
+ANALYSIS = "\n\n".join([
+    "**Temas**",
+    "- El relato gira en torno a la espera y al mar. La protagonista mira el horizonte cada tarde. "
+    "El pueblo entero vive pendiente de las barcas.",
+    "**Estilo y Tono**",
+    "- La voz narrativa es sobria y melancólica. Conviene dividir las oraciones del segundo párrafo, que "
+    "encadenan demasiadas subordinadas. El ritmo general acompaña bien la historia.",
+    "**Ortografía y Gramática**",
+    "- Revisa las tildes de los pretéritos y de las palabras agudas. El uso de los tiempos verbales es coherente.",
+])
+
+
+@pytest.fixture
+def reload_prompts(monkeypatch):
+    yield lambda: importlib.reload(prompts)
+    monkeypatch.undo()
+    importlib.reload(prompts)
+
+
+# Los prompts compactos son opcionales: sólo CORRECCION_COMPACT_PROMPTS los activa
+def test_compact_prompts_are_opt_in(monkeypatch, reload_prompts):
+    monkeypatch.delenv("CORRECCION_COMPACT_PROMPTS", raising=False)
+    assert reload_prompts().COMPACT_PROMPTS is False
+    monkeypatch.setenv("CORRECCION_COMPACT_PROMPTS", "1")
+    assert reload_prompts().COMPACT_PROMPTS is True
+
+
+def test_distill_keeps_actionable_recommendations_by_section():
+    distilled = compaction.distill(ANALYSIS)
+    assert distilled.splitlines() == [
+        "- Temas: El relato gira en torno a la espera y al mar.",
+        "- Estilo y Tono: Conviene dividir las oraciones del segundo párrafo, que encadenan demasiadas subordinadas.",
+        "- Ortografía y Gramática: Revisa las tildes de los pretéritos y de las palabras agudas.",
+    ]
+    # Un análisis que ya es breve se envía tal cual
+    assert compaction.distill("Revisa el final del cuento.") == "Revisa el final del cuento."
+
+
+def test_correct_uses_full_prompt_unless_compaction_is_enabled(monkeypatch):
+    sent = []
+
+    def chat_completion(api_key, payload, **kwargs):
+        sent.append(payload["messages"][-1]["content"])
+        return {"choices": [{"message": {"content": "Texto."}, "finish_reason": "stop"}], "model": payload["model"]}
+
+    monkeypatch.setattr(service.together_api, "chat_completion", chat_completion)
+    monkeypatch.setattr(prompts, "COMPACT_PROMPTS", False)
+    full = service.correct("x", "Cuento", "adultos", ANALYSIS, "Texto.")
+    assert "compaction" not in full
+    assert "La voz narrativa es sobria" in sent[-1]
+
+    compact = service.correct("x", "Cuento", "adultos", ANALYSIS, "Texto.", compact=True)
+    assert "La voz narrativa es sobria" not in sent[-1]
+    assert compaction.distill(ANALYSIS) in sent[-1]
+    assert compact["compaction"]["saved_tokens"] > 0
+    assert compact["compaction"]["full_tokens"] == (
+        compact["compaction"]["prompt_tokens"] + compact["compaction"]["saved_tokens"]
+    )
@@ -0,0 +1,60 @@
+import io
+import zipfile
+
+import pytest
+
+from correccion import docx_io, service
+from correccion.edits import Edit
+
+
+def _document_xml(buffer):
+    with zipfile.ZipFile(buffer) as package:
+        return package.read("word/document.xml").decode("utf-8")
+
+
+def test_write_and_read_round_trip():
+    paragraphs = [
+        [("text", "Primera línea\tcon tabulación\ny salto manual & <signos>.")],
+        [("text", "Segundo párrafo")],
+        [("text", "   ")],
+    ]
+    buffer = io.BytesIO()
+    docx_io.write_docx(buffer, paragraphs)
+    buffer.seek(0)
+    assert docx_io.read_text(buffer) == (
+        "Primera línea\tcon tabulación\ny salto manual & <signos>.\n\nSegundo párrafo"
+    )
+
+
+# Las justificaciones inline del modelo van en rojo y sin etiquetas HTML
+def test_inline_corrections_export_notes_in_red():
+    correction = 'Era un día <span style="color:red">[Ortografía: &quot;dia&quot;]</span> largo.\n\nFin.'
+    buffer = io.BytesIO()
+    service.export_docx(buffer, [correction])
+    buffer.seek(0)
+    assert docx_io.read_text(buffer) == 'Era un día [Ortografía: "dia"] largo.\n\nFin.'
+    assert '<w:color w:val="FF0000"/>' in _document_xml(buffer)
+
+
+# Con ediciones, el .docx lleva cambios marcados: lo borrado no se lee como texto, lo insertado sí
+def test_tracked_changes_export():
+    body = "Que dia tan largo.\n\nDijo adios."
+    edits = [
+        Edit(4, 7, "dia", "día", "ORT", ""),
+        {"start": 25, "end": 30, "original": "adios", "replacement": "adiós", "reason": "ORT", "note": "tilde"},
+    ]
+    buffer = io.BytesIO()
+    service.export_docx(buffer, tracked=[(body, edits)])
+    buffer.seek(0)
+    xml = _document_xml(buffer)
+    assert xml.count("<w:del ") == 2 and xml.count("<w:ins ") == 2
+    assert f'w:author="{docx_io.REVISION_AUTHOR}"' in xml
+    assert '<w:delText xml:space="preserve">dia</w:delText>' in xml
+    assert docx_io.read_text(buffer) == (
+        "Que día [Ortografía] tan largo.\n\nDijo adiós [Ortografía: tilde]."
+    )
+
+
+def test_read_text_rejects_files_that_are_not_docx():
+    with pytest.raises(docx_io.DocxError):
+        docx_io.read_text(io.BytesIO(b"no es un zip"))
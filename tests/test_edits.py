@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from correccion import edits
+
+TEXT = "El dia que llegó, el dia era gris. Ver https://ejemplo.com/dia para más."
+
+
+def _content(*raw):
+    return json.dumps({"edits": list(raw)}, ensure_ascii=False)
+
+
+def test_parse_edits_accepts_fences_and_surrounding_text():
+    assert edits.parse_edits('```json\n{"edits": []}\n```') == []
+    assert edits.parse_edits('Aquí van: {"edits": [{"original": "a"}]} Fin.') == [{"original": "a"}]
+    with pytest.raises(edits.EditParseError):
+        edits.parse_edits("sin JSON")
+
+
+# El desplazamiento del modelo es una pista: se usa si coincide y si no, la aparición más cercana
+def test_validate_edits_locates_nearest_occurrence():
+    second = TEXT.index("dia", 10)
+    valid, rejected = edits.validate_edits(TEXT, [
+        {"start": second, "original": "dia", "replacement": "día", "reason": "ORT"},
+        {"start": 1, "original": "dia", "replacement": "día", "reason": "ort"},
+    ])
+    assert [(edit.start, edit.end) for edit in valid] == [(3, 6), (second, second + 3)]
+    assert [edit.reason for edit in valid] == ["ORT", "ORT"]
+    assert rejected == []
+
+
+def test_validate_edits_rejects_links_overlaps_and_missing_text():
+    link = TEXT.index("dia", TEXT.index("https"))
+    valid, rejected = edits.validate_edits(TEXT, [
+        {"start": 3, "original": "dia", "replacement": "día"},
+        {"start": 0, "original": "El dia", "replacement": "Aquel día"},
+        {"start": link, "original": "dia", "replacement": "día"},
+        {"original": "noche", "replacement": "tarde"},
+        {"original": "gris", "replacement": "gris"},
+    ])
+    assert [edit.original for edit in valid] == ["El dia"]
+    assert [reason for _, reason in rejected] == [
+        "toca un hipervínculo", "el fragmento original no aparece en el texto", "no cambia nada",
+        "se solapa con otra edición",
+    ]
+
+
+def test_resolve_applies_edits_and_keeps_urls():
+    result = edits.resolve(TEXT, _content(
+        {"start": 3, "original": "dia", "replacement": "día", "reason": "ORT"},
+        {"start": 20, "original": "el dia", "replacement": "el día", "reason": "ORT", "note": "tilde"},
+    ))
+    assert result["corrected"] == "El día que llegó, el día era gris. Ver https://ejemplo.com/dia para más."
+    assert result["lost_urls"] == [] and result["added_urls"] == []
+    for edit in result["edits"]:
+        assert TEXT[edit.start:edit.end] == edit.original
+    assert "~~el dia~~ **el día**" in result["annotated"]
@@ -0,0 +1,64 @@
+from correccion import service
+
+# Respuesta de cada sección: con encabezado propio, sin él, cortada por max_tokens y vacía
+REPLIES = {
+    "Temas": ("**Temas**\n\n- La espera.", "stop"),
+    "Desarrollo de Personajes": ("- Marta apenas habla.", "stop"),
+    "Estructura Narrativa": ("- El ritmo decae hacia", "length"),
+    "Estilo y Tono": ("  ", "stop"),
+}
+
+
+def _fake_complete(calls):
+    def complete(api_key, task, build, default_model, template, fields, *args, **kwargs):
+        calls.append(template)
+        if template == "continuation":
+            content, reason = " el final.", "stop"
+        else:
+            content, reason = REPLIES[fields["section"]]
+        return {
+            "model": default_model,
+            "choices": [{"message": {"content": content}, "finish_reason": reason}],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 10},
+            "request": build(default_model),
+        }
+    return complete
+
+
+# Las secciones se unen en el orden de ANALYSIS_SECTIONS, con su encabezado si el modelo no lo escribió
+def test_fanout_merges_sections_in_order(monkeypatch):
+    calls = []
+    monkeypatch.setattr(service, "_complete", _fake_complete(calls))
+    streamed = []
+    analysis = service.analyze_sections("x", "Cuento", "adultos", "Había una vez.", on_token=streamed.append)
+
+    assert calls == ["analysis-section"] * 4
+    assert service.response_content(analysis) == (
+        "**Temas**\n\n- La espera.\n\n"
+        "**Desarrollo de Personajes**\n\n- Marta apenas habla.\n\n"
+        "**Estructura Narrativa**\n\n- El ritmo decae hacia"
+    )
+    assert streamed[-1] == service.response_content(analysis)
+    assert analysis["choices"][0]["finish_reason"] == "length"
+    assert analysis["usage"] == {"prompt_tokens": 400, "completion_tokens": 40}
+    assert [section["section"] for section in analysis["sections"]] == list(REPLIES)
+
+
+# Sólo se continúa la sección cortada; el resto del análisis se conserva tal cual
+def test_fanout_continues_only_truncated_sections(monkeypatch):
+    calls = []
+    monkeypatch.setattr(service, "_complete", _fake_complete(calls))
+    analysis = service.analyze_sections("x", "Cuento", "adultos", "Había una vez.")
+    continued = service.continue_response("x", analysis)
+
+    assert calls.count("continuation") == 1
+    assert service.response_content(continued).endswith("**Estructura Narrativa**\n\n- El ritmo decae hacia el final.")
+    assert continued["choices"][0]["finish_reason"] == "stop"
+    assert continued["usage"]["completion_tokens"] == 50
+
+
+def test_fanout_can_request_only_some_sections(monkeypatch):
+    calls = []
+    monkeypatch.setattr(service, "_complete", _fake_complete(calls))
+    analysis = service.analyze_sections("x", "Cuento", "adultos", "Había una vez.", titles=["Desarrollo de Personajes"])
+    assert service.response_content(analysis) == "**Desarrollo de Personajes**\n\n- Marta apenas habla."
@@ -0,0 +1,41 @@
+import pytest
+import requests
+
+from correccion import http_client
+
+
+class FailingSession:
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    def post(self, url, **kwargs):
+        self.calls += 1
+        raise self.error
+
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setattr(http_client, "backoff_delay", lambda attempt: 0)
+
+    def install(error):
+        failing = FailingSession(error)
+        monkeypatch.setattr(http_client, "get_session", lambda: failing)
+        return failing
+
+    return install
+
+
+def test_connect_timeout_is_retried(session):
+    failing = session(requests.exceptions.ConnectTimeout())
+    with pytest.raises(requests.exceptions.ConnectTimeout):
+        http_client.post("http://api", retries=2)
+    assert failing.calls == 3
+
+
+# El servidor pudo recibir la petición: repetirla la pagaría dos veces
+def test_read_timeout_is_not_retried(session):
+    failing = session(requests.exceptions.ReadTimeout())
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        http_client.post("http://api", retries=2)
+    assert failing.calls == 1
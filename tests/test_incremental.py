@@ -0,0 +1,88 @@
+from correccion import chunking, incremental, pipeline, service
+
+TEXT = "\n\n".join(
+    f"Párrafo {number}: la lluvia caía sobre el puerto mientras los pescadores recogían las redes al anochecer."
+    for number in range(12)
+)
+
+
+# La primera pasada estima todas las secciones; las que ya están en el almacén no se vuelven a contar
+def test_estimate_incremental_counts_only_pending_sections():
+    store = incremental.SectionStore()
+    first = service.estimate_incremental("Cuento", "adultos", TEXT, store)
+    assert first["sections"] > 1
+    assert first["chunks"] == first["sections"]
+    assert first["reused"] == 0
+    assert first["max_cost"] > service.estimate_request("Cuento", "adultos", TEXT)["max_cost"]
+
+    sections = list(service.split_incremental(TEXT))
+    store.set(service.section_key(sections[0], "Cuento", "adultos", "inline"), {"notes": "", "correction": ""})
+    second = service.estimate_incremental("Cuento", "adultos", TEXT, store)
+    assert second["reused"] == 1
+    assert second["chunks"] == first["chunks"] - 1
+    assert second["max_cost"] < first["max_cost"]
+
+
+def test_merge_analyses_without_labels():
+    notes = ["**Temas**\n\n- El mar.", "**Temas**\n\n- La espera.\n\n**Estilo y Tono**\n\n- Sobrio."]
+    assert chunking.merge_analyses(notes, labels=False) == (
+        "**Temas**\n\n- El mar.\n\n- La espera.\n\n**Estilo y Tono**\n\n- Sobrio."
+    )
+    assert "*Fragmento 2:*" in chunking.merge_analyses(notes)
+
+
+def _response(content):
+    return {"choices": [{"message": {"content": content}, "finish_reason": "stop"}], "model": "modelo"}
+
+
+# Una lista de ediciones ilegible deja su sección sin corregir, pero no detiene las demás ni se guarda
+def test_malformed_section_reply_does_not_abort_the_run(monkeypatch):
+    sections = list(service.split_incremental(TEXT))
+    broken = sections[1].body
+    replies = []
+
+    def correct(api_key, genre, audience, analysis, text, **kwargs):
+        replies.append(text)
+        return _response("ni JSON ni ediciones" if text == broken else '{"edits": []}')
+
+    monkeypatch.setattr(service, "annotate", lambda *args, **kwargs: _response("**Temas**\n\n- El mar."))
+    monkeypatch.setattr(service, "correct", correct)
+    store = incremental.SectionStore()
+    result = service.process_incremental("x", "Cuento", "adultos", TEXT, store, correction_format="edits")
+    assert result["failed"] == 1
+    assert result["sections"] == len(sections)
+    assert broken in result["correction"]
+
+    replies.clear()
+    again = service.process_incremental("x", "Cuento", "adultos", TEXT, store, correction_format="edits")
+    assert replies == [broken]
+    assert again["reused"] == len(sections) - 1
+
+
+# Las secciones pasan por Validate antes de guardarse: una URL alterada se restaura y una lista de ediciones rescatada
+# a medias no se guarda
+def test_sections_are_validated_before_they_are_stored(monkeypatch):
+    text = "El mar de https://ejemplo.com/mar estaba en calma.\n\nEl dia fue largo y gris."
+    sections = list(service.split_incremental(text))
+
+    def correct(api_key, genre, audience, analysis, body, correction_format="inline", **kwargs):
+        if correction_format == "edits":
+            start = body.find("dia")
+            if start == -1:
+                return _response('{"edits": []}')
+            return _response(f'{{"edits": [{{"start": {start}, "original": "dia", "replacement": "día"}}, {{"orig')
+        return _response(body.replace("https://ejemplo.com/mar", "https://ejemplo.com/mar-azul"))
+
+    monkeypatch.setattr(service, "annotate", lambda *args, **kwargs: _response("- Bien."))
+    monkeypatch.setattr(service, "correct", correct)
+
+    store = incremental.SectionStore()
+    result = pipeline.process_incremental("x", "Cuento", "adultos", text, store)
+    assert "https://ejemplo.com/mar " in result["correction"] and "mar-azul" not in result["correction"]
+    assert result["failed"] == 0
+
+    store = incremental.SectionStore()
+    result = pipeline.process_incremental("x", "Cuento", "adultos", text, store, correction_format="edits")
+    assert "El día fue largo" in result["correction"]
+    salvaged = next(section for section in sections if "dia" in section.body)
+    assert store.get(service.section_key(salvaged, "Cuento", "adultos", "edits")) is None
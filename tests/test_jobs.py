@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+
+from correccion import jobs
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def _add_running(queue, job_id, owner):
+    queue._db.execute(
+        "INSERT INTO jobs (id, kind, status, params, progress, created, updated, owner)"
+        " VALUES (?, 'document', ?, '{}', 0, 0, 0, ?)",
+        (job_id, jobs.RUNNING, owner),
+    )
+
+
+# Un proceso que abre la cola sólo da por interrumpidos los trabajos de procesos que ya no existen
+def test_recovery_only_fails_jobs_of_dead_owners(tmp_path):
+    path = str(tmp_path / "trabajos.sqlite3")
+    first = jobs.JobQueue(path, workers=1)
+    _add_running(first, "muerto", _dead_pid())
+    _add_running(first, "sin-dueño", None)  # De antes de la columna owner
+    _add_running(first, "vivo", os.getpid())
+
+    second = jobs.JobQueue(path, workers=1)
+    assert second.get("muerto")["status"] == jobs.FAILED
+    assert second.get("sin-dueño")["status"] == jobs.FAILED
+    assert second.get("vivo")["status"] == jobs.RUNNING
+    first.shutdown()
+    second.shutdown()
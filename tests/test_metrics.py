@@ -0,0 +1,67 @@
+import re
+import urllib.request
+
+from correccion import metrics, validation
+
+# Línea de muestra del formato de texto de Prometheus: nombre{etiquetas} valor
+_SAMPLE = re.compile(r'^[a-z_]+(\{([a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*)?\})? [0-9.e+-]+$')
+
+
+def _samples(text, name):
+    return [line for line in text.splitlines() if line.startswith(name)]
+
+
+def test_disabled_metrics_record_nothing(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    metrics.record_call("prueba-apagada", "modelo", {"usage": {"prompt_tokens": 5}})
+    metrics.record_stage("prueba-apagada", 0.1)
+    assert "prueba-apagada" not in metrics.render_prometheus()
+
+
+def test_render_prometheus_counters_and_histograms(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    data = {"usage": {"prompt_tokens": 120, "completion_tokens": 30}, "timings": {"ttft": 0.2, "total": 0.3}}
+    metrics.record_call("prueba-render", 'mod"elo', data)
+    # Las respuestas de la caché cuentan como llamadas, pero no suman tokens ni tiempos
+    metrics.record_call("prueba-render", 'mod"elo', dict(data, timings={"cached": True}))
+    metrics.record_call("prueba-render", 'mod"elo', error=TimeoutError())
+    metrics.record_stage("prueba-render", 0.02)
+    text = metrics.render_prometheus()
+
+    assert _samples(text, 'correccion_api_calls_total{stage="prueba-render"') == [
+        'correccion_api_calls_total{stage="prueba-render",model="modelo",outcome="error",cached="false"} 1',
+        'correccion_api_calls_total{stage="prueba-render",model="modelo",outcome="ok",cached="false"} 1',
+        'correccion_api_calls_total{stage="prueba-render",model="modelo",outcome="ok",cached="true"} 1',
+    ]
+    assert _samples(text, 'correccion_api_tokens_total{stage="prueba-render"') == [
+        'correccion_api_tokens_total{stage="prueba-render",model="modelo",type="completion"} 30',
+        'correccion_api_tokens_total{stage="prueba-render",model="modelo",type="prompt"} 120',
+    ]
+    assert 'correccion_api_seconds_count{stage="prueba-render",model="modelo",phase="total"} 1' in text
+
+    # Las cubetas son acumuladas y terminan en +Inf
+    buckets = _samples(text, 'correccion_stage_seconds_bucket{stage="prueba-render"')
+    assert buckets[0] == 'correccion_stage_seconds_bucket{stage="prueba-render",le="0.001"} 0'
+    assert 'correccion_stage_seconds_bucket{stage="prueba-render",le="0.05"} 1' in buckets
+    assert buckets[-1] == 'correccion_stage_seconds_bucket{stage="prueba-render",le="+Inf"} 1'
+    assert len(buckets) == len(metrics.STAGE_BUCKETS) + 1
+
+    for mode in validation.FAILURE_MODES:
+        assert f'correccion_validation_failures_total{{mode="{mode}",outcome="repaired"}}' in text
+    for line in text.splitlines():
+        assert line.startswith(("# HELP ", "# TYPE ")) or _SAMPLE.match(line), line
+
+
+def test_serve_exposes_metrics_endpoint(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    monkeypatch.setattr(metrics, "_server", None)
+    server = metrics.serve(port=0, host="127.0.0.1")
+    try:
+        assert metrics.enabled() and metrics.configured()
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert "# TYPE correccion_api_calls_total counter" in response.read().decode("utf-8")
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,59 @@
+import json
+
+from correccion import edits, pipeline, service
+
+
+# Etapa de prueba que corrige "dia" y "Adios" como lo haría una lista de ediciones del modelo, sin llamar a la API
+class FakeEdits(pipeline.Stage):
+    name = "correction"
+    per_chunk = True
+
+    def run(self, pipeline, state, chunk=None):
+        body = chunk["body"]
+        raw = [
+            {"start": body.find(original), "original": original, "replacement": replacement, "reason": "ORT"}
+            for original, replacement in (("dia", "día"), ("Adios", "Adiós"))
+        ]
+        chunk["resolved"] = edits.resolve(body, json.dumps({"edits": raw}))
+        chunk["correction"] = chunk["resolved"]["corrected"]
+
+
+def test_tracked_chunks_match_single_chunk_offsets():
+    text = "Hola mundo.\n\n\nEl dia fue largo.\r\n\r\nAdios amigo."
+    state = pipeline.Pipeline([FakeEdits()], pipeline.Clients("x")).run("Drama", "adultos", text)
+    assert not state["chunked"]
+    tracked = list(service.tracked_chunks(state["text"], state["edits"]))
+    assert len(tracked) == 1
+    body, body_edits = tracked[0]
+    assert [body[edit["start"]:edit["end"]] for edit in body_edits] == ["dia", "Adios"]
+    assert state["correction"] == "Hola mundo.\n\nEl día fue largo.\n\nAdiós amigo."
+
+
+def _response(content):
+    return {"choices": [{"message": {"content": content}, "finish_reason": "stop"}], "model": "modelo"}
+
+
+# Una corrección vacía en el modo canalizado se pide otra vez con el análisis ya hecho, sin repetir el análisis
+def test_overlapped_retries_only_the_empty_half(monkeypatch):
+    analysis = (
+        "**Temas**\n\nLa rutina.\n\n**Desarrollo de Personajes**\n\nNinguno.\n\n"
+        "**Estructura Narrativa**\n\nLineal.\n\n**Estilo y Tono**\n\nSobrio."
+    )
+    calls = {"analyze": 0, "correct": []}
+
+    def analyze(*args, **kwargs):
+        calls["analyze"] += 1
+        return _response(analysis)
+
+    def correct(api_key, genre, audience, analysis, text, **kwargs):
+        calls["correct"].append(analysis)
+        return _response("" if len(calls["correct"]) == 1 else "El día fue largo.")
+
+    monkeypatch.setattr(service, "analyze", analyze)
+    monkeypatch.setattr(service, "correct", correct)
+    stage = pipeline.Validate(pipeline.Overlapped("pipelined"))
+    state = pipeline.Pipeline([stage], pipeline.Clients("x")).run("Drama", "adultos", "El dia fue largo.")
+    assert calls["analyze"] == 1
+    assert calls["correct"] == [analysis, analysis]
+    assert state["correction"] == "El día fue largo."
+    assert state["chunks"][0]["repairs"] == {"empty": True}
@@ -0,0 +1,35 @@
+from correccion import prepass
+
+
+# "tenia" (el parásito) y "ademas" (de ademar) existen: se avisa, pero el texto no cambia
+def test_ambiguous_misspellings_are_only_flagged():
+    result = prepass.run("La tenia y la solitaria. Ademas la galería.")
+    assert result["corrected"] == "La tenia y la solitaria. Ademas la galería."
+    assert [flag.original for flag in result["flags"]] == ["tenia", "Ademas"]
+    assert "«Además»" in result["flags"][1].note
+
+
+def test_prepass_fixes_typography_and_misspellings():
+    result = prepass.run('-Que dia tan largo!  dijo. "Ya es tarde"...')
+    assert result["corrected"] == "—¡Que día tan largo! dijo. «Ya es tarde»…"
+    for edit in result["edits"]:
+        assert edit.original == '-Que dia tan largo!  dijo. "Ya es tarde"...'[edit.start:edit.end]
+
+
+# La raya de diálogo sólo sustituye al guion ante letra o ¿¡, nunca ante una cifra
+def test_dialogue_dash_needs_a_letter():
+    result = prepass.run("-5 grados hacía.\n--Hola.\n-¿Vienes?\n-Ñandú.")
+    assert result["corrected"] == "-5 grados hacía.\n—Hola.\n—¿Vienes?\n—Ñandú."
+
+
+def test_prepass_never_touches_links():
+    text = "Mira [el dia](https://ejemplo.com/dia) y https://ejemplo.com/asi  hoy."
+    result = prepass.run(text)
+    assert result["corrected"] == "Mira [el dia](https://ejemplo.com/dia) y https://ejemplo.com/asi hoy."
+
+
+# Una pregunta que puede empezar a mitad de la oración sólo se avisa
+def test_prepass_flags_unclear_question_opening():
+    result = prepass.run("Dime, vienes?")
+    assert result["corrected"] == "Dime, vienes?"
+    assert [flag.reason for flag in result["flags"]] == ["PUN"]
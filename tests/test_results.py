@@ -0,0 +1,21 @@
+from correccion import results
+
+
+# Un lote que SQLite rechaza no mata el hilo de escritura: se cuenta como error, flush() vuelve y lo siguiente
+# se guarda
+def test_failed_batch_does_not_block_flush():
+    store = results.ResultStore(path=None, flush_interval=0.01)
+    store._db.execute(
+        "CREATE TRIGGER reject BEFORE INSERT ON results WHEN NEW.genre = 'roto'"
+        " BEGIN SELECT RAISE(ABORT, 'rechazado'); END"
+    )
+    store.add("Un texto que no se guarda.", "Análisis", genre="roto")
+    store.flush()
+    store.add("Un texto que sí se guarda.", "Análisis", genre="cuento")
+    store.flush()
+
+    stats = store.stats()
+    assert stats["errors"] == 1
+    assert stats["written"] == 1
+    assert stats["entries"] == 1
+    assert "rechazado" in store.last_error
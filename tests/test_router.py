@@ -0,0 +1,64 @@
+import pytest
+
+from correccion import budget, router
+from correccion.together_api import RateLimitError
+
+SMALL = "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo"
+MISTRAL = "mistralai/Mistral-7B-Instruct-v0.3"
+MIXTRAL = "mistralai/Mixtral-8x7B-Instruct-v0.1"
+LARGE = "meta-llama/Meta-Llama-3.1-70B-Instruct-Turbo"
+
+
+# Primero los que cumplen la calidad del nivel, del más rápido al más lento; después el resto, de mayor a menor calidad
+def test_rank_by_tier():
+    models = router.ModelRouter()
+    assert models.rank("analysis", "fast") == [SMALL, MISTRAL, MIXTRAL, LARGE]
+    assert models.rank("correction", "balanced") == [MIXTRAL, LARGE, SMALL, MISTRAL]
+    assert models.rank("correction", "thorough") == [LARGE, MIXTRAL, SMALL, MISTRAL]
+
+
+def test_complete_falls_back_and_cools_the_failed_model():
+    models = router.ModelRouter()
+    sent = []
+
+    def send(payload, fail_fast):
+        sent.append((payload["model"], fail_fast))
+        if payload["model"] == MIXTRAL:
+            raise RateLimitError(5, "429")
+        return {"choices": [{"message": {"content": "hola"}}]}
+
+    data = models.complete("correction", "balanced", lambda model: {"model": model}, send)
+    assert sent == [(MIXTRAL, True), (LARGE, True)]
+    assert data["route"] == {"model": LARGE, "tier": "balanced", "failed": [MIXTRAL]}
+    assert models.rank("correction", "balanced")[-1] == MIXTRAL
+
+
+# Los modelos en los que el prompt no cabe se saltan; los errores que no son de capacidad no cambian de modelo
+def test_complete_skips_models_without_room_and_raises_other_errors():
+    models = router.ModelRouter()
+
+    def build(model):
+        if model == MIXTRAL:
+            raise budget.BudgetExceededError(model, 40000, 32768)
+        return {"model": model}
+
+    data = models.complete("correction", "balanced", build, lambda payload, fail_fast: {"choices": []})
+    assert data["route"]["model"] == LARGE
+
+    def send(payload, fail_fast):
+        raise ValueError("respuesta rota")
+
+    with pytest.raises(ValueError):
+        models.complete("correction", "balanced", build, send)
+
+
+def test_complete_raises_last_error_when_every_model_fails():
+    models = router.ModelRouter()
+
+    def send(payload, fail_fast):
+        raise RateLimitError(5, payload["model"])
+
+    with pytest.raises(RateLimitError) as excinfo:
+        models.complete("analysis", "fast", lambda model: {"model": model}, send)
+    assert str(excinfo.value) == MIXTRAL
+    assert sum(row["fallos"] for row in models.snapshot()) == router.MAX_ATTEMPTS
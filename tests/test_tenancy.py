@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+
+from correccion import tenancy
+from correccion.executor import RateLimiter
+
+SECRET = "secreto-de-prueba-de-al-menos-32-bytes"
+PLANS = {
+    "free": {"tokens_per_minute": 600, "documents_per_day": 2, "weight": 1},
+    "pro": {"tokens_per_minute": 6000, "documents_per_day": 10, "weight": 4},
+}
+
+
+def test_verify_token_reads_user_and_plan():
+    user = tenancy.verify_token(tenancy.issue_token("ana@ejemplo.com", "pro", secret=SECRET), secret=SECRET)
+    assert user == tenancy.User("ana@ejemplo.com", "pro")
+
+    # Un plan desconocido cae en el plan por defecto
+    token = tenancy.issue_token("luis@ejemplo.com", "platino", secret=SECRET)
+    assert tenancy.verify_token(token, secret=SECRET).plan == tenancy.DEFAULT_PLAN
+
+
+@pytest.mark.parametrize("token", [
+    "",
+    tenancy.issue_token("ana@ejemplo.com", secret="otro-secreto-de-al-menos-32-bytes"),
+    tenancy.issue_token("ana@ejemplo.com", secret=SECRET, days=-1),
+    "no-es-un-jwt",
+], ids=["ausente", "otra-firma", "caducado", "malformado"])
+def test_verify_token_rejects_missing_forged_and_expired_tokens(token):
+    with pytest.raises(tenancy.AuthError):
+        tenancy.verify_token(token, secret=SECRET)
+
+
+def test_daily_document_quota():
+    tenants = tenancy.Tenancy(RateLimiter(), path=None, plans=PLANS)
+    user = tenancy.User("ana@ejemplo.com", "free")
+    tenants.admit_document(user)
+    tenants.admit_document(user)
+    with pytest.raises(tenancy.QuotaExceededError):
+        tenants.admit_document(user)
+
+    # La cuota es por usuario
+    tenants.admit_document(tenancy.User("luis@ejemplo.com", "free"))
+    assert tenants.account(user)["documents"] == 2
+
+
+# Una llamada que tendría que esperar más de MAX_QUOTA_WAIT se rechaza y no consume la cuota
+def test_tokens_per_minute_quota_and_usage_records():
+    tenants = tenancy.Tenancy(RateLimiter(), path=None, plans=PLANS)
+    user = tenancy.User("ana@ejemplo.com", "free")
+    limiter = tenants.limiter_for(user)
+    assert limiter.acquire(600) == pytest.approx(0, abs=0.1)
+    with pytest.raises(tenancy.QuotaExceededError):
+        limiter.acquire(1000)
+    assert tenants.bucket(user).tokens > -1
+
+    limiter.settle(600, {"prompt_tokens": 300, "completion_tokens": 100})
+    assert tenants.bucket(user).tokens >= 200
+    account = tenants.account(user)
+    assert (account["requests"], account["prompt_tokens"], account["completion_tokens"]) == (1, 300, 100)
+
+
+# Limitador compartido que retiene la primera llamada hasta que las demás están en la cola
+class BlockingLimiter:
+    def __init__(self):
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.order = []
+
+    def acquire(self, tokens):
+        self.order.append(threading.current_thread().name)
+        self.entered.set()
+        self.release.wait(5)
+
+
+def test_fair_queue_orders_by_weight():
+    limiter = BlockingLimiter()
+    queue = tenancy.FairQueue(limiter)
+
+    def start(name, user, weight):
+        thread = threading.Thread(target=queue.acquire, args=(user, weight, 100), name=name)
+        thread.start()
+        return thread
+
+    threads = [start("x", "x", 1)]
+    limiter.entered.wait(5)
+    # Tres llamadas del plan gratuito y luego tres de uno que pesa cuatro veces más
+    for name, user, weight in [("f1", "f", 1), ("f2", "f", 1), ("f3", "f", 1),
+                               ("p1", "p", 4), ("p2", "p", 4), ("p3", "p", 4)]:
+        threads.append(start(name, user, weight))
+        while queue.pending() < len(threads) - 1:
+            time.sleep(0.001)
+
+    limiter.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert limiter.order == ["x", "f1", "p1", "p2", "p3", "f2", "f3"]
+    assert queue.pending() == 0
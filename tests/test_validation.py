@@ -0,0 +1,39 @@
+from correccion import validation
+
+COMPLETE = (
+    "**Temas**\n\nLa memoria.\n\n**Desarrollo de Personajes**\n\nUna voz.\n\n"
+    "**Estructura Narrativa**\n\nLineal.\n\n**Estilo y Tono**\n\nContenido."
+)
+
+
+def test_missing_sections_complete():
+    assert validation.missing_sections(COMPLETE) == []
+
+
+def test_missing_sections_reports_absent_ones():
+    assert validation.missing_sections("**Temas**\n\nLa memoria.\n\n### Estilo\n\nSobrio.") == [
+        "Desarrollo de Personajes", "Estructura Narrativa",
+    ]
+
+
+# Títulos que el modelo escribe a su manera, sin copiar los de prompts.ANALYSIS_SECTIONS
+def test_missing_sections_accepts_synonyms():
+    analysis = (
+        "**Temática**\n\nLa pérdida.\n\n**Caracterización**\n\nSólida.\n\n"
+        "## Ritmo y estructura\n\nÁgil.\n\n**Lenguaje y tono**\n\nSobrio."
+    )
+    assert validation.missing_sections(analysis) == []
+    assert validation.missing_sections("**Tema central**\n\nEl duelo.") == [
+        "Desarrollo de Personajes", "Estructura Narrativa", "Estilo y Tono",
+    ]
+
+
+# Títulos en la misma línea que el texto de la sección
+def test_missing_sections_accepts_inline_titles():
+    analysis = (
+        "1. **Temas:** el texto explora la memoria.\n"
+        "2. **Desarrollo de personajes:** la narradora evoluciona.\n"
+        "3. **Estructura narrativa:** lineal y breve.\n"
+        "4. **Estilo y tono:** sobrio."
+    )
+    assert validation.missing_sections(analysis) == []